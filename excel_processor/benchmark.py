@@ -0,0 +1,350 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+process_excel.py 性能基准测试
+功能:
+1. 生成与专利导出文件结构一致的模拟 Excel 文件(SYSTEM_COLUMNS + 若干未知列)
+2. 按不同行数、文件数组合，端到端测试 read_excel_headers、
+   check_unrecognized_columns、simplify_excel_files
+3. 记录耗时、峰值内存(RSS)和每秒处理文件数，结果保存为 JSON，便于对比不同版本
+4. --startup 测试各脚本的启动耗时，并检查只读列头等轻量路径没有导入 pandas 等重型库
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import zipfile
+import argparse
+import platform
+import contextlib
+import subprocess
+import statistics
+import multiprocessing
+from pathlib import Path
+from datetime import datetime, timedelta
+
+from openpyxl import Workbook
+from openpyxl.utils import get_column_letter
+
+import process_excel
+
+try:
+    import resource
+except ImportError:  # Windows 没有 resource 模块
+    resource = None
+
+# 默认测试场景: (每个文件数据行数, 文件数)
+DEFAULT_SCENARIOS = "1000x100,60000x4,1000000x1"
+
+# 模拟文件中的未知列
+UNKNOWN_COLUMNS = ["内部编号", "备注", "公开（公告）号"]
+
+
+def parse_scenarios(text):
+    """解析 "行数x文件数,..." 格式的场景列表"""
+    scenarios = []
+    for item in text.split(','):
+        rows, files = item.lower().split('x')
+        scenarios.append((int(rows), int(files)))
+    return scenarios
+
+
+def synthetic_columns(column_count):
+    """取 SYSTEM_COLUMNS 的前 column_count 列，再加上几个未知列"""
+    return process_excel.SYSTEM_COLUMNS[:column_count] + UNKNOWN_COLUMNS
+
+
+def _synthetic_value(column, row_idx, rng):
+    """按列名生成大致符合真实数据类型的值"""
+    if column.endswith('日') or column.endswith('日期'):
+        return datetime(2000, 1, 1) + timedelta(days=rng.randrange(9000))
+    if column.endswith('数') or column.endswith('数量') or column.endswith('次数'):
+        return rng.randrange(200)
+    if column in ('公开(公告)号', '申请号'):
+        return f"CN{100000000 + row_idx}A"
+    return f"{column}-{rng.randrange(5000)}"
+
+
+def _add_dimension(file_path, ref):
+    """
+    在工作表 XML 开头补充 <dimension ref>
+
+    openpyxl 只写模式不会写出该元素，而 Excel 保存的导出文件都有；
+    缺少它时 openpyxl 只读模式打开文件会先完整扫描一遍工作表，测试结果会失真
+    """
+    file_path = Path(file_path)
+    tmp_path = file_path.with_name(file_path.name + '.tmp')
+    with zipfile.ZipFile(file_path) as zin, zipfile.ZipFile(tmp_path, 'w') as zout:
+        for item in zin.infolist():
+            if item.filename != 'xl/worksheets/sheet1.xml':
+                zout.writestr(item, zin.read(item.filename))
+                continue
+            with zin.open(item) as src, zout.open(item, 'w', force_zip64=True) as dst:
+                head = src.read(64 * 1024)
+                dst.write(head.replace(b'<sheetViews>',
+                                       f'<dimension ref="{ref}"/><sheetViews>'.encode(), 1))
+                shutil.copyfileobj(src, dst, 1024 * 1024)
+    os.replace(tmp_path, file_path)
+
+
+def generate_workbook(file_path, rows, columns, seed=0):
+    """用只写模式生成一个模拟专利导出文件"""
+    rng = random.Random(seed)
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet(title="Sheet1")
+    ws.append(columns)
+    # 预先生成一批行并循环使用，避免生成大文件时耗时过长
+    pool = [[_synthetic_value(column, idx, rng) for column in columns] for idx in range(min(rows, 500))]
+    for row_idx in range(rows):
+        ws.append(pool[row_idx % len(pool)])
+    wb.save(file_path)
+    _add_dimension(file_path, f"A1:{get_column_letter(len(columns))}{rows + 1}")
+
+
+def prepare_dataset(work_dir, rows, files, column_count):
+    """生成(或复用已生成的)一个场景的数据目录"""
+    dataset_dir = Path(work_dir) / f"rows{rows}_files{files}_cols{column_count}"
+    marker = dataset_dir / ".complete"
+    if marker.exists():
+        return dataset_dir
+
+    shutil.rmtree(dataset_dir, ignore_errors=True)
+    dataset_dir.mkdir(parents=True)
+    columns = synthetic_columns(column_count)
+    for idx in range(files):
+        # 与真实导出一样分散到多个子目录
+        sub_dir = dataset_dir / f"batch{idx % 4}"
+        sub_dir.mkdir(exist_ok=True)
+        generate_workbook(sub_dir / f"export {idx * rows + 1}-{(idx + 1) * rows}.xlsx",
+                          rows, columns, seed=idx)
+    marker.touch()
+    return dataset_dir
+
+
+def _peak_rss_mb():
+    """当前进程的峰值 RSS(MB)，不支持的平台返回 None"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux 单位为 KB，macOS 为字节
+    if sys.platform == 'darwin':
+        return peak / 1024 / 1024
+    return peak / 1024
+
+
+def _run_target(name, dataset_dir, options, queue):
+    """在独立进程中执行一个基准测试，使峰值内存互不影响"""
+    files = process_excel.find_excel_files(dataset_dir)
+    output_dir = Path(options['work_dir']) / "simplify_output" / name
+
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        baseline_rss = _peak_rss_mb()
+        start = time.perf_counter()
+        if name == 'read_excel_headers':
+            for file_path in files:
+                process_excel.read_excel_headers(file_path)
+        elif name == 'check_unrecognized_columns':
+            process_excel.check_unrecognized_columns(dataset_dir, jobs=options['jobs'])
+        elif name == 'simplify_excel_files':
+            process_excel.simplify_excel_files(dataset_dir, options['max_rows'],
+                                               output_directory=output_dir)
+        elif name == 'simplify_excel_files_streaming':
+            process_excel.simplify_excel_files(dataset_dir, options['max_rows'], streaming=True,
+                                               output_directory=output_dir)
+        elapsed = time.perf_counter() - start
+
+    shutil.rmtree(output_dir, ignore_errors=True)
+    queue.put({
+        'wall_time': elapsed,
+        'peak_rss_mb': _peak_rss_mb(),
+        'baseline_rss_mb': baseline_rss,
+        'files': len(files),
+        'files_per_sec': len(files) / elapsed if elapsed > 0 else None,
+    })
+
+
+def run_benchmark(name, dataset_dir, options):
+    """启动子进程执行基准测试并返回结果"""
+    ctx = multiprocessing.get_context('spawn')
+    queue = ctx.Queue()
+    process = ctx.Process(target=_run_target, args=(name, str(dataset_dir), options, queue))
+    process.start()
+    result = queue.get()
+    process.join()
+    return result
+
+
+def _git_revision():
+    """返回当前代码的 git 提交号，不在 git 仓库中时返回 None"""
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'],
+                                       cwd=Path(__file__).parent,
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except Exception:
+        return None
+
+
+BENCHMARKS = [
+    'read_excel_headers',
+    'check_unrecognized_columns',
+    'simplify_excel_files',
+    'simplify_excel_files_streaming',
+]
+
+
+SCRAPER_DIR = Path(__file__).resolve().parent.parent / 'product_scraper'
+
+# 启动耗时测试项: (名称, 脚本目录, 执行的代码, 不应被导入的模块)
+# {sample} 会替换为一个小的模拟 Excel 文件路径
+STARTUP_TARGETS = [
+    ('process_excel import', Path(__file__).resolve().parent,
+     'import process_excel', ['pandas', 'numpy', 'openpyxl', 'xlrd']),
+    ('process_excel headers', Path(__file__).resolve().parent,
+     'import process_excel; process_excel.read_excel_headers({sample!r})',
+     ['pandas', 'numpy', 'openpyxl', 'xlrd']),
+    ('product_scraper import', SCRAPER_DIR,
+     'import product_scraper', ['requests', 'bs4', 'pandas', 'PIL']),
+    ('process_output import', SCRAPER_DIR, 'import process_output', ['PIL']),
+    ('resize_images import', SCRAPER_DIR, 'import resize_images', ['PIL']),
+]
+
+
+def measure_startup(name, script_dir, code, forbidden, runs, work_dir):
+    """
+    在新的 Python 进程中执行 code runs 次，返回耗时(最小值、中位数)和被导入的禁止模块
+
+    以工作目录为当前目录运行，脚本在导入时创建的日志文件不会写到源码目录
+    """
+    script = (f"import sys; sys.path.insert(0, {str(script_dir)!r}); {code}; "
+              f"import json; print(json.dumps([m for m in {forbidden!r} if m in sys.modules]))")
+    timings = []
+    loaded = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = subprocess.run([sys.executable, '-c', script], cwd=work_dir,
+                                capture_output=True, text=True)
+        timings.append(time.perf_counter() - start)
+        if result.returncode != 0:
+            raise RuntimeError(f"{name} 执行失败: {result.stderr.strip()}")
+        loaded = json.loads(result.stdout.strip().splitlines()[-1])
+    return {
+        'benchmark': name,
+        'runs': runs,
+        'min_time': min(timings),
+        'median_time': statistics.median(timings),
+        'forbidden_imports': loaded,
+    }
+
+
+def run_startup_benchmarks(args):
+    """执行启动耗时测试，禁止模块被导入或中位数超过 --max-startup 时返回 1"""
+    work_dir = Path(args.work_dir) / 'startup'
+    work_dir.mkdir(parents=True, exist_ok=True)
+    sample = work_dir / 'sample.xlsx'
+    if not sample.exists():
+        generate_workbook(sample, 10, synthetic_columns(args.columns))
+
+    results = []
+    failed = False
+    print(f"\n启动耗时 (每项 {args.startup_runs} 次)")
+    for name, script_dir, code, forbidden in STARTUP_TARGETS:
+        result = measure_startup(name, script_dir, code.format(sample=str(sample)), forbidden,
+                                 args.startup_runs, work_dir)
+        results.append(result)
+        status = "✓"
+        if result['forbidden_imports']:
+            status = f"❌ 导入了 {', '.join(result['forbidden_imports'])}"
+            failed = True
+        elif args.max_startup and result['median_time'] > args.max_startup:
+            status = f"❌ 超过 {args.max_startup}s"
+            failed = True
+        print(f"  {name:<28} 最小 {result['min_time']:>7.3f}s  中位数 {result['median_time']:>7.3f}s  {status}")
+
+    report = {
+        'timestamp': datetime.now().isoformat(),
+        'git_revision': _git_revision(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'startup': results,
+    }
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"\n结果已保存到: {args.output}")
+    return 1 if failed else 0
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(
+        description='process_excel.py 性能基准测试',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+示例:
+  python benchmark.py
+  python benchmark.py --scenarios 1000x100,60000x4 --output bench_before.json
+  python benchmark.py --only read_excel_headers check_unrecognized_columns --jobs 8
+  python benchmark.py --startup --max-startup 0.5 --output startup.json
+        """
+    )
+    parser.add_argument('--scenarios', default=DEFAULT_SCENARIOS,
+                        help=f'测试场景，格式为 行数x文件数，逗号分隔 (默认: {DEFAULT_SCENARIOS})')
+    parser.add_argument('--columns', type=int, default=40,
+                        help='模拟文件使用的系统列数量，最多为全部系统列 (默认: 40)')
+    parser.add_argument('--work-dir', default=str(Path(__file__).parent / 'bench_data'),
+                        help='模拟数据目录，已生成的数据会被复用 (默认: bench_data)')
+    parser.add_argument('--only', nargs='+', choices=BENCHMARKS, default=BENCHMARKS,
+                        help='只运行指定的测试项')
+    parser.add_argument('--jobs', type=int, default=1,
+                        help='check_unrecognized_columns 的并行进程数 (默认: 1)')
+    parser.add_argument('--max-rows', type=int, default=5,
+                        help='simplify_excel_files 保留的数据行数 (默认: 5)')
+    parser.add_argument('--output', default='benchmark_results.json',
+                        help='结果 JSON 文件路径 (默认: benchmark_results.json)')
+    parser.add_argument('--startup', action='store_true',
+                        help='只测试各脚本的启动耗时，并检查轻量路径没有导入重型库(导入时退出码为 1)')
+    parser.add_argument('--startup-runs', type=int, default=5,
+                        help='--startup 中每项的运行次数 (默认: 5)')
+    parser.add_argument('--max-startup', type=float, default=None,
+                        help='--startup 中每项启动耗时中位数的上限(秒)，超过时退出码为 1')
+    args = parser.parse_args()
+
+    if args.startup:
+        sys.exit(run_startup_benchmarks(args))
+
+    options = {'work_dir': args.work_dir, 'jobs': args.jobs, 'max_rows': args.max_rows}
+    results = []
+
+    for rows, files in parse_scenarios(args.scenarios):
+        print(f"\n场景: 每个文件 {rows} 行 × {files} 个文件")
+        start = time.perf_counter()
+        dataset_dir = prepare_dataset(args.work_dir, rows, files, args.columns)
+        print(f"  数据准备完成 ({time.perf_counter() - start:.1f}s): {dataset_dir}")
+
+        for name in args.only:
+            result = run_benchmark(name, dataset_dir, options)
+            result.update({'benchmark': name, 'rows': rows, 'file_count': files})
+            results.append(result)
+            rss = f"{result['peak_rss_mb']:.1f} MB" if result['peak_rss_mb'] is not None else "未知"
+            print(f"  {name:<32} {result['wall_time']:>9.3f}s  "
+                  f"{result['files_per_sec']:>9.1f} 文件/秒  峰值内存 {rss}")
+
+    report = {
+        'timestamp': datetime.now().isoformat(),
+        'git_revision': _git_revision(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'columns': len(synthetic_columns(args.columns)),
+        'jobs': args.jobs,
+        'results': results,
+    }
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"\n结果已保存到: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
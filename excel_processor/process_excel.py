@@ -7,11 +7,35 @@ Excel 处理工具
 """
 
 import os
+import re
 import sys
+import csv
+import codecs
+import fnmatch
+import shutil
+import signal
+import select
+import struct
+import argparse
+import contextlib
+import threading
+import json
+import html
+import queue
+import random
+import time
+import hashlib
+import sqlite3
+import posixpath
+import zipfile
+import tempfile
+import unicodedata
+import xml.etree.ElementTree as ET
 from pathlib import Path
-import pandas as pd
-from openpyxl import load_workbook, Workbook
-from openpyxl.utils.dataframe import dataframe_to_rows
+from datetime import datetime, time as dt_time
+from itertools import combinations
+from collections import Counter, defaultdict, deque
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FuturesTimeoutError
 
 # 系统识别的列名数组
 SYSTEM_COLUMNS = [
@@ -184,38 +208,3073 @@ SYSTEM_COLUMNS = [
 ]
 
 
-def find_excel_files(directory):
-    """递归查找所有 Excel 文件"""
-    excel_files = []
-    directory = Path(directory)
+def normalize_column_name(name):
+    """列名规范化: 全角转半角(NFKC)、去除所有空白、统一大小写"""
+    text = unicodedata.normalize('NFKC', str(name))
+    return ''.join(text.split()).casefold()
+
+
+def _edit_distance(a, b):
+    """Levenshtein 编辑距离"""
+    if len(a) < len(b):
+        a, b = b, a
+    previous = list(range(len(b) + 1))
+    for i, ch_a in enumerate(a, 1):
+        current = [i]
+        for j, ch_b in enumerate(b, 1):
+            current.append(min(previous[j] + 1,
+                               current[j - 1] + 1,
+                               previous[j - 1] + (ch_a != ch_b)))
+        previous = current
+    return previous[-1]
+
+
+def _deletions(word, max_distance):
+    """返回删除最多 max_distance 个字符后得到的所有字符串(含原词)"""
+    results = {word}
+    frontier = {word}
+    for _ in range(max_distance):
+        frontier = {w[:i] + w[i + 1:] for w in frontier for i in range(len(w))}
+        results |= frontier
+    return results
+
+
+class DeletionIndex:
+    """
+    编辑距离近邻索引(对称删除法)
+
+    预先为每个词生成删除最多 max_distance 个字符后的变体并建立倒排表；
+    查询时只需生成查询词的删除变体查表得到候选，再逐个计算编辑距离校验，
+    查询开销与词表大小基本无关
+    """
+
+    def __init__(self, words=(), max_distance=2):
+        self.max_distance = max_distance
+        self.variants = {}
+        for word in words:
+            self.add(word)
+
+    def add(self, word):
+        for variant in _deletions(word, self.max_distance):
+            self.variants.setdefault(variant, set()).add(word)
+
+    def search(self, word, max_distance=None):
+        """返回 [(距离, 词), ...]，按距离和词排序"""
+        if max_distance is None or max_distance > self.max_distance:
+            max_distance = self.max_distance
+        candidates = set()
+        for variant in _deletions(word, max_distance):
+            candidates |= self.variants.get(variant, set())
+        results = []
+        for candidate in candidates:
+            if abs(len(candidate) - len(word)) > max_distance:
+                continue
+            distance = _edit_distance(word, candidate)
+            if distance <= max_distance:
+                results.append((distance, candidate))
+        return sorted(results)
+
+
+class ColumnIndex:
+    """
+    系统列名的规范化索引
+
+    精确匹配失败时依次尝试: 规范化后匹配(全角/半角括号、空白、大小写)、
+    去掉翻译类后缀后匹配；仍未匹配时通过编辑距离近邻索引给出最相近的系统列名。
+    查询结果会被缓存，大量重复列名只计算一次
+    """
+
+    # 常见的翻译/原文类后缀
+    TRANSLATION_SUFFIXES = ('(翻译)', '(译文)', '(中文)', '(英文)', '(原文)', '(小语种原文)')
+
+    def __init__(self, columns):
+        self.columns = set(columns)
+        self.normalized = {}
+        for column in columns:
+            self.normalized.setdefault(normalize_column_name(column), column)
+        self.suffixes = [normalize_column_name(suffix) for suffix in self.TRANSLATION_SUFFIXES]
+        self.neighbors = DeletionIndex(self.normalized, max_distance=2)
+        self._cache = {}
+
+    def match(self, name):
+        """返回 name 对应的系统列名，无法对应时返回 None"""
+        return self.lookup(name)[0]
+
+    def suggest(self, name, limit=3):
+        """返回与 name 最相近的系统列名列表"""
+        return self.lookup(name, limit)[1]
+
+    def lookup(self, name, limit=3):
+        """返回 (对应的系统列名或 None, 相近系统列名列表)"""
+        key = (name, limit)
+        if key not in self._cache:
+            self._cache[key] = self._lookup(name, limit)
+        return self._cache[key]
+
+    def _lookup(self, name, limit):
+        if name in self.columns:
+            return name, []
+
+        normalized = normalize_column_name(name)
+        if normalized in self.normalized:
+            return self.normalized[normalized], []
+        for suffix in self.suffixes:
+            if normalized.endswith(suffix) and normalized[:-len(suffix)] in self.normalized:
+                return self.normalized[normalized[:-len(suffix)]], []
+
+        # 短列名允许的编辑距离更小，避免两个字的列名匹配到所有两字列名
+        max_distance = min(2, max(1, len(normalized) // 3))
+        matches = self.neighbors.search(normalized, max_distance)
+        return None, [self.normalized[word] for _, word in matches[:limit]]
+
+
+_system_column_index = None
+
+
+def get_column_index():
+    """返回由 SYSTEM_COLUMNS 构建的列名索引，首次调用时构建，之后复用"""
+    global _system_column_index
+    if _system_column_index is None:
+        _system_column_index = ColumnIndex(SYSTEM_COLUMNS)
+    return _system_column_index
+
+
+# 支持的 Excel 文件扩展名
+EXCEL_EXTENSIONS = ('.xlsx', '.xls', '.xlsm')
+
+# 文件遍历与处理之间的队列长度
+DEFAULT_QUEUE_SIZE = 1000
+
+
+def _match_any(rel_path, name, patterns):
+    """相对路径或文件名匹配任一通配符模式"""
+    return any(fnmatch.fnmatch(rel_path, pattern) or fnmatch.fnmatch(name, pattern)
+               for pattern in patterns)
+
+
+def iter_excel_files(directory, include=None, exclude=None):
+    """
+    使用 os.scandir 单次遍历目录，边遍历边产出 Excel 文件路径
+
+    每个目录内按名称排序后深度优先遍历，产出顺序与 sorted(路径列表) 一致；
+    跳过 Office 打开文件时生成的 ~$ 锁文件。include/exclude 为通配符列表，
+    与相对路径或文件名匹配；exclude 匹配的目录整体跳过
+    """
+    include = list(include or [])
+    exclude = list(exclude or [])
+
+    def walk(current, rel_dir):
+        try:
+            with os.scandir(current) as it:
+                entries = sorted(it, key=lambda entry: entry.name)
+        except OSError as e:
+            print(f"  ⚠️ 无法读取目录: {current} ({e})")
+            return
+
+        for entry in entries:
+            rel_path = rel_dir + entry.name
+            if exclude and _match_any(rel_path, entry.name, exclude):
+                continue
+            try:
+                is_dir = entry.is_dir(follow_symlinks=False)
+            except OSError:
+                continue
+            if is_dir:
+                yield from walk(entry.path, rel_path + '/')
+            elif entry.name.startswith('~$') or not entry.name.lower().endswith(EXCEL_EXTENSIONS):
+                continue
+            elif not include or _match_any(rel_path, entry.name, include):
+                yield Path(entry.path)
+
+    yield from walk(Path(directory), '')
+
+
+def find_excel_files(directory, include=None, exclude=None):
+    """递归查找所有 Excel 文件(按路径排序)"""
+    return list(iter_excel_files(directory, include, exclude))
+
+
+def prefetch(iterable, maxsize=DEFAULT_QUEUE_SIZE):
+    """
+    在后台线程中迭代 iterable，通过有界队列逐个交给调用方
+
+    用于让目录遍历(网络盘上可能很慢)与文件处理同时进行：处理第一个文件时
+    遍历仍在继续；队列满时遍历线程等待，内存占用有上限。遍历中的异常在调用方重新抛出
+    """
+    items = queue.Queue(maxsize=maxsize)
+    done = object()
+    stop = threading.Event()
+
+    def put(item, error=None):
+        # 队列满时定期检查调用方是否已停止迭代，避免线程永久阻塞
+        while not stop.is_set():
+            try:
+                items.put((item, error), timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce():
+        try:
+            for item in iterable:
+                if not put(item):
+                    return
+        except BaseException as e:
+            put(done, e)
+            return
+        put(done)
+
+    worker = threading.Thread(target=produce, daemon=True)
+    worker.start()
+    try:
+        while True:
+            item, error = items.get()
+            if item is done:
+                if error is not None:
+                    raise error
+                return
+            yield item
+    finally:
+        # 调用方提前结束迭代时通知遍历线程退出
+        stop.set()
+
+
+class JsonlRecorder:
+    """
+    以 JSON Lines 格式输出处理结果，供看板等程序读取
+
+    每个文件输出一条 {"type": "file", ...} 记录，结束时输出一条
+    {"type": "summary", ...} 汇总记录(文件数、字节数、各阶段耗时和吞吐量)
+    """
+
+    STAGES = ('open', 'parse', 'write')
+
+    def __init__(self, stream, function):
+        self.stream = stream
+        self.function = function
+        self.start = time.perf_counter()
+        self.status_counts = Counter()
+        self.bytes_read = 0
+        self.bytes_written = 0
+        self.timings = dict.fromkeys(self.STAGES, 0.0)
+        self.totals = Counter()
+
+    def _write(self, record):
+        self.stream.write(json.dumps(record, ensure_ascii=False) + '\n')
+        self.stream.flush()
+
+    def file(self, path, status, stats=None, **fields):
+        """输出单个文件的记录；stats 为各阶段耗时和 bytes_read/bytes_written"""
+        stats = stats or {}
+        timings = {stage: round(stats[stage], 6) for stage in self.STAGES if stage in stats}
+        record = {
+            'type': 'file',
+            'function': self.function,
+            'path': str(path),
+            'status': status,
+            'bytes_read': stats.get('bytes_read', 0),
+            'bytes_written': stats.get('bytes_written', 0),
+            'timings': timings,
+            'elapsed': round(sum(timings.values()), 6),
+        }
+        record.update(fields)
+        self.status_counts[status] += 1
+        self.bytes_read += record['bytes_read']
+        self.bytes_written += record['bytes_written']
+        for stage, seconds in timings.items():
+            self.timings[stage] += seconds
+        for name in ('rows_kept',):
+            if isinstance(fields.get(name), int):
+                self.totals[name] += fields[name]
+        self._write(record)
+
+    def summary(self, **fields):
+        """输出汇总记录"""
+        elapsed = time.perf_counter() - self.start
+        files = sum(self.status_counts.values())
+        record = {
+            'type': 'summary',
+            'function': self.function,
+            'files': files,
+            'status': dict(self.status_counts),
+            'bytes_read': self.bytes_read,
+            'bytes_written': self.bytes_written,
+            'timings': {stage: round(seconds, 6) for stage, seconds in self.timings.items()},
+            'elapsed': round(elapsed, 6),
+            'files_per_sec': round(files / elapsed, 3) if elapsed > 0 else None,
+            'mb_read_per_sec': round(self.bytes_read / 1024 / 1024 / elapsed, 3) if elapsed > 0 else None,
+        }
+        record.update(self.totals)
+        record.update(fields)
+        self._write(record)
+
+
+def _local_name(tag):
+    """去掉 XML 标签/属性名中的命名空间部分"""
+    return tag.rsplit('}', 1)[-1]
+
+
+def _column_index(cell_ref):
+    """将单元格引用(如 "AB1")转换为从 0 开始的列序号"""
+    index = 0
+    for ch in cell_ref:
+        if not ch.isalpha():
+            break
+        index = index * 26 + (ord(ch.upper()) - ord('A') + 1)
+    return index - 1
+
+
+def _xlsx_parts(zf):
+    """
+    解析 workbook.xml 及其关系文件
+
+    返回 (工作表列表, 共享字符串路径)，工作表列表按工作簿顺序排列，
+    每项为 (工作表名, 工作表 XML 在 zip 中的路径)
+    """
+    targets = {}
+    shared_strings = None
+    with zf.open('xl/_rels/workbook.xml.rels') as f:
+        for _, elem in ET.iterparse(f):
+            if _local_name(elem.tag) != 'Relationship':
+                continue
+            target = elem.get('Target', '')
+            if target.startswith('/'):
+                target = target.lstrip('/')
+            else:
+                target = posixpath.normpath(posixpath.join('xl', target))
+            targets[elem.get('Id')] = target
+            if elem.get('Type', '').endswith('/sharedStrings'):
+                shared_strings = target
+
+    sheets = []
+    with zf.open('xl/workbook.xml') as f:
+        for _, elem in ET.iterparse(f):
+            if _local_name(elem.tag) != 'sheet':
+                continue
+            rel_id = next((v for k, v in elem.attrib.items()
+                           if k.startswith('{') and _local_name(k) == 'id'), None)
+            if rel_id in targets:
+                sheets.append((elem.get('name'), targets[rel_id]))
+    return sheets, shared_strings
+
+
+def _string_item_text(elem):
+    """拼接 <si>/<is> 中的文本，忽略注音(rPh)部分"""
+    parts = []
+    for child in elem:
+        name = _local_name(child.tag)
+        if name == 't':
+            parts.append(child.text or '')
+        elif name == 'r':
+            parts.extend(t.text or '' for t in child if _local_name(t.tag) == 't')
+    return ''.join(parts)
+
+
+def _read_first_row(zf, sheet_part):
+    """
+    流式读取工作表 XML，读到第一个 <row> 元素结束为止
+
+    返回第 1 行的 {列序号: (单元格类型, 原始值)}，后续行不会被解析。
+    与 pandas 一致，第 1 行为空(或 XML 中第一个行元素不是第 1 行)时返回空字典
+    """
+    cells = {}
+    with zf.open(sheet_part) as f:
+        for _, elem in ET.iterparse(f):
+            if _local_name(elem.tag) != 'row':
+                continue
+            if elem.get('r', '1') != '1':
+                break
+            next_col = 0
+            for cell in elem:
+                if _local_name(cell.tag) != 'c':
+                    continue
+                ref = cell.get('r')
+                col = _column_index(ref) if ref else next_col
+                next_col = col + 1
+                cell_type = cell.get('t', 'n')
+                value = None
+                for child in cell:
+                    name = _local_name(child.tag)
+                    if name == 'v':
+                        value = child.text
+                    elif name == 'is':
+                        value = _string_item_text(child)
+                if value is not None:
+                    cells[col] = (cell_type, value)
+            break
+    return cells
+
+
+def _read_shared_strings(zf, part, indices):
+    """只查找指定序号的共享字符串，读到最大序号后立即停止"""
+    wanted = set(indices)
+    result = {}
+    if not wanted:
+        return result
+    last = max(wanted)
+    with zf.open(part) as f:
+        idx = 0
+        for _, elem in ET.iterparse(f):
+            if _local_name(elem.tag) != 'si':
+                continue
+            if idx in wanted:
+                result[idx] = _string_item_text(elem)
+            elem.clear()
+            if idx >= last:
+                break
+            idx += 1
+    return result
+
+
+def _dedupe_headers(headers):
+    """与 pandas 保持一致：重复列名依次追加 .1、.2 后缀"""
+    counts = {}
+    result = []
+    for name in headers:
+        count = counts.get(name, 0)
+        while count > 0:
+            counts[name] = count + 1
+            name = f"{name}.{count}"
+            count = counts.get(name, 0)
+        counts[name] = count + 1
+        result.append(name)
+    return result
+
+
+class CountingFile:
+    """以二进制只读方式打开文件，统计实际读取的字节数，其余方法直接转发"""
+
+    def __init__(self, file_path):
+        self._file = open(file_path, 'rb')
+        self.bytes_read = 0
+
+    def read(self, size=-1):
+        data = self._file.read(size)
+        self.bytes_read += len(data)
+        return data
+
+    def __getattr__(self, name):
+        return getattr(self._file, name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self._file.close()
+
+
+def _add_timing(stats, stage, start):
+    """把从 start 到现在的耗时累加到 stats[stage]，stats 为 None 时忽略"""
+    if stats is not None:
+        stats[stage] = stats.get(stage, 0.0) + time.perf_counter() - start
+
+
+def read_xlsx_headers(file_path, stats=None):
+    """
+    只读取 .xlsx/.xlsm 第一个工作表的第一行(列头)
+
+    直接打开 zip 包，流式解析工作表 XML 到第一行结束为止，
+    共享字符串也只查找第一行引用到的序号，不加载样式和其余数据。
+    结果与 pd.read_excel(nrows=0) 的列名保持一致(空列头为 "Unnamed: N"，重复列头追加 .1、.2，
+    布尔列头为 True/False，数值列头为 int/float，第 1 行为空时返回空列表)。
+    stats 为字典时累加 open/parse 各阶段耗时(秒)和实际读取的字节数 bytes_read
+    """
+    start = time.perf_counter()
+    with CountingFile(file_path) as f, zipfile.ZipFile(f) as zf:
+        sheets, shared_strings_part = _xlsx_parts(zf)
+        if not sheets:
+            raise ValueError("工作簿中没有工作表")
+        _add_timing(stats, 'open', start)
+
+        start = time.perf_counter()
+        cells = _read_first_row(zf, sheets[0][1])
+
+        shared_indices = [int(value) for cell_type, value in cells.values()
+                          if cell_type == 's']
+        shared = {}
+        if shared_indices and shared_strings_part:
+            shared = _read_shared_strings(zf, shared_strings_part, shared_indices)
+        _add_timing(stats, 'parse', start)
+        if stats is not None:
+            stats['bytes_read'] = stats.get('bytes_read', 0) + f.bytes_read
+
+    values = {}
+    for col, (cell_type, value) in cells.items():
+        if cell_type == 's':
+            value = shared.get(int(value))
+        elif cell_type == 'b':
+            value = value == '1'
+        elif cell_type == 'n' and value:
+            # 与 pandas 一致: 整数值的数字返回 int
+            number = float(value)
+            value = int(number) if number.is_integer() else number
+        if value is not None and value != '':
+            values[col] = value
+
+    if not values:
+        return []
+    headers = [values.get(col, f"Unnamed: {col}") for col in range(max(values) + 1)]
+    return _dedupe_headers(headers)
+
+
+def load_excel_headers(file_path, stats=None):
+    """
+    读取 Excel 文件的第一行(列头)，读取失败时抛出异常
+
+    列头统一转换为字符串(布尔、数值等列头与文本列头可以一起排序和拼接)，
+    快速路径与 pandas 回退的结果一致。
+    stats 为字典时累加各阶段耗时和读取的字节数(见 read_xlsx_headers)
+    """
+    # .xlsx/.xlsm 优先走只读第一行的流式解析，失败时回退到 pandas
+    if Path(file_path).suffix.lower() in ('.xlsx', '.xlsm'):
+        try:
+            return [str(header) for header in read_xlsx_headers(file_path, stats)]
+        except TimeoutError:
+            # _scan_file_headers 的超时，不能回退到不受限时的 pandas 重新读取
+            raise
+        except Exception:
+            pass
+
+    # pandas 导入较慢，只在回退时导入
+    import pandas as pd
+
+    start = time.perf_counter()
+    with pd.ExcelFile(file_path) as excel:
+        _add_timing(stats, 'open', start)
+        start = time.perf_counter()
+        df = excel.parse(nrows=0)
+        _add_timing(stats, 'parse', start)
+    if stats is not None:
+        # pandas 按路径读取(需要根据扩展名选择引擎)，读取量按文件大小计
+        stats['bytes_read'] = stats.get('bytes_read', 0) + os.path.getsize(file_path)
+    return [str(header) for header in df.columns]
+
+
+def read_excel_headers(file_path):
+    """读取 Excel 文件的第一行(列头)"""
+    try:
+        return load_excel_headers(file_path)
+    except Exception as e:
+        print(f"  ⚠️ 读取文件失败: {file_path}")
+        print(f"     错误: {str(e)}")
+        return []
+
+
+# 单个文件读取列头的默认超时时间(秒)
+DEFAULT_FILE_TIMEOUT = 120
+
+# 主进程等待工作进程结果时，在 timeout 之外留出的余量(秒)，正常情况下工作进程自己的 SIGALRM 先触发
+WORKER_TIMEOUT_MARGIN = 5
+
+
+def _raise_timeout(signum, frame):
+    raise TimeoutError
+
+
+def _scan_file_headers(file_path, timeout=None):
+    """
+    读取单个文件的列头，返回 (列头列表, 错误信息, 统计信息)
+
+    统计信息包含各阶段耗时(open/parse，秒)和读取的字节数 bytes_read。
+    在进程池的工作进程中运行；timeout 依赖 SIGALRM，仅在 POSIX 系统上生效
+    """
+    stats = {}
+    use_alarm = bool(timeout) and hasattr(signal, 'setitimer')
+    if use_alarm:
+        signal.signal(signal.SIGALRM, _raise_timeout)
+        signal.setitimer(signal.ITIMER_REAL, timeout)
+    try:
+        return load_excel_headers(file_path, stats), None, stats
+    except TimeoutError:
+        return [], f"读取超时(超过 {timeout} 秒)", stats
+    except Exception as e:
+        return [], str(e), stats
+    finally:
+        if use_alarm:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+
+
+def _file_sha1(file_path, chunk_size=1024 * 1024):
+    """计算文件内容的 SHA-1"""
+    digest = hashlib.sha1()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _file_fingerprint(file_path, use_hash=False):
+    """返回缓存判断文件是否变化所需的 (文件大小, 修改时间, 内容哈希)，未启用哈希时内容哈希为 None"""
+    stat = os.stat(file_path)
+    return stat.st_size, stat.st_mtime_ns, _file_sha1(file_path) if use_hash else None
+
+
+def _scan_file_for_cache(file_path, timeout=None, use_hash=False, expected=None):
+    """
+    读取列头并计算文件指纹，返回 (列头列表, 错误信息, 统计信息, 指纹)
+
+    指纹在读取列头前计算，与 _scan_file_headers 一起在工作进程中运行，
+    启用 --cache-hash 时主进程无需再串行计算每个文件的哈希。
+    expected 为 HeaderCache.get 返回的待校验记录 (内容哈希, 列头)，哈希相同时
+    直接返回缓存的列头，统计信息为 {'cached': True}
+    """
+    try:
+        fingerprint = _file_fingerprint(file_path, use_hash)
+    except OSError as e:
+        return [], str(e), {}, None
+    if expected is not None and fingerprint[2] == expected[0]:
+        return expected[1], None, {'cached': True}, fingerprint
+    headers, error, stats = _scan_file_headers(file_path, timeout)
+    return headers, error, stats, fingerprint
+
+
+class HeaderCache:
+    """
+    基于 SQLite 的列头缓存
+
+    以 文件路径 + 文件大小 + 修改时间 判断文件是否变化；启用 use_hash 后
+    额外保存内容哈希，大小一致但修改时间变化(如复制、touch)时用哈希确认
+    内容未变，避免重新解析
+    """
+
+    # 累计写入多少条记录后提交一次事务
+    COMMIT_INTERVAL = 500
+
+    def __init__(self, db_path, use_hash=False):
+        self.db_path = Path(db_path)
+        self.use_hash = use_hash
+        self.conn = sqlite3.connect(str(self.db_path))
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS headers ("
+            " path TEXT PRIMARY KEY,"
+            " size INTEGER NOT NULL,"
+            " mtime_ns INTEGER NOT NULL,"
+            " content_hash TEXT,"
+            " headers TEXT NOT NULL,"
+            " updated_at REAL NOT NULL)"
+        )
+        self.hits = 0
+        self.misses = 0
+        self.evicted = 0
+        self._pending = 0
+
+    @staticmethod
+    def _key(file_path):
+        return os.path.abspath(file_path)
+
+    def get(self, file_path):
+        """
+        查找文件的缓存记录，返回 (列头, 待校验记录)
+
+        大小和修改时间未变时返回 (缓存的列头, None)；启用 use_hash 且只有修改时间变化时
+        返回 (None, (内容哈希, 列头))，由读取列头的工作进程计算哈希后调用 confirm 或 reject；
+        文件为新文件、已变化或已不存在时返回 (None, None)
+        """
+        key = self._key(file_path)
+        row = self.conn.execute(
+            "SELECT size, mtime_ns, content_hash, headers FROM headers WHERE path = ?",
+            (key,)
+        ).fetchone()
+        if row is None:
+            self.misses += 1
+            return None, None
+
+        size, mtime_ns, content_hash, headers = row
+        try:
+            stat = os.stat(file_path)
+        except OSError:
+            # 扫描过程中文件被删除或重命名，按未命中处理，由读取列头时报告错误
+            self.misses += 1
+            return None, None
+        if stat.st_size == size and stat.st_mtime_ns == mtime_ns:
+            self.hits += 1
+            return json.loads(headers), None
+        if self.use_hash and content_hash and stat.st_size == size:
+            return None, (content_hash, json.loads(headers))
+
+        # 文件已变化，淘汰旧记录
+        self.reject(file_path)
+        return None, None
+
+    def confirm(self, file_path, fingerprint):
+        """内容哈希与缓存记录相同: 更新记录的修改时间，计为命中"""
+        size, mtime_ns, _ = fingerprint
+        self.conn.execute(
+            "UPDATE headers SET size = ?, mtime_ns = ?, updated_at = ? WHERE path = ?",
+            (size, mtime_ns, time.time(), self._key(file_path))
+        )
+        self._mark_dirty()
+        self.hits += 1
+
+    def reject(self, file_path):
+        """文件内容已变化: 淘汰缓存记录，计为未命中"""
+        self.conn.execute("DELETE FROM headers WHERE path = ?", (self._key(file_path),))
+        self._mark_dirty()
+        self.evicted += 1
+        self.misses += 1
+
+    def put(self, file_path, headers, fingerprint=None):
+        """写入文件的列头，fingerprint 为 _file_fingerprint 的结果，未传入时在此计算"""
+        if fingerprint is None:
+            fingerprint = _file_fingerprint(file_path, self.use_hash)
+        size, mtime_ns, content_hash = fingerprint
+        self.conn.execute(
+            "INSERT OR REPLACE INTO headers"
+            " (path, size, mtime_ns, content_hash, headers, updated_at)"
+            " VALUES (?, ?, ?, ?, ?, ?)",
+            (self._key(file_path), size, mtime_ns, content_hash,
+             json.dumps(headers, ensure_ascii=False), time.time())
+        )
+        self._mark_dirty()
+
+    def prune(self, root=None):
+        """删除已不存在的文件对应的记录，root 不为空时只检查该目录下的记录，返回删除条数"""
+        query = "SELECT path FROM headers"
+        params = ()
+        if root is not None:
+            prefix = os.path.join(os.path.abspath(root), '')
+            query += " WHERE substr(path, 1, ?) = ?"
+            params = (len(prefix), prefix)
+
+        removed = [path for (path,) in self.conn.execute(query, params).fetchall()
+                   if not os.path.exists(path)]
+        self.conn.executemany("DELETE FROM headers WHERE path = ?",
+                              [(path,) for path in removed])
+        self.conn.commit()
+        return len(removed)
+
+    def count(self):
+        return self.conn.execute("SELECT COUNT(*) FROM headers").fetchone()[0]
+
+    def _mark_dirty(self):
+        self._pending += 1
+        if self._pending >= self.COMMIT_INTERVAL:
+            self.conn.commit()
+            self._pending = 0
+
+    def close(self):
+        self.conn.commit()
+        self.conn.close()
+
+
+def _terminate_pool(executor):
+    """结束进程池的全部工作进程，用于 SIGALRM 无法中断(如卡在 C 扩展中)的读取"""
+    terminate = getattr(executor, 'terminate_workers', None)
+    if terminate is not None:
+        # Python 3.14+
+        terminate()
+        return
+    processes = list((executor._processes or {}).values())
+    executor.shutdown(wait=False, cancel_futures=True)
+    for process in processes:
+        process.terminate()
+
+
+def iter_file_headers(excel_files, jobs=1, timeout=DEFAULT_FILE_TIMEOUT, cache=None):
+    """
+    按 excel_files 的顺序依次产出 (文件路径, 列头列表, 错误信息, 统计信息)
+
+    excel_files 可以是边遍历边产出的迭代器，每拿到一个文件就开始处理。
+    jobs > 1 时把列头读取分发到进程池，同时处理中的文件数有上限；每个文件完成
+    且排在它前面的文件都已产出后立即返回，因此输出顺序与单进程模式完全一致。
+    传入 HeaderCache 时，未变化的文件直接使用缓存结果，只解析新增或变化的文件，
+    此时统计信息为 {'cached': True}。
+    主进程等待每个结果最多 timeout 秒(另加余量)，卡住的工作进程按超时记为失败，
+    不会阻塞后续文件的产出；结束时卡住的工作进程被强制结束
+    """
+    def lookup(file_path):
+        return cache.get(file_path) if cache is not None else (None, None)
+
+    def store(file_path, headers, error, fingerprint, expected):
+        if cache is None:
+            return
+        if expected is not None:
+            if fingerprint is not None and fingerprint[2] == expected[0]:
+                cache.confirm(file_path, fingerprint)
+                return
+            cache.reject(file_path)
+        if not error and fingerprint is not None:
+            cache.put(file_path, headers, fingerprint)
+
+    use_hash = cache is not None and cache.use_hash
+
+    if jobs <= 1:
+        for file_path in excel_files:
+            headers, expected = lookup(file_path)
+            if headers is not None:
+                yield file_path, headers, None, {'cached': True}
+                continue
+            headers, error, stats, fingerprint = _scan_file_for_cache(file_path, timeout, use_hash, expected)
+            store(file_path, headers, error, fingerprint, expected)
+            yield file_path, headers, error, stats
+        return
+
+    wait_limit = timeout + WORKER_TIMEOUT_MARGIN if timeout else None
+    hung = []
+
+    def finish(file_path, result, expected):
+        if isinstance(result, list):
+            return file_path, result, None, {'cached': True}
+        try:
+            headers, error, stats, fingerprint = result.result(timeout=wait_limit)
+        except FuturesTimeoutError:
+            hung.append(result)
+            headers, error, stats, fingerprint = [], f"读取超时(超过 {timeout} 秒)", {}, None
+        except Exception as e:
+            # 工作进程异常退出等情况
+            headers, error, stats, fingerprint = [], str(e), {}, None
+        store(file_path, headers, error, fingerprint, expected)
+        return file_path, headers, error, stats
+
+    # 同时提交的文件数上限，保证遍历产出的路径不会无限堆积在内存中
+    window = jobs * 4
+    executor = ProcessPoolExecutor(max_workers=jobs)
+    try:
+        pending = deque()
+        for file_path in excel_files:
+            headers, expected = lookup(file_path)
+            if headers is not None:
+                pending.append((file_path, headers, None))
+            else:
+                future = executor.submit(_scan_file_for_cache, file_path, timeout, use_hash, expected)
+                pending.append((file_path, future, expected))
+            while pending and (len(pending) >= window or isinstance(pending[0][1], list)
+                               or pending[0][1].done()):
+                yield finish(*pending.popleft())
+
+        while pending:
+            yield finish(*pending.popleft())
+    finally:
+        if any(not future.done() for future in hung):
+            _terminate_pool(executor)
+        else:
+            executor.shutdown()
+
+
+class ColumnStats:
+    """
+    全部文件的列名统计
+
+    逐个文件累加: 每个列名出现的文件数及文件列表、未识别列名两两同时出现的次数。
+    多个 ColumnStats 可通过 merge 合并，便于分批或分进程统计后汇总
+    """
+
+    def __init__(self):
+        self.file_count = 0
+        self.counts = Counter()
+        self.files = defaultdict(list)
+        self.pairs = Counter()
+
+    def add(self, file_path, headers):
+        """累加一个文件的列头"""
+        self.file_count += 1
+        columns = sorted({str(header) for header in headers})
+        for column in columns:
+            self.counts[column] += 1
+            self.files[column].append(str(file_path))
+        unrecognized = [column for column in columns if column not in SYSTEM_COLUMNS]
+        self.pairs.update(combinations(unrecognized, 2))
+
+    def merge(self, other):
+        """合并另一份统计结果"""
+        self.file_count += other.file_count
+        self.counts.update(other.counts)
+        for column, files in other.files.items():
+            self.files[column].extend(files)
+        self.pairs.update(other.pairs)
+        return self
+
+    def to_dict(self):
+        """转换为可序列化的字典，列名按出现次数降序排列"""
+        column_index = get_column_index()
+        columns = []
+        for column, count in sorted(self.counts.items(), key=lambda item: (-item[1], item[0])):
+            match, suggestions = column_index.lookup(column)
+            columns.append({
+                'column': column,
+                'recognized': column in SYSTEM_COLUMNS,
+                'file_count': count,
+                'match': match if column not in SYSTEM_COLUMNS else None,
+                'suggestions': suggestions,
+                'files': sorted(self.files[column]),
+            })
+        pairs = [{'columns': list(pair), 'file_count': count}
+                 for pair, count in sorted(self.pairs.items(), key=lambda item: (-item[1], item[0]))]
+        return {
+            'total_files': self.file_count,
+            'columns': columns,
+            'unrecognized_cooccurrence': pairs,
+        }
+
+    def write(self, report_path):
+        """
+        写出统计报告
+
+        .csv 时写出列名统计，同时在同目录写出 <文件名>_cooccurrence.csv；
+        其他扩展名写出 JSON
+        """
+        report_path = Path(report_path)
+        report_path.parent.mkdir(parents=True, exist_ok=True)
+        data = self.to_dict()
+
+        if report_path.suffix.lower() != '.csv':
+            with open(report_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False, indent=2)
+            return [report_path]
+
+        pairs_path = report_path.with_name(f"{report_path.stem}_cooccurrence.csv")
+        # 使用 utf-8-sig 以便 Excel 直接打开不乱码
+        with open(report_path, 'w', encoding='utf-8-sig', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(['列名', '是否识别', '出现文件数', '对应系统列名', '相近列名', '文件列表'])
+            for item in data['columns']:
+                writer.writerow([item['column'], '是' if item['recognized'] else '否',
+                                 item['file_count'], item['match'] or '',
+                                 ';'.join(item['suggestions']), ';'.join(item['files'])])
+        with open(pairs_path, 'w', encoding='utf-8-sig', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(['列名A', '列名B', '同时出现文件数'])
+            for item in data['unrecognized_cooccurrence']:
+                writer.writerow([*item['columns'], item['file_count']])
+        return [report_path, pairs_path]
+
+
+def check_unrecognized_columns(input_directory, jobs=1, timeout=DEFAULT_FILE_TIMEOUT, cache=None,
+                               report_path=None, include=None, exclude=None, records=None):
+    """
+    功能1: 检测未被系统识别的列名
+
+    jobs > 1 时使用多进程并行读取列头，timeout 为单个文件的超时时间(秒)，
+    cache 为 HeaderCache 时跳过未变化的文件，
+    report_path 不为空时写出列名出现频次和共现统计报告(JSON/CSV)，
+    include/exclude 为文件通配符过滤。目录遍历与列头读取同时进行。
+    records 为文本流时按 JSONL 格式输出每个文件的结果和汇总(见 JsonlRecorder)
+    """
+    print("\n" + "="*80)
+    print("功能1: 检测未被系统识别的列名")
+    print("="*80)
+    
+    input_path = Path(input_directory)
+    if not input_path.exists():
+        print(f"❌ 错误: 目录不存在 - {input_directory}")
+        return
+    
+    if jobs > 1:
+        print(f"\n✓ 并行进程数: {jobs}")
+    print()
+    
+    # 收集所有未识别的列名
+    unrecognized_columns_all = set()
+    stats = ColumnStats() if report_path else None
+    recorder = JsonlRecorder(records, 'check_columns') if records is not None else None
+    file_count = 0
+    
+    # 边遍历目录边处理(按路径排序，并行模式下结果同样按此顺序输出)
+    excel_files = prefetch(iter_excel_files(input_directory, include, exclude))
+    file_results = iter_file_headers(excel_files, jobs=jobs, timeout=timeout, cache=cache)
+    for idx, (file_path, headers, error, file_stats) in enumerate(file_results, 1):
+        file_count = idx
+        relative_path = file_path.relative_to(input_path)
+        print(f"[{idx}] 处理: {relative_path}")
+        
+        if error:
+            print(f"  ⚠️ 读取文件失败: {file_path}")
+            print(f"     错误: {error}")
+            if recorder is not None:
+                recorder.file(relative_path, 'error', file_stats, error=error)
+            continue
+        if stats is not None and headers:
+            stats.add(file_path, headers)
+        
+        # 找出未被识别的列名
+        unrecognized = set(headers) - set(SYSTEM_COLUMNS)
+        if recorder is not None:
+            recorder.file(relative_path, 'cached' if file_stats.get('cached') else 'ok', file_stats,
+                          headers=headers, unrecognized=sorted(unrecognized))
+        if not headers:
+            continue
+        
+        if unrecognized:
+            print(f"  → 发现 {len(unrecognized)} 个未识别列名: {', '.join(sorted(unrecognized))}")
+            unrecognized_columns_all.update(unrecognized)
+        else:
+            print(f"  → 所有列名均已识别")
+    
+    if recorder is not None:
+        recorder.summary(unrecognized=sorted(unrecognized_columns_all))
+    
+    if not file_count:
+        print(f"❌ 未找到任何 Excel 文件在目录: {input_directory}")
+        return
+    
+    # 输出汇总结果
+    print("\n" + "="*80)
+    print("汇总结果")
+    print("="*80)
+    print(f"\n✓ 共检查 {file_count} 个 Excel 文件")
+    
+    if unrecognized_columns_all:
+        print(f"\n共发现 {len(unrecognized_columns_all)} 个未被系统识别的列名:\n")
+        column_index = get_column_index()
+        for col in sorted(unrecognized_columns_all):
+            match, suggestions = column_index.lookup(col)
+            if match is not None:
+                print(f"  • {col}  → 规范化后对应: {match}")
+            elif suggestions:
+                print(f"  • {col}  → 相近列名: {', '.join(suggestions)}")
+            else:
+                print(f"  • {col}")
+    else:
+        print("\n✓ 所有文件的列名均已被系统识别")
+    
+    if cache is not None:
+        print(f"\n缓存统计: 命中 {cache.hits} 个, 未命中 {cache.misses} 个, "
+              f"淘汰过期记录 {cache.evicted} 个")
+    
+    if stats is not None:
+        written = stats.write(report_path)
+        print(f"\n列名统计报告已保存到: {', '.join(str(path) for path in written)}")
+    
+    print("\n" + "="*80 + "\n")
+
+
+def prune_header_cache(cache, root=None):
+    """清理列头缓存中已被删除的文件记录"""
+    print("\n" + "="*80)
+    print("清理列头缓存")
+    print("="*80)
+    
+    before = cache.count()
+    removed = cache.prune(root)
+    
+    print(f"\n缓存文件: {cache.db_path}")
+    if root is not None:
+        print(f"检查范围: {root}")
+    print(f"清理前记录数: {before}")
+    print(f"删除记录数: {removed}")
+    print(f"剩余记录数: {before - removed}")
+    print("\n" + "="*80 + "\n")
+
+
+def _copy_cell(ws_out, cell):
+    """将只读单元格复制为只写单元格，保留值和数字格式(日期、数值格式)"""
+    if cell.value is None:
+        return None
+    from openpyxl.cell import WriteOnlyCell
+
+    new_cell = WriteOnlyCell(ws_out, value=cell.value)
+    number_format = getattr(cell, 'number_format', 'General')
+    if number_format and number_format != 'General':
+        new_cell.number_format = number_format
+    return new_cell
+
+
+def _discard_workbook(wb_out):
+    """
+    放弃未保存的只写工作簿: 关闭各工作表的写入流
+
+    只写工作表写入中途出错时，未关闭的写入流在被回收时会输出 lxml 的异常信息
+    """
+    for ws in wb_out.worksheets:
+        with contextlib.suppress(Exception):
+            ws.close()
+
+
+def simplify_workbook_streaming(file_path, output_file, max_rows, stats=None):
+    """
+    流式精简单个 .xlsx/.xlsm 文件
+
+    使用 openpyxl 只读/只写模式逐行复制每个工作表的列头和前 max_rows 行，
+    读到第 max_rows + 1 行后即停止解析该工作表，不经过 DataFrame。
+    stats 为字典时累加 open/parse/write 各阶段耗时(秒)和读取的字节数 bytes_read。
+    失败时不留下不完整的输出文件。返回 {工作表名: 保留的数据行数}
+    """
+    from openpyxl import load_workbook, Workbook
+
+    output_file = Path(output_file)
+    # 先写临时文件再替换，避免中断时留下不完整的目标文件
+    tmp_file = output_file.with_name(output_file.name + '.tmp')
+    with CountingFile(file_path) as f:
+        start = time.perf_counter()
+        wb_in = load_workbook(f, read_only=True, data_only=True)
+        _add_timing(stats, 'open', start)
+        wb_out = Workbook(write_only=True)
+        kept_rows = {}
+        try:
+            start = time.perf_counter()
+            for ws in wb_in.worksheets:
+                ws_out = wb_out.create_sheet(title=ws.title)
+                row_count = 0
+                for row in ws.iter_rows(max_row=max_rows + 1):
+                    ws_out.append([_copy_cell(ws_out, cell) for cell in row])
+                    row_count += 1
+                kept_rows[ws.title] = max(row_count - 1, 0)
+            if not kept_rows:
+                wb_out.create_sheet()
+            _add_timing(stats, 'parse', start)
+            start = time.perf_counter()
+            wb_out.save(tmp_file)
+            os.replace(tmp_file, output_file)
+            _add_timing(stats, 'write', start)
+        except BaseException:
+            _discard_workbook(wb_out)
+            raise
+        finally:
+            wb_in.close()
+            if tmp_file.exists():
+                tmp_file.unlink()
+        if stats is not None:
+            stats['bytes_read'] = stats.get('bytes_read', 0) + f.bytes_read
+    return kept_rows
+
+
+def simplify_workbook(file_path, output_file, max_rows, stats=None):
+    """
+    用 pandas 精简单个文件，只保留第一个工作表的列头和前 max_rows 行
+
+    stats 为字典时累加 open/parse/write 各阶段耗时(秒)和读取的字节数 bytes_read
+    (pandas 读取的字节数按文件大小计)。
+    返回保留的数据行数
+    """
+    import pandas as pd
+
+    start = time.perf_counter()
+    with pd.ExcelFile(file_path) as excel:
+        _add_timing(stats, 'open', start)
+        start = time.perf_counter()
+        # 只读取前 max_rows 行数据
+        df = excel.parse(nrows=max_rows)
+        _add_timing(stats, 'parse', start)
+    if stats is not None:
+        stats['bytes_read'] = stats.get('bytes_read', 0) + os.path.getsize(file_path)
+
+    # 写入精简后的数据
+    start = time.perf_counter()
+    df.to_excel(output_file, index=False, engine='openpyxl')
+    _add_timing(stats, 'write', start)
+    return len(df)
+
+
+class RowSampler:
+    """
+    单遍扫描的行抽样器(水塘抽样)
+
+    不指定 key 时从所有行中等概率抽取 size 行；指定 key(行 -> 分组值)时按分组
+    分层抽样，每组各保留一个水塘，容量为 ceil(size / 分组数)，出现新分组时把已有
+    水塘随机缩减到新容量，因此分组数不超过 size 时内存为 O(size)。
+    seed 相同时抽样结果相同
+    """
+
+    def __init__(self, size, seed=None, key=None):
+        self.size = size
+        self.key = key
+        self.rng = random.Random(seed)
+        self.capacity = size
+        self.count = 0
+        # 分组值 -> [该组已读行数, [(行序号, 行), ...]]
+        self.strata = {}
+        # rows() 选出的行序号
+        self._chosen = set()
+
+    def add(self, row):
+        index = self.count
+        self.count += 1
+        if self.size <= 0:
+            return
+        key = self.key(row) if self.key else None
+        stratum = self.strata.get(key)
+        if stratum is None:
+            stratum = self.strata[key] = [0, []]
+            self._rebalance()
+        stratum[0] += 1
+        seen, reservoir = stratum
+        if len(reservoir) < self.capacity:
+            reservoir.append((index, row))
+        else:
+            slot = self.rng.randrange(seen)
+            if slot < self.capacity:
+                reservoir[slot] = (index, row)
+
+    def _rebalance(self):
+        self.capacity = max(1, -(-self.size // len(self.strata)))
+        for _, reservoir in self.strata.values():
+            if len(reservoir) > self.capacity:
+                reservoir[:] = self.rng.sample(reservoir, self.capacity)
+
+    def rows(self):
+        """返回抽中的行(最多 size 行，按原顺序)；分层时各组轮流取行，使每组数量尽量接近"""
+        groups = [self.rng.sample(reservoir, len(reservoir)) for _, reservoir in self.strata.values()]
+        self.rng.shuffle(groups)
+        chosen = []
+        while len(chosen) < self.size and any(groups):
+            for group in groups:
+                if group and len(chosen) < self.size:
+                    chosen.append(group.pop())
+        chosen.sort(key=lambda item: item[0])
+        self._chosen = {index for index, _ in chosen}
+        return [row for _, row in chosen]
+
+    def group_counts(self):
+        """返回 {分组值: (该组总行数, 抽中行数)}，抽中行数为最近一次 rows() 的结果(调用前为 0)"""
+        return {key: (seen, sum(index in self._chosen for index, _ in reservoir))
+                for key, (seen, reservoir) in self.strata.items()}
+
+
+def sample_workbook(file_path, output_file, max_rows, stratify_by=None, seed=None, stats=None):
+    """
+    抽样精简单个文件: 流式读取第一个工作表的全部数据行，用水塘抽样(或按 stratify_by
+    列分层抽样)选出 max_rows 行，与列头一起写出，行保持原有顺序
+
+    .xlsx/.xlsm 用 openpyxl 只读模式逐行读取并保留数字格式，.xls 用 xlrd；
+    全空的行不参与抽样。内存只与 max_rows 有关。
+    stats 为字典时累加 open/parse/write 各阶段耗时(秒)和读取的字节数 bytes_read。
+    返回 (保留的数据行数, 数据总行数, {分组值: (总行数, 抽中行数)} 或 None)
+    """
+    from openpyxl import load_workbook, Workbook
+
+    start = time.perf_counter()
+    xls = Path(file_path).suffix.lower() == '.xls'
+    if xls:
+        import xlrd
+
+        book = xlrd.open_workbook(str(file_path), on_demand=True)
+        sheet = book.sheet_by_index(0) if book.nsheets else None
+        title = sheet.name if sheet else 'Sheet1'
+        rows = (tuple(_xls_cell_value(cell, book.datemode) for cell in sheet.row(row_idx))
+                for row_idx in range(sheet.nrows)) if sheet else iter(())
+        value = lambda item: item
+        copy_row = list
+        close = book.release_resources
+    else:
+        f = CountingFile(file_path)
+        wb_in = load_workbook(f, read_only=True, data_only=True)
+        ws = wb_in.worksheets[0]
+        title = ws.title
+        rows = ws.iter_rows()
+        value = lambda cell: cell.value
+        copy_row = lambda row: [_copy_cell(ws_out, cell) for cell in row]
+
+        def close():
+            wb_in.close()
+            f.close()
+    _add_timing(stats, 'open', start)
+
+    wb_out = None
+    try:
+        start = time.perf_counter()
+        header = next(rows, None)
+        key = None
+        # 先检查分组列，找不到时不创建输出工作簿
+        if stratify_by:
+            names = [normalize_column_name(value(cell)) for cell in header or ()]
+            target = normalize_column_name(stratify_by)
+            if target not in names:
+                raise ValueError(f"未找到分组列: {stratify_by}")
+            column = names.index(target)
+            key = lambda row: value(row[column]) if column < len(row) else None
+
+        sampler = RowSampler(max_rows, seed, key)
+        for row in rows:
+            if any(value(cell) is not None for cell in row):
+                sampler.add(row)
+        sample = sampler.rows()
+
+        wb_out = Workbook(write_only=True)
+        ws_out = wb_out.create_sheet(title=title)
+        if header is not None:
+            ws_out.append(copy_row(header))
+        for row in sample:
+            ws_out.append(copy_row(row))
+        _add_timing(stats, 'parse', start)
+    except BaseException:
+        if wb_out is not None:
+            _discard_workbook(wb_out)
+        raise
+    finally:
+        close()
+    if stats is not None:
+        stats['bytes_read'] = stats.get('bytes_read', 0) + (
+            os.path.getsize(file_path) if xls else f.bytes_read)
+
+    start = time.perf_counter()
+    wb_out.save(output_file)
+    _add_timing(stats, 'write', start)
+    return len(sample), sampler.count, sampler.group_counts() if key else None
+
+
+def simplify_excel_files(input_directory, max_rows=5, streaming=False, output_directory=None,
+                         include=None, exclude=None, records=None, sample=False, stratify_by=None,
+                         seed=None):
+    """
+    功能2: 精简 Excel 文件，仅保留列头和最多指定条数的数据
+
+    streaming 为 True 时 .xlsx/.xlsm 走流式模式，保留所有工作表，
+    内存和耗时只与 max_rows 有关；.xls 仍使用 pandas。
+    sample 为 True 或指定 stratify_by 列名时不取前 max_rows 行，而是读取第一个工作表的
+    全部数据行抽样(见 sample_workbook)；seed 与文件相对路径一起作为随机种子，
+    结果可复现且与处理顺序无关。
+    output_directory 为空时输出到脚本所在目录的 output 目录，
+    include/exclude 为文件通配符过滤。目录遍历与文件处理同时进行。
+    records 为文本流时按 JSONL 格式输出每个文件的结果和汇总(见 JsonlRecorder)
+    """
+    print("\n" + "="*80)
+    sample = sample or bool(stratify_by)
+    if stratify_by:
+        print(f"功能2: 精简 Excel 文件 (保留列头 + 按 {stratify_by} 分层抽取最多 {max_rows} 条数据)")
+    elif sample:
+        print(f"功能2: 精简 Excel 文件 (保留列头 + 随机抽取最多 {max_rows} 条数据)")
+    else:
+        print(f"功能2: 精简 Excel 文件 (保留列头 + 最多 {max_rows} 条数据)")
+    print("="*80)
+    
+    input_path = Path(input_directory)
+    if not input_path.exists():
+        print(f"❌ 错误: 目录不存在 - {input_directory}")
+        return
+    
+    # 创建输出目录
+    script_dir = Path(__file__).parent
+    output_dir = Path(output_directory) if output_directory else script_dir / "output"
+    output_dir.mkdir(parents=True, exist_ok=True)
+    display_root = output_dir.parent
+    
+    print(f"\n✓ 输出目录: {output_dir}\n")
+    
+    success_count = 0
+    error_count = 0
+    file_count = 0
+    recorder = JsonlRecorder(records, 'simplify') if records is not None else None
+    
+    # 边遍历目录边处理每个文件
+    for idx, file_path in enumerate(prefetch(iter_excel_files(input_directory, include, exclude)), 1):
+        file_count = idx
+        relative_path = file_path.relative_to(input_path)
+        print(f"[{idx}] 处理: {relative_path}")
+        file_stats = {}
+        sample_fields = {}
+        
+        try:
+            # 构建输出文件路径(保持相对目录结构)
+            output_file = output_dir / relative_path
+            output_file.parent.mkdir(parents=True, exist_ok=True)
+            
+            if sample:
+                file_seed = f"{seed}:{relative_path.as_posix()}" if seed is not None else None
+                rows_kept, total_rows, groups = sample_workbook(file_path, output_file, max_rows,
+                                                                stratify_by, file_seed, file_stats)
+                print(f"  ✓ 成功: 从 {total_rows} 条数据中抽取了 {rows_kept} 条 "
+                      f"→ {output_file.relative_to(display_root)}")
+                sample_fields['rows_total'] = total_rows
+                if groups:
+                    print("    " + ", ".join(f"{key}: {kept}/{seen}"
+                                             for key, (seen, kept) in groups.items()))
+                    sample_fields['groups'] = {str(key): {'rows': seen, 'kept': kept}
+                                               for key, (seen, kept) in groups.items()}
+            elif streaming and file_path.suffix.lower() in ('.xlsx', '.xlsm'):
+                kept_rows = simplify_workbook_streaming(file_path, output_file, max_rows, file_stats)
+                rows_kept = sum(kept_rows.values())
+                print(f"  ✓ 成功: {len(kept_rows)} 个工作表共保留了 {rows_kept} 条数据 "
+                      f"→ {output_file.relative_to(display_root)}")
+            else:
+                rows_kept = simplify_workbook(file_path, output_file, max_rows, file_stats)
+                print(f"  ✓ 成功: 保留了 {rows_kept} 条数据 → {output_file.relative_to(display_root)}")
+            success_count += 1
+            if recorder is not None:
+                file_stats['bytes_written'] = output_file.stat().st_size
+                recorder.file(relative_path, 'ok', file_stats, rows_kept=rows_kept,
+                              output=str(output_file), **sample_fields)
+            
+        except Exception as e:
+            print(f"  ⚠️ 失败: {str(e)}")
+            error_count += 1
+            if recorder is not None:
+                recorder.file(relative_path, 'error', file_stats, error=str(e))
+    
+    if recorder is not None:
+        recorder.summary()
+    
+    if not file_count:
+        print(f"❌ 未找到任何 Excel 文件在目录: {input_directory}")
+        return
+    
+    # 输出统计结果
+    print("\n" + "="*80)
+    print("处理结果统计")
+    print("="*80)
+    print(f"\n成功: {success_count} 个文件")
+    print(f"失败: {error_count} 个文件")
+    print(f"总计: {file_count} 个文件")
+    print(f"\n输出目录: {output_dir}")
+    print("\n" + "="*80 + "\n")
+
+
+def _map_ordered(func, tasks, jobs=1):
+    """
+    对每个参数元组调用 func，按 tasks 顺序产出 (参数, 返回值, 错误信息)
+
+    jobs > 1 时在进程池中执行，同时提交的任务数有上限，结果仍按提交顺序流式返回
+    """
+    if jobs <= 1:
+        for task in tasks:
+            try:
+                yield task, func(*task), None
+            except Exception as e:
+                yield task, None, str(e)
+        return
+
+    def finish(task, future):
+        try:
+            return task, future.result(), None
+        except Exception as e:
+            return task, None, str(e)
+
+    # 同时提交的任务数上限，调用方处理较慢时不会无限堆积结果
+    window = jobs * 4
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        pending = deque()
+        for task in tasks:
+            pending.append((task, executor.submit(func, *task)))
+            while pending and (len(pending) >= window or pending[0][1].done()):
+                yield finish(*pending.popleft())
+        while pending:
+            yield finish(*pending.popleft())
+
+
+# 拆分大文件时每个文件的默认数据行数(与 excel_tools 保持一致)
+DEFAULT_SPLIT_ROWS = 60000
+
+
+def split_workbook_streaming(file_path, output_dir, rows_per_file=DEFAULT_SPLIT_ROWS):
+    """
+    流式拆分单个 .xlsx/.xlsm 文件的第一个工作表
+
+    逐行读取并写入连续的只写工作簿，每 rows_per_file 行数据生成一个
+    <文件名>_split_<序号>.xlsx，每个文件都重复列头。内存占用与输入大小无关。
+    中途失败时删除已生成的拆分文件，返回 (拆分文件路径列表, 数据总行数)
+    """
+    from openpyxl import load_workbook, Workbook
+
+    file_path = Path(file_path)
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    wb_in = load_workbook(file_path, read_only=True, data_only=True)
+    part_files = []
+    wb_out = ws_out = None
+    try:
+        ws = wb_in.worksheets[0]
+        rows = ws.iter_rows()
+        header = next(rows, None)
+        if header is None:
+            raise ValueError("文件没有数据行")
+
+        part_rows = 0
+        total_rows = 0
+        for row in rows:
+            if ws_out is None or part_rows >= rows_per_file:
+                if wb_out is not None:
+                    wb_out.save(part_files[-1])
+                part_files.append(output_dir / f"{file_path.stem}_split_{len(part_files) + 1}.xlsx")
+                wb_out = Workbook(write_only=True)
+                ws_out = wb_out.create_sheet(title=ws.title)
+                ws_out.append([_copy_cell(ws_out, cell) for cell in header])
+                part_rows = 0
+            ws_out.append([_copy_cell(ws_out, cell) for cell in row])
+            part_rows += 1
+            total_rows += 1
+
+        if wb_out is None:
+            raise ValueError("文件没有数据行")
+        wb_out.save(part_files[-1])
+    except BaseException:
+        if wb_out is not None:
+            _discard_workbook(wb_out)
+        for part_file in part_files:
+            if part_file.exists():
+                part_file.unlink()
+        raise
+    finally:
+        wb_in.close()
+    return part_files, total_rows
+
+
+def split_excel_files(input_directory, rows_per_file=DEFAULT_SPLIT_ROWS, jobs=1, include=None,
+                      exclude=None, output_directory=None):
+    """
+    拆分大文件: 将每个 Excel 文件按 rows_per_file 行数据拆分为多个文件
+
+    输出保持相对目录结构，默认输出到 output/split。
+    jobs > 1 时多个输入文件并行拆分；仅支持 .xlsx/.xlsm
+    include/exclude 为文件通配符过滤
+    """
+    print("\n" + "="*80)
+    print(f"拆分大文件 (每 {rows_per_file} 条数据一个文件)")
+    print("="*80)
+    
+    input_path = Path(input_directory)
+    if not input_path.exists():
+        print(f"❌ 错误: 目录不存在 - {input_directory}")
+        return
+    
+    script_dir = Path(__file__).parent
+    output_dir = Path(output_directory) if output_directory else script_dir / "output" / "split"
+    output_dir.mkdir(parents=True, exist_ok=True)
+    
+    excel_files = [f for f in find_excel_files(input_directory, include, exclude)
+                   if f.suffix.lower() in ('.xlsx', '.xlsm')]
+    
+    if not excel_files:
+        print(f"❌ 未找到任何 .xlsx/.xlsm 文件在目录: {input_directory}")
+        return
+    
+    print(f"\n✓ 找到 {len(excel_files)} 个 Excel 文件")
+    print(f"✓ 输出目录: {output_dir}\n")
+    
+    success_count = 0
+    error_count = 0
+    part_count = 0
+    
+    # 拆分文件保持相对目录结构
+    tasks = [(file_path, output_dir / file_path.relative_to(input_path).parent, rows_per_file)
+             for file_path in excel_files]
+    results = _map_ordered(split_workbook_streaming, tasks, jobs)
+    for idx, ((file_path, _, _), result, error) in enumerate(results, 1):
+        print(f"[{idx}/{len(excel_files)}] 拆分: {file_path.relative_to(input_path)}")
+        if error:
+            print(f"  ⚠️ 失败: {error}")
+            error_count += 1
+            continue
+        part_files, total_rows = result
+        print(f"  ✓ 成功: 共 {total_rows} 条数据，拆分为 {len(part_files)} 个文件")
+        success_count += 1
+        part_count += len(part_files)
+    
+    print("\n" + "="*80)
+    print("处理结果统计")
+    print("="*80)
+    print(f"\n成功: {success_count} 个源文件, 生成 {part_count} 个拆分文件")
+    print(f"失败: {error_count} 个文件")
+    print(f"总计: {len(excel_files)} 个文件")
+    print(f"\n输出目录: {output_dir}")
+    print("\n" + "="*80 + "\n")
+
+
+def _xls_cell_value(cell, datemode):
+    """将 xlrd 单元格转换为可写入 openpyxl 的值"""
+    import xlrd
+
+    if cell.ctype in (xlrd.XL_CELL_EMPTY, xlrd.XL_CELL_BLANK):
+        return None
+    if cell.ctype == xlrd.XL_CELL_DATE:
+        try:
+            return xlrd.xldate_as_datetime(cell.value, datemode)
+        except Exception:
+            return cell.value
+    if cell.ctype == xlrd.XL_CELL_NUMBER:
+        return int(cell.value) if float(cell.value).is_integer() else cell.value
+    if cell.ctype == xlrd.XL_CELL_BOOLEAN:
+        return bool(cell.value)
+    if cell.ctype == xlrd.XL_CELL_ERROR:
+        return xlrd.error_text_from_code.get(cell.value, '#ERROR')
+    return cell.value
+
+
+def convert_xls_file(file_path, output_file):
+    """
+    将单个 .xls 文件转换为 .xlsx，保留所有工作表
+
+    工作表逐个按需加载，写入只写工作簿后立即释放。返回工作表数量
+    """
+    import xlrd
+    from openpyxl import Workbook
+
+    output_file = Path(output_file)
+    output_file.parent.mkdir(parents=True, exist_ok=True)
+
+    book = xlrd.open_workbook(str(file_path), on_demand=True)
+    wb_out = Workbook(write_only=True)
+    # 先写临时文件再替换，避免中断时留下不完整的目标文件被当作最新
+    tmp_file = output_file.with_name(output_file.name + '.tmp')
+    try:
+        for sheet_idx in range(book.nsheets):
+            sheet = book.sheet_by_index(sheet_idx)
+            ws_out = wb_out.create_sheet(title=sheet.name)
+            for row_idx in range(sheet.nrows):
+                ws_out.append([_xls_cell_value(cell, book.datemode)
+                               for cell in sheet.row(row_idx)])
+            book.unload_sheet(sheet_idx)
+        if book.nsheets == 0:
+            wb_out.create_sheet()
+        wb_out.save(tmp_file)
+        os.replace(tmp_file, output_file)
+    except BaseException:
+        _discard_workbook(wb_out)
+        raise
+    finally:
+        book.release_resources()
+        if tmp_file.exists():
+            tmp_file.unlink()
+    return book.nsheets
+
+
+def convert_xls_files(input_directory, output_directory=None, jobs=1, include=None, exclude=None):
+    """
+    格式转换: 将 .xls 文件批量转换为 .xlsx
+
+    输出保持相对目录结构；目标文件已存在且不早于源文件时跳过。
+    jobs > 1 时多个文件并行转换
+    include/exclude 为文件通配符过滤
+    """
+    print("\n" + "="*80)
+    print("格式转换: 将 xls 文件转换为 xlsx 格式")
+    print("="*80)
+    
+    input_path = Path(input_directory)
+    if not input_path.exists():
+        print(f"❌ 错误: 目录不存在 - {input_directory}")
+        return
+    
+    script_dir = Path(__file__).parent
+    output_dir = Path(output_directory) if output_directory else script_dir / "output" / "converted"
+    output_dir.mkdir(parents=True, exist_ok=True)
+    
+    xls_files = [f for f in find_excel_files(input_directory, include, exclude)
+                 if f.suffix.lower() == '.xls']
+    
+    if not xls_files:
+        print(f"❌ 未找到任何 xls 文件在目录: {input_directory}")
+        return
+    
+    print(f"\n✓ 找到 {len(xls_files)} 个 xls 文件")
+    print(f"✓ 输出目录: {output_dir}\n")
+    
+    tasks = []
+    skipped_count = 0
+    for file_path in xls_files:
+        output_file = output_dir / file_path.relative_to(input_path).with_suffix('.xlsx')
+        if output_file.exists() and output_file.stat().st_mtime >= file_path.stat().st_mtime:
+            skipped_count += 1
+            continue
+        tasks.append((file_path, output_file))
+    
+    if skipped_count:
+        print(f"✓ 跳过 {skipped_count} 个已是最新的文件\n")
+    
+    success_count = 0
+    error_count = 0
+    
+    results = _map_ordered(convert_xls_file, tasks, jobs)
+    for idx, ((file_path, output_file), sheet_count, error) in enumerate(results, 1):
+        print(f"[{idx}/{len(tasks)}] 转换: {file_path.relative_to(input_path)}")
+        if error:
+            print(f"  ⚠️ 失败: {error}")
+            error_count += 1
+            continue
+        print(f"  ✓ 成功: {sheet_count} 个工作表 → {output_file.relative_to(output_dir)}")
+        success_count += 1
+    
+    print("\n" + "="*80)
+    print("转换结果统计")
+    print("="*80)
+    print(f"\n成功: {success_count} 个文件")
+    print(f"跳过: {skipped_count} 个文件(已是最新)")
+    print(f"失败: {error_count} 个文件")
+    print(f"总计: {len(xls_files)} 个文件")
+    print(f"\n输出目录: {output_dir}")
+    print("\n" + "="*80 + "\n")
+
+
+# 列式导出时每个数据块(Parquet 行组)的行数
+DEFAULT_CHUNK_ROWS = 10000
+
+# 列式导出中保存未识别列的附加列名
+EXTRA_COLUMNS_FIELD = '_unrecognized'
+
+
+def _cell_text(value):
+    """将单元格值转换为文本，空值返回 None"""
+    if value is None or value == '':
+        return None
+    if isinstance(value, datetime):
+        return value.isoformat(sep=' ') if value.time() != dt_time() else value.date().isoformat()
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
+def _columnar_schema():
+    """列式导出的统一 schema: SYSTEM_COLUMNS 顺序的文本列 + 未识别列的映射列"""
+    import pyarrow as pa
+    fields = [pa.field(column, pa.string()) for column in SYSTEM_COLUMNS]
+    fields.append(pa.field(EXTRA_COLUMNS_FIELD, pa.map_(pa.string(), pa.string())))
+    return pa.schema(fields)
+
+
+def _canonical_layout(headers):
+    """
+    将文件列头对应到 SYSTEM_COLUMNS
+
+    返回 ({系统列名: 源列序号}, [(未识别列名, 源列序号), ...])；
+    规范化后对应同一系统列的多个源列只取第一个，其余按未识别列保留
+    """
+    column_index = get_column_index()
+    mapped = {}
+    extras = []
+    for idx, header in enumerate(headers):
+        if header is None or header == '':
+            continue
+        match = column_index.match(str(header))
+        if match is not None and match not in mapped:
+            mapped[match] = idx
+        else:
+            extras.append((str(header), idx))
+    return mapped, extras
+
+
+def _is_empty_row(row):
+    """整行为空(parquet 导出和 merge 均跳过这样的行，两者的数据行数一致)"""
+    return all(value is None or value == '' for value in row)
+
+
+def export_columnar_file(file_path, output_file, chunk_rows=DEFAULT_CHUNK_ROWS, arrow=False):
+    """
+    将单个 .xlsx/.xlsm 文件的第一个工作表流式导出为 Parquet(或 Arrow IPC)
+
+    列按 SYSTEM_COLUMNS 顺序排列，缺失的系统列填充为空，所有值以文本保存，
+    使不同文件导出的结果 schema 一致、可直接合并；未识别的列以
+    {列名: 值} 映射形式保存在 _unrecognized 列，整行为空的行不导出。
+    每 chunk_rows 行写出一个数据块，内存只与 chunk_rows 有关。返回导出的数据行数
+    """
+    import pyarrow as pa
+    from openpyxl import load_workbook
+
+    output_file = Path(output_file)
+    output_file.parent.mkdir(parents=True, exist_ok=True)
+    schema = _columnar_schema()
+    tmp_file = output_file.with_name(output_file.name + '.tmp')
+
+    wb_in = load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        rows = wb_in.worksheets[0].iter_rows(values_only=True)
+        headers = next(rows, None)
+        if headers is None:
+            raise ValueError("文件没有列头")
+        mapped, extras = _canonical_layout(headers)
+        layout = [mapped.get(column) for column in SYSTEM_COLUMNS]
+
+        if arrow:
+            writer = pa.ipc.new_file(str(tmp_file), schema)
+        else:
+            import pyarrow.parquet as pq
+            writer = pq.ParquetWriter(str(tmp_file), schema, compression='zstd')
+
+        total_rows = 0
+        try:
+            chunk = []
+            for row in rows:
+                if _is_empty_row(row):
+                    continue
+                chunk.append(row)
+                if len(chunk) >= chunk_rows:
+                    writer.write_table(_rows_to_table(chunk, layout, extras, schema))
+                    total_rows += len(chunk)
+                    chunk = []
+            if chunk or total_rows == 0:
+                writer.write_table(_rows_to_table(chunk, layout, extras, schema))
+                total_rows += len(chunk)
+        finally:
+            writer.close()
+        os.replace(tmp_file, output_file)
+    finally:
+        wb_in.close()
+        if tmp_file.exists():
+            tmp_file.unlink()
+    return total_rows
+
+
+def _rows_to_table(rows, layout, extras, schema):
+    """把一批行按列布局转换为 pyarrow.Table"""
+    import pyarrow as pa
+
+    arrays = []
+    for source_idx in layout:
+        if source_idx is None:
+            arrays.append(pa.nulls(len(rows), pa.string()))
+        else:
+            arrays.append(pa.array([_cell_text(row[source_idx]) if source_idx < len(row) else None
+                                    for row in rows], pa.string()))
+    extra_values = []
+    for row in rows:
+        extra_values.append([(name, _cell_text(row[idx]))
+                             for name, idx in extras
+                             if idx < len(row) and row[idx] is not None and row[idx] != ''])
+    arrays.append(pa.array(extra_values, schema.field(EXTRA_COLUMNS_FIELD).type))
+    return pa.Table.from_arrays(arrays, schema=schema)
+
+
+def export_columnar_files(input_directory, output_directory=None, chunk_rows=DEFAULT_CHUNK_ROWS,
+                          arrow=False, jobs=1, include=None, exclude=None):
+    """
+    列式导出: 将 Excel 文件批量转换为 Parquet/Arrow IPC，列顺序与 SYSTEM_COLUMNS 一致
+
+    输出保持相对目录结构，jobs > 1 时多个文件并行转换；仅支持 .xlsx/.xlsm
+    include/exclude 为文件通配符过滤
+    """
+    target = "Arrow IPC" if arrow else "Parquet"
+    suffix = '.arrow' if arrow else '.parquet'
+    print("\n" + "="*80)
+    print(f"列式导出: 将 Excel 文件转换为 {target}")
+    print("="*80)
+    
+    input_path = Path(input_directory)
+    if not input_path.exists():
+        print(f"❌ 错误: 目录不存在 - {input_directory}")
+        return
+    
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        print("❌ 错误: 列式导出需要 pyarrow，请运行: pip install pyarrow")
+        return
+    
+    script_dir = Path(__file__).parent
+    output_dir = Path(output_directory) if output_directory else script_dir / "output" / "parquet"
+    output_dir.mkdir(parents=True, exist_ok=True)
+    
+    excel_files = [f for f in find_excel_files(input_directory, include, exclude)
+                   if f.suffix.lower() in ('.xlsx', '.xlsm')]
+    
+    if not excel_files:
+        print(f"❌ 未找到任何 .xlsx/.xlsm 文件在目录: {input_directory}")
+        return
+    
+    print(f"\n✓ 找到 {len(excel_files)} 个 Excel 文件")
+    print(f"✓ 输出目录: {output_dir}\n")
+    
+    success_count = 0
+    error_count = 0
+    total_rows = 0
+    
+    tasks = [(file_path, output_dir / file_path.relative_to(input_path).with_suffix(suffix),
+              chunk_rows, arrow)
+             for file_path in excel_files]
+    results = _map_ordered(export_columnar_file, tasks, jobs)
+    for idx, ((file_path, output_file, _, _), row_count, error) in enumerate(results, 1):
+        print(f"[{idx}/{len(excel_files)}] 导出: {file_path.relative_to(input_path)}")
+        if error:
+            print(f"  ⚠️ 失败: {error}")
+            error_count += 1
+            continue
+        print(f"  ✓ 成功: {row_count} 条数据 → {output_file.relative_to(output_dir)}")
+        success_count += 1
+        total_rows += row_count
+    
+    print("\n" + "="*80)
+    print("导出结果统计")
+    print("="*80)
+    print(f"\n成功: {success_count} 个文件, 共 {total_rows} 条数据")
+    print(f"失败: {error_count} 个文件")
+    print(f"总计: {len(excel_files)} 个文件")
+    print(f"\n输出目录: {output_dir}")
+    print("\n" + "="*80 + "\n")
+
+
+# 合并输出中记录来源文件和行号的附加列
+SOURCE_FILE_FIELD = '_source_file'
+SOURCE_ROW_FIELD = '_source_row'
+
+# 合并结果的列: SYSTEM_COLUMNS + 未识别列 + 来源文件 + 来源行号
+MERGE_COLUMNS = SYSTEM_COLUMNS + [EXTRA_COLUMNS_FIELD, SOURCE_FILE_FIELD, SOURCE_ROW_FIELD]
+
+MERGE_FORMATS = ('xlsx', 'csv', 'parquet')
+
+
+def _canonical_rows_to_csv(file_path, source_name, tmp_file):
+    """
+    读取单个 .xlsx/.xlsm 文件的第一个工作表，按 MERGE_COLUMNS 顺序写入临时 CSV
+
+    在工作进程中运行；未识别列以 JSON 文本保存，跳过整行为空的行。返回数据行数
+    """
+    from openpyxl import load_workbook
+
+    wb_in = load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        rows = wb_in.worksheets[0].iter_rows(values_only=True)
+        headers = next(rows, None)
+        if headers is None:
+            raise ValueError("文件没有列头")
+        mapped, extras = _canonical_layout(headers)
+        layout = [mapped.get(column) for column in SYSTEM_COLUMNS]
+
+        row_count = 0
+        with open(tmp_file, 'w', encoding='utf-8', newline='') as f:
+            writer = csv.writer(f)
+            for row_number, row in enumerate(rows, 2):
+                if _is_empty_row(row):
+                    continue
+                values = [_cell_text(row[idx]) if idx is not None and idx < len(row) else None
+                          for idx in layout]
+                extra_values = {name: _cell_text(row[idx]) for name, idx in extras
+                                if idx < len(row) and row[idx] is not None and row[idx] != ''}
+                values.append(json.dumps(extra_values, ensure_ascii=False) if extra_values else None)
+                values.extend([source_name, row_number])
+                writer.writerow(values)
+                row_count += 1
+    finally:
+        wb_in.close()
+    return row_count
+
+
+class _XlsxPartsSink:
+    """滚动写出 merged_<序号>.xlsx，每个文件最多 rows_per_file 行数据并重复列头"""
+
+    def __init__(self, output_dir, rows_per_file):
+        self.output_dir = output_dir
+        self.rows_per_file = rows_per_file
+        self.files = []
+        self._wb = self._ws = None
+        self._rows = 0
+
+    def _roll(self):
+        from openpyxl import Workbook
+
+        self._save()
+        self.files.append(self.output_dir / f"merged_{len(self.files) + 1}.xlsx")
+        self._wb = Workbook(write_only=True)
+        self._ws = self._wb.create_sheet(title="Sheet1")
+        self._ws.append(MERGE_COLUMNS)
+        self._rows = 0
+
+    def _save(self):
+        if self._wb is not None:
+            self._wb.save(self.files[-1])
+            self._wb = self._ws = None
+
+    def write_rows(self, rows):
+        for row in rows:
+            if self._ws is None or self._rows >= self.rows_per_file:
+                self._roll()
+            self._ws.append(row[:-1] + [int(row[-1])])
+            self._rows += 1
+
+    def close(self):
+        if not self.files:
+            self._roll()
+        self._save()
+
+
+class _CsvSink:
+    """追加写出单个 merged.csv"""
+
+    def __init__(self, output_dir):
+        self.files = [output_dir / "merged.csv"]
+        self._file = open(self.files[0], 'w', encoding='utf-8-sig', newline='')
+        self._writer = csv.writer(self._file)
+        self._writer.writerow(MERGE_COLUMNS)
+
+    def write_rows(self, rows):
+        self._writer.writerows(rows)
+
+    def close(self):
+        self._file.close()
+
+
+class _ParquetSink:
+    """写出单个 merged.parquet，schema 与 parquet 导出一致并附加来源列"""
+
+    def __init__(self, output_dir):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        self.files = [output_dir / "merged.parquet"]
+        self._schema = _columnar_schema().append(pa.field(SOURCE_FILE_FIELD, pa.string())) \
+            .append(pa.field(SOURCE_ROW_FIELD, pa.int64()))
+        self._writer = pq.ParquetWriter(str(self.files[0]), self._schema, compression='zstd')
+
+    def write_rows(self, rows):
+        import pyarrow as pa
+
+        columns = list(zip(*rows))
+        arrays = [pa.array(columns[idx], pa.string()) for idx in range(len(SYSTEM_COLUMNS))]
+        extras = [list(json.loads(value).items()) if value else []
+                  for value in columns[len(SYSTEM_COLUMNS)]]
+        arrays.append(pa.array(extras, self._schema.field(EXTRA_COLUMNS_FIELD).type))
+        arrays.append(pa.array(columns[-2], pa.string()))
+        arrays.append(pa.array([int(value) for value in columns[-1]], pa.int64()))
+        self._writer.write_table(pa.Table.from_arrays(arrays, schema=self._schema))
+
+    def close(self):
+        self._writer.close()
+
+
+def merge_excel_files(input_directory, output_directory=None, merge_format='xlsx',
+                      rows_per_file=DEFAULT_SPLIT_ROWS, chunk_rows=DEFAULT_CHUNK_ROWS, jobs=1,
+                      include=None, exclude=None):
+    """
+    合并导出: 把目录下所有导出文件按 SYSTEM_COLUMNS 列顺序合并为一个数据集
+
+    每个文件在工作进程中读取并转换为临时 CSV，主进程按文件路径顺序逐块
+    (每 chunk_rows 行)追加到输出中，内存与文件数量和大小无关。输出格式:
+    xlsx 为每 rows_per_file 行一个的 merged_<序号>.xlsx；csv 为单个 merged.csv；
+    parquet 为单个 merged.parquet。每行附加未识别列(_unrecognized)、来源文件和
+    来源行号。仅支持 .xlsx/.xlsm；include/exclude 为文件通配符过滤
+    """
+    print("\n" + "="*80)
+    print(f"合并导出: 按系统列顺序合并为 {merge_format}")
+    print("="*80)
+    
+    input_path = Path(input_directory)
+    if not input_path.exists():
+        print(f"❌ 错误: 目录不存在 - {input_directory}")
+        return
+    
+    if merge_format not in MERGE_FORMATS:
+        print(f"❌ 错误: 不支持的合并格式 - {merge_format} (可选: {', '.join(MERGE_FORMATS)})")
+        return
+    
+    if merge_format == 'parquet':
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            print("❌ 错误: 合并为 parquet 需要 pyarrow，请运行: pip install pyarrow")
+            return
+    
+    script_dir = Path(__file__).parent
+    output_dir = Path(output_directory) if output_directory else script_dir / "output" / "merged"
+    output_dir.mkdir(parents=True, exist_ok=True)
+    
+    excel_files = find_excel_files(input_directory, include, exclude)
+    xls_count = sum(1 for f in excel_files if f.suffix.lower() == '.xls')
+    excel_files = [f for f in excel_files if f.suffix.lower() != '.xls']
+    
+    if xls_count:
+        print(f"\n⚠️ 跳过 {xls_count} 个 xls 文件(请先使用 convert 转换为 xlsx)")
+    
+    if not excel_files:
+        print(f"❌ 未找到任何 xlsx 文件在目录: {input_directory}")
+        return
+    
+    print(f"\n✓ 找到 {len(excel_files)} 个 Excel 文件")
+    print(f"✓ 输出目录: {output_dir}\n")
+    
+    if merge_format == 'xlsx':
+        sink = _XlsxPartsSink(output_dir, rows_per_file)
+    elif merge_format == 'csv':
+        sink = _CsvSink(output_dir)
+    else:
+        sink = _ParquetSink(output_dir)
+    
+    csv.field_size_limit(min(sys.maxsize, 2**31 - 1))
+    tmp_dir = Path(tempfile.mkdtemp(prefix='.merge_', dir=output_dir))
+    success_count = 0
+    error_count = 0
+    total_rows = 0
+    
+    try:
+        tasks = [(file_path, str(file_path.relative_to(input_path)), tmp_dir / f"{idx}.csv")
+                 for idx, file_path in enumerate(excel_files)]
+        results = _map_ordered(_canonical_rows_to_csv, tasks, jobs)
+        for idx, ((file_path, source_name, tmp_file), row_count, error) in enumerate(results, 1):
+            print(f"[{idx}/{len(excel_files)}] 合并: {source_name}")
+            if error:
+                print(f"  ⚠️ 失败: {error}")
+                error_count += 1
+                if tmp_file.exists():
+                    tmp_file.unlink()
+                continue
+            
+            # 按文件顺序把临时结果分块追加到输出中
+            with open(tmp_file, encoding='utf-8', newline='') as f:
+                chunk = []
+                for row in csv.reader(f):
+                    chunk.append([value if value != '' else None for value in row])
+                    if len(chunk) >= chunk_rows:
+                        sink.write_rows(chunk)
+                        chunk = []
+                if chunk:
+                    sink.write_rows(chunk)
+            tmp_file.unlink()
+            print(f"  ✓ 成功: {row_count} 条数据")
+            success_count += 1
+            total_rows += row_count
+    finally:
+        sink.close()
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+    
+    print("\n" + "="*80)
+    print("合并结果统计")
+    print("="*80)
+    print(f"\n成功: {success_count} 个文件, 共 {total_rows} 条数据")
+    print(f"失败: {error_count} 个文件")
+    print(f"输出文件: {', '.join(str(path.relative_to(output_dir)) for path in sink.files)}")
+    print(f"\n输出目录: {output_dir}")
+    print("\n" + "="*80 + "\n")
+
+
+# 可能含有格式问题的开始标签: 在若干合法属性之后出现没有值或值未加引号的属性
+_SUSPECT_TAG = re.compile(
+    r'<[A-Za-z_][\w:.-]*(?:\s+[\w:.-]+\s*=\s*(?:"[^"]*"|\'[^\']*\'))*'
+    r'\s+[\w:.-]+(?:\s*(?=[/>])|\s+(?![=\s])|\s*=\s*(?![\s"\']))'
+)
+# 开始标签(属性值中允许出现 >)
+_START_TAG = re.compile(r'<([A-Za-z_][\w:.-]*)((?:[^<>"\']|"[^"]*"|\'[^\']*\')*?)(/?)>')
+# 标签中的单个属性: 名称，以及可选的带引号或不带引号的值
+_TAG_ATTRIBUTE = re.compile(r'([^\s=/>]+)(?:\s*=\s*("[^"]*"|\'[^\']*\'|[^\s"\'/>]+))?')
+
+
+def _repair_start_tag(match, stats):
+    """修复单个开始标签: 删除没有值的属性，为未加引号的值补上引号"""
+    name, attr_text, self_closing = match.groups()
+    attributes = []
+    changed = False
+    for attr_name, value in _TAG_ATTRIBUTE.findall(attr_text):
+        if not value:
+            changed = True
+            continue
+        if value[0] not in '"\'':
+            value = '"' + value.replace('&', '&amp;').replace('"', '&quot;') + '"'
+            changed = True
+        attributes.append(f'{attr_name}={value}')
+    if not changed:
+        return match.group(0)
+    stats['tags'] += 1
+    return '<' + ' '.join([name] + attributes) + self_closing + '>'
+
+
+def _repair_xml_stream(src, dst, stats, chunk_size=1024 * 1024):
+    """
+    流式修复一个 XML 部件
+
+    按块读取，块末尾未闭合的标签留到下一块处理；绝大多数块中没有可疑标签，
+    直接原样写出，只有命中可疑模式的块才逐个标签修复
+    """
+    decoder = codecs.getincrementaldecoder('utf-8')()
+    pending = ''
+    while True:
+        data = src.read(chunk_size)
+        text = pending + decoder.decode(data, final=not data)
+        if data:
+            cut = text.rfind('<')
+            if cut <= 0:
+                pending = text
+                continue
+            text, pending = text[:cut], text[cut:]
+        else:
+            pending = ''
+        if _SUSPECT_TAG.search(text):
+            text = _START_TAG.sub(lambda m: _repair_start_tag(m, stats), text)
+        dst.write(text.encode('utf-8'))
+        if not data:
+            break
+
+
+def repair_workbook_xml(file_path, output_file):
+    """
+    修复工作簿中导致 ExcelJS 报 "attribute without value" 的 XML
+
+    逐个复制 zip 中的部件，.xml/.rels 部件经过修复流程，其余部件原样复制；
+    不解析单元格，也不构建工作簿对象。返回修复的标签数量
+    """
+    output_file = Path(output_file)
+    output_file.parent.mkdir(parents=True, exist_ok=True)
+    tmp_file = output_file.with_name(output_file.name + '.tmp')
+    stats = {'tags': 0}
+
+    try:
+        with zipfile.ZipFile(file_path) as zin, zipfile.ZipFile(tmp_file, 'w') as zout:
+            for item in zin.infolist():
+                with zin.open(item) as src, zout.open(item, 'w', force_zip64=True) as dst:
+                    if item.filename.endswith(('.xml', '.rels')):
+                        _repair_xml_stream(src, dst, stats)
+                    else:
+                        shutil.copyfileobj(src, dst, 1024 * 1024)
+        os.replace(tmp_file, output_file)
+    finally:
+        if tmp_file.exists():
+            tmp_file.unlink()
+    return stats['tags']
+
+
+def repair_problem_files(problem_json, output_directory=None, jobs=1):
+    """
+    修复问题文件: 读取 problem_file.json 中 file_format 列出的文件，流式修复 XML
+
+    输出保持这些文件共同上级目录下的相对结构(不同目录下常有同名文件)，
+    jobs > 1 时多个文件并行处理
+    """
+    print("\n" + "="*80)
+    print("修复问题文件 (attribute without value)")
+    print("="*80)
+    
+    problem_json = Path(problem_json)
+    if not problem_json.is_file():
+        print(f"❌ 错误: JSON 文件不存在 - {problem_json}")
+        return
+    
+    with open(problem_json, 'r', encoding='utf-8') as f:
+        problem_files = json.load(f)
+    file_paths = [Path(path) for path in problem_files.get('file_format', [])]
+    
+    if not file_paths:
+        print(f"❌ JSON 文件中没有需要修复的文件(file_format): {problem_json}")
+        return
+    
+    script_dir = Path(__file__).parent
+    output_dir = Path(output_directory) if output_directory else script_dir / "output" / "repaired"
+    output_dir.mkdir(parents=True, exist_ok=True)
+    
+    print(f"\n✓ 读取问题文件列表成功: {len(file_paths)} 个文件")
+    print(f"✓ 输出目录: {output_dir}\n")
+    
+    existing_files = []
+    missing_count = 0
+    for file_path in file_paths:
+        if not file_path.exists():
+            print(f"  ⚠️ 文件不存在，跳过: {file_path}")
+            missing_count += 1
+            continue
+        existing_files.append(file_path)
+    
+    if not existing_files:
+        print("\n❌ 列表中的文件均不存在")
+        return
+    
+    common_root = Path(os.path.commonpath([str(path.parent) for path in existing_files]))
+    tasks = [(file_path, output_dir / file_path.relative_to(common_root))
+             for file_path in existing_files]
+    
+    success_count = 0
+    error_count = 0
+    
+    results = _map_ordered(repair_workbook_xml, tasks, jobs)
+    for idx, ((file_path, output_file), fixed_tags, error) in enumerate(results, 1):
+        print(f"[{idx}/{len(tasks)}] 修复: {file_path.relative_to(common_root)}")
+        if error:
+            print(f"  ⚠️ 失败: {error}")
+            error_count += 1
+            continue
+        print(f"  ✓ 成功: 修复 {fixed_tags} 个标签 → {output_file.relative_to(output_dir)}")
+        success_count += 1
+    
+    print("\n" + "="*80)
+    print("修复结果统计")
+    print("="*80)
+    print(f"\n成功: {success_count} 个文件")
+    print(f"失败: {error_count} 个文件")
+    print(f"不存在: {missing_count} 个文件")
+    print(f"总计: {len(file_paths)} 个文件")
+    print(f"\n输出目录: {output_dir}")
+    print("\n" + "="*80 + "\n")
+
+
+_DIMENSION_REF = re.compile(rb'<(?:\w+:)?dimension\b[^>]*?\bref="([^"]+)"')
+_ROW_NUMBER = re.compile(rb'<(?:\w+:)?row\b[^>]*?\br="(\d+)"')
+_CELL_COLUMN = re.compile(rb'<(?:\w+:)?c\b[^>]*?\br="([A-Z]+)\d+"')
+
+
+def _range_size(ref):
+    """由 "A1:FJ1001" 形式的区域引用得到 (行数, 列数)"""
+    end = ref.split(':')[-1].replace('$', '')
+    digits = ''.join(ch for ch in end if ch.isdigit())
+    return int(digits), _column_index(end) + 1
+
+
+def _read_dimension(zf, sheet_part):
+    """读取工作表开头的 <dimension ref>，读到 <sheetData> 仍未出现时返回 None"""
+    head = b''
+    with zf.open(sheet_part) as f:
+        while True:
+            data = f.read(16 * 1024)
+            head += data
+            match = _DIMENSION_REF.search(head)
+            if match:
+                return match.group(1).decode()
+            if not data or b'sheetData' in head:
+                return None
+
+
+def _scan_sheet_size(zf, sheet_part):
+    """没有可用的 dimension 时，流式扫描行号和单元格引用得到 (行数, 列数)"""
+    max_row = 0
+    max_col = -1
+    pending = b''
+    with zf.open(sheet_part) as f:
+        while True:
+            data = f.read(1024 * 1024)
+            text = pending + data
+            if data:
+                # 末尾可能是被截断的标签，留到下一块
+                cut = text.rfind(b'<')
+                text, pending = (text[:cut], text[cut:]) if cut > 0 else (text, b'')
+            for match in _ROW_NUMBER.finditer(text):
+                max_row = max(max_row, int(match.group(1)))
+            for match in _CELL_COLUMN.finditer(text):
+                max_col = max(max_col, _column_index(match.group(1).decode()))
+            if not data:
+                break
+    return max_row, max_col + 1
+
+
+def inventory_workbook(file_path):
+    """
+    统计单个文件每个工作表的行数和列数(行数含列头)
+
+    .xlsx/.xlsm 只读取 workbook.xml 和各工作表开头的 <dimension ref>，
+    缺少 dimension(或只有 A1)时才流式扫描整个工作表；.xls 通过 xlrd 读取
+    """
+    file_path = Path(file_path)
+    sheets = []
+    if file_path.suffix.lower() == '.xls':
+        import xlrd
+
+        book = xlrd.open_workbook(str(file_path), on_demand=True)
+        try:
+            for idx in range(book.nsheets):
+                sheet = book.sheet_by_index(idx)
+                sheets.append({'name': sheet.name, 'rows': sheet.nrows, 'cols': sheet.ncols,
+                               'source': 'xlrd'})
+                book.unload_sheet(idx)
+        finally:
+            book.release_resources()
+    else:
+        with zipfile.ZipFile(file_path) as zf:
+            for name, part in _xlsx_parts(zf)[0]:
+                ref = _read_dimension(zf, part)
+                if ref and ref.split(':')[-1] != 'A1':
+                    rows, cols = _range_size(ref)
+                    source = 'dimension'
+                else:
+                    rows, cols = _scan_sheet_size(zf, part)
+                    source = 'scan'
+                sheets.append({'name': name, 'rows': rows, 'cols': cols, 'source': source})
+
+    return {
+        'path': str(file_path),
+        'bytes': file_path.stat().st_size,
+        'sheets': sheets,
+        'rows': sum(sheet['rows'] for sheet in sheets),
+        'cols': max((sheet['cols'] for sheet in sheets), default=0),
+    }
+
+
+def inventory_files(input_directory, report_path=None, jobs=1, include=None, exclude=None):
+    """
+    文件清单: 统计目录下每个 Excel 文件的工作表、行数、列数和文件大小，写出清单(JSON/CSV)
+
+    jobs > 1 时多个文件并行统计
+    include/exclude 为文件通配符过滤
+    """
+    print("\n" + "="*80)
+    print("文件清单: 统计工作表、行数和列数")
+    print("="*80)
     
-    # 支持的 Excel 文件扩展名
-    excel_extensions = ['.xlsx', '.xls', '.xlsm']
+    input_path = Path(input_directory)
+    if not input_path.exists():
+        print(f"❌ 错误: 目录不存在 - {input_directory}")
+        return
+    
+    excel_files = find_excel_files(input_directory, include, exclude)
+    
+    if not excel_files:
+        print(f"❌ 未找到任何 Excel 文件在目录: {input_directory}")
+        return
+    
+    script_dir = Path(__file__).parent
+    report_path = Path(report_path) if report_path else script_dir / "output" / "inventory.json"
+    report_path.parent.mkdir(parents=True, exist_ok=True)
+    
+    print(f"\n✓ 找到 {len(excel_files)} 个 Excel 文件\n")
+    
+    manifest = []
+    error_count = 0
+    scanned_sheets = 0
+    
+    results = _map_ordered(inventory_workbook, [(file_path,) for file_path in excel_files], jobs)
+    for idx, ((file_path,), entry, error) in enumerate(results, 1):
+        relative_path = file_path.relative_to(input_path)
+        if error:
+            print(f"[{idx}/{len(excel_files)}] {relative_path}")
+            print(f"  ⚠️ 失败: {error}")
+            error_count += 1
+            continue
+        entry['path'] = str(relative_path)
+        manifest.append(entry)
+        scanned_sheets += sum(1 for sheet in entry['sheets'] if sheet['source'] == 'scan')
+        print(f"[{idx}/{len(excel_files)}] {relative_path}: {len(entry['sheets'])} 个工作表, "
+              f"{entry['rows']} 行, {entry['cols']} 列, {entry['bytes']} 字节")
     
-    for ext in excel_extensions:
-        excel_files.extend(directory.rglob(f'*{ext}'))
+    if report_path.suffix.lower() == '.csv':
+        with open(report_path, 'w', encoding='utf-8-sig', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(['文件', '工作表', '行数', '列数', '来源', '文件大小(字节)'])
+            for entry in manifest:
+                for sheet in entry['sheets']:
+                    writer.writerow([entry['path'], sheet['name'], sheet['rows'], sheet['cols'],
+                                     sheet['source'], entry['bytes']])
+    else:
+        with open(report_path, 'w', encoding='utf-8') as f:
+            json.dump({'root': str(input_path.resolve()), 'files': manifest}, f,
+                      ensure_ascii=False, indent=2)
     
-    return excel_files
+    print("\n" + "="*80)
+    print("清单统计")
+    print("="*80)
+    print(f"\n文件数: {len(manifest)} 个 (失败 {error_count} 个)")
+    print(f"总行数: {sum(entry['rows'] for entry in manifest)}")
+    print(f"总大小: {sum(entry['bytes'] for entry in manifest)} 字节")
+    print(f"需要扫描的工作表(缺少 dimension): {scanned_sheets} 个")
+    print(f"\n清单已保存到: {report_path}")
+    print("\n" + "="*80 + "\n")
 
 
-def read_excel_headers(file_path):
-    """读取 Excel 文件的第一行(列头)"""
+# 去重键列，按优先级排列: 行中公开(公告)号为空时使用申请号
+DEDUP_KEY_COLUMNS = ['公开(公告)号', '申请号']
+
+
+class SeenKeys:
+    """
+    基于 SQLite 的已出现键集合，记录每个键首次出现的文件和行号
+
+    数据保存在磁盘上，内存占用与键的数量无关，可支持数千万条记录；
+    按批查询和写入，避免逐行访问数据库。
+    每个文件的键在 begin_file() 与 commit_file() 之间暂存在保存点中，
+    文件处理失败时 rollback_file() 撤销，不影响后续文件的去重
+    """
+
+    # 单条 SQL 中 IN (...) 的最大参数个数(SQLite 默认上限为 999)
+    QUERY_SIZE = 500
+
+    def __init__(self, db_path):
+        self.db_path = Path(db_path)
+        # 由保存点手动控制事务
+        self.conn = sqlite3.connect(str(self.db_path), isolation_level=None)
+        # 仅作为本次运行的临时数据，回滚日志放在内存中(保存点需要)，不同步落盘
+        self.conn.execute("PRAGMA journal_mode = MEMORY")
+        self.conn.execute("PRAGMA synchronous = OFF")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS seen ("
+            " key TEXT PRIMARY KEY,"
+            " file TEXT NOT NULL,"
+            " row INTEGER NOT NULL) WITHOUT ROWID"
+        )
+
+    def check(self, items):
+        """
+        items 为 [(键, 文件, 行号), ...]，返回与之对应的列表:
+        键已出现过时为首次出现的 (文件, 行号)，否则为 None 并记录该键
+        """
+        keys = list({key for key, _, _ in items})
+        first_seen = {}
+        for start in range(0, len(keys), self.QUERY_SIZE):
+            chunk = keys[start:start + self.QUERY_SIZE]
+            placeholders = ','.join('?' * len(chunk))
+            for key, file, row in self.conn.execute(
+                    f"SELECT key, file, row FROM seen WHERE key IN ({placeholders})", chunk):
+                first_seen[key] = (file, row)
+
+        results = []
+        new_items = []
+        for key, file, row in items:
+            if key in first_seen:
+                results.append(first_seen[key])
+                continue
+            # 同一批中重复出现的键也要识别
+            first_seen[key] = (file, row)
+            new_items.append((key, file, row))
+            results.append(None)
+        self.conn.executemany("INSERT INTO seen (key, file, row) VALUES (?, ?, ?)", new_items)
+        return results
+
+    def begin_file(self):
+        self.conn.execute("SAVEPOINT file_keys")
+
+    def commit_file(self):
+        self.conn.execute("RELEASE file_keys")
+
+    def rollback_file(self):
+        self.conn.execute("ROLLBACK TO file_keys")
+        self.conn.execute("RELEASE file_keys")
+
+    def count(self):
+        return self.conn.execute("SELECT COUNT(*) FROM seen").fetchone()[0]
+
+    def close(self):
+        self.conn.close()
+
+
+def _dedup_key(value):
+    """将键列的值规范化(去掉空白、统一大写)，空值返回 None"""
+    text = _cell_text(value)
+    if text is None:
+        return None
+    text = re.sub(r'\s+', '', text).upper()
+    return text or None
+
+
+def dedup_workbook(file_path, output_file, source_name, seen, report_writer,
+                   batch_rows=DEFAULT_CHUNK_ROWS):
+    """
+    按去重键流式去重单个 .xlsx/.xlsm 文件的第一个工作表
+
+    已在之前的文件(或本文件之前的行)中出现过的键对应的行不写入输出，
+    并在 report_writer 中记录首次出现的位置；没有键的行原样保留。
+    返回 {'rows': 数据行数, 'kept': 保留行数, 'duplicates': 重复行数, 'no_key': 无键行数}
+    """
+    from openpyxl import load_workbook, Workbook
+
+    output_file = Path(output_file)
+    output_file.parent.mkdir(parents=True, exist_ok=True)
+    stats = {'rows': 0, 'kept': 0, 'duplicates': 0, 'no_key': 0}
+
+    wb_in = load_workbook(file_path, read_only=True, data_only=True)
+    wb_out = Workbook(write_only=True)
     try:
-        # 尝试使用 pandas 读取第一行
-        df = pd.read_excel(file_path, nrows=0)
-        return list(df.columns)
-    except Exception as e:
-        print(f"  ⚠️ 读取文件失败: {file_path}")
-        print(f"     错误: {str(e)}")
-        return []
+        ws = wb_in.worksheets[0]
+        rows = ws.iter_rows()
+        header = next(rows, None)
+        if header is None:
+            raise ValueError("文件没有数据行")
+        mapped, _ = _canonical_layout([cell.value for cell in header])
+        key_columns = [(column, mapped[column]) for column in DEDUP_KEY_COLUMNS if column in mapped]
+        if not key_columns:
+            raise ValueError(f"缺少去重键列: {' / '.join(DEDUP_KEY_COLUMNS)}")
+
+        ws_out = wb_out.create_sheet(title=ws.title)
+        ws_out.append([_copy_cell(ws_out, cell) for cell in header])
+
+        def flush(batch):
+            keyed = [(key, source_name, row_number)
+                     for row_number, _, key, _ in batch if key is not None]
+            first_seen = iter(seen.check(keyed))
+            for row_number, row, key, column in batch:
+                previous = next(first_seen) if key is not None else None
+                if previous is not None:
+                    report_writer.writerow([column, key[len(column) + 1:], source_name, row_number,
+                                            previous[0], previous[1]])
+                    stats['duplicates'] += 1
+                    continue
+                ws_out.append([_copy_cell(ws_out, cell) for cell in row])
+                stats['kept'] += 1
+
+        batch = []
+        for row_number, row in enumerate(rows, 2):
+            if all(cell.value is None for cell in row):
+                continue
+            stats['rows'] += 1
+            key = column = None
+            for column, idx in key_columns:
+                value = _dedup_key(row[idx].value) if idx < len(row) else None
+                if value is not None:
+                    # 键带上列名，避免公开号与申请号相互匹配
+                    key = f"{column}:{value}"
+                    break
+            if key is None:
+                column = None
+                stats['no_key'] += 1
+            batch.append((row_number, row, key, column))
+            if len(batch) >= batch_rows:
+                flush(batch)
+                batch = []
+        if batch:
+            flush(batch)
+
+        wb_out.save(output_file)
+    except BaseException:
+        _discard_workbook(wb_out)
+        raise
+    finally:
+        wb_in.close()
+    return stats
 
 
-def check_unrecognized_columns(input_directory):
+def dedup_excel_files(input_directory, output_directory=None, report_path=None, include=None,
+                      exclude=None):
     """
-    功能1: 检测未被系统识别的列名
+    跨文件去重: 按公开(公告)号(为空时按申请号)去除所有文件中重复的专利
+
+    按文件路径顺序逐个流式处理，已出现的键保存在磁盘上的 SQLite 中；
+    输出去重后的文件，并生成重复记录报告(每条重复记录首次出现的文件和行号)。
+    "首次出现"依赖处理顺序，因此文件按顺序依次处理，不并行；仅支持 .xlsx/.xlsm
+    include/exclude 为文件通配符过滤
     """
     print("\n" + "="*80)
-    print("功能1: 检测未被系统识别的列名")
+    print("跨文件去重: 按公开(公告)号 / 申请号去除重复专利")
+    print("="*80)
+    
+    input_path = Path(input_directory)
+    if not input_path.exists():
+        print(f"❌ 错误: 目录不存在 - {input_directory}")
+        return
+    
+    script_dir = Path(__file__).parent
+    output_dir = Path(output_directory) if output_directory else script_dir / "output" / "dedup"
+    output_dir.mkdir(parents=True, exist_ok=True)
+    report_path = Path(report_path) if report_path else output_dir / "dedup_report.csv"
+    report_path.parent.mkdir(parents=True, exist_ok=True)
+    
+    excel_files = find_excel_files(input_directory, include, exclude)
+    xls_files = [f for f in excel_files if f.suffix.lower() == '.xls']
+    excel_files = [f for f in excel_files if f.suffix.lower() != '.xls']
+    
+    if xls_files:
+        print(f"\n⚠️ 跳过 {len(xls_files)} 个 xls 文件(请先使用 convert 转换为 xlsx)")
+    
+    if not excel_files:
+        print(f"❌ 未找到任何 xlsx 文件在目录: {input_directory}")
+        return
+    
+    print(f"\n✓ 找到 {len(excel_files)} 个 Excel 文件")
+    print(f"✓ 输出目录: {output_dir}\n")
+    
+    seen_path = output_dir / ".dedup_seen.db"
+    if seen_path.exists():
+        seen_path.unlink()
+    seen = SeenKeys(seen_path)
+    
+    totals = {'rows': 0, 'kept': 0, 'duplicates': 0, 'no_key': 0}
+    success_count = 0
+    error_count = 0
+    
+    try:
+        with open(report_path, 'w', encoding='utf-8-sig', newline='') as f:
+            report_writer = csv.writer(f)
+            report_writer.writerow(['键列', '键值', '文件', '行号', '首次出现文件', '首次出现行号'])
+            for idx, file_path in enumerate(excel_files, 1):
+                relative_path = file_path.relative_to(input_path)
+                print(f"[{idx}/{len(excel_files)}] 去重: {relative_path}")
+                # 本文件的键和重复记录先暂存，文件成功写出后才提交，
+                # 失败的文件不会让后续文件的行被当作"重复"删除
+                seen.begin_file()
+                with tempfile.SpooledTemporaryFile(max_size=8 * 1024 * 1024, mode='w+',
+                                                   encoding='utf-8', newline='') as file_report:
+                    try:
+                        stats = dedup_workbook(file_path, output_dir / relative_path,
+                                               str(relative_path), seen, csv.writer(file_report))
+                    except Exception as e:
+                        seen.rollback_file()
+                        print(f"  ⚠️ 失败: {e}")
+                        error_count += 1
+                        continue
+                    seen.commit_file()
+                    file_report.seek(0)
+                    shutil.copyfileobj(file_report, f)
+                for name in totals:
+                    totals[name] += stats[name]
+                print(f"  ✓ {stats['rows']} 行, 保留 {stats['kept']} 行, "
+                      f"重复 {stats['duplicates']} 行, 无键 {stats['no_key']} 行")
+                success_count += 1
+        key_count = seen.count()
+    finally:
+        seen.close()
+        seen_path.unlink()
+    
+    print("\n" + "="*80)
+    print("去重结果统计")
+    print("="*80)
+    print(f"\n成功: {success_count} 个文件")
+    print(f"失败: {error_count} 个文件")
+    print(f"数据行数: {totals['rows']}")
+    print(f"保留行数: {totals['kept']} (不同的键 {key_count} 个, 无键 {totals['no_key']} 行)")
+    print(f"重复行数: {totals['duplicates']}")
+    print(f"\n输出目录: {output_dir}")
+    print(f"重复记录报告: {report_path}")
+    print("\n" + "="*80 + "\n")
+
+
+# 已知列的取值规则: date 为日期，count 为非负整数，number 为数值；空值不检查
+VALUE_RULES = {
+    "公开(公告)日": 'date',
+    "申请日": 'date',
+    "最早优先权日": 'date',
+    "PCT进入国家阶段日": 'date',
+    "首次公开日": 'date',
+    "授权公告日": 'date',
+    "实质审查生效日": 'date',
+    "失效日": 'date',
+    "工商成立日期": 'date',
+    "申请人贡献分": 'number',
+    "专利寿命(月)": 'count',
+    "合享价值度": 'number',
+    "技术稳定性": 'number',
+    "技术先进性": 'number',
+    "保护范围": 'number',
+    "权利要求数量": 'count',
+    "独立权利要求数量": 'count',
+    "从属权利要求数量": 'count',
+    "文献页数": 'count',
+    "首权字数": 'count',
+    "申请人数量": 'count',
+    "发明人数量": 'count',
+    "引证次数": 'count',
+    "被引证次数": 'count',
+    "家族引证次数": 'count',
+    "家族被引证次数": 'count',
+    "简单同族个数": 'count',
+    "扩展同族个数": 'count',
+    "DocDB同族个数": 'count',
+    "转让次数": 'count',
+    "许可次数": 'count',
+    "质押次数": 'count',
+    "诉讼次数": 'count',
+}
+
+# 每列记录的违规样例行号数量
+VALIDATION_SAMPLE_ROWS = 5
+
+# Excel 日期序列号的有效范围(1900-01-01 至 9999-12-31)
+_EXCEL_SERIAL_RANGE = (1, 2958466)
+
+# 文本日期: 2020-01-31、2020/1/31、2020.01.31、2020年1月31日、20200131，可带时间
+_TEXT_DATE = r'^(\d{4})(?:[-/.年](\d{1,2})[-/.月](\d{1,2})日?|(\d{2})(\d{2}))(?:[ T]\d{1,2}:\d{2}(?::\d{2}(?:\.\d+)?)?)?$'
+
+# 工作表中的单元格: 列字母、行号、其余属性、<v> 值、<is> 内联字符串(自闭合单元格后两项为空)
+_SHEET_CELL = re.compile(
+    rb'<c r="([A-Z]+)(\d+)"([^>]*)>'
+    rb'(?:(?<=/>)|(?:<f\b[^>]*(?:/>|>[^<]*</f>))?(?:<v>([^<]*)</v>)?(?:<is>(.*?)</is>)?</c>)',
+    re.S
+)
+_CELL_TYPE = r'\bt="(\w+)"'
+
+
+def _valid_text(kind, texts):
+    """向量化检查文本值(pandas Series)是否符合规则，返回布尔数组"""
+    import pandas as pd
+
+    texts = texts.str.strip()
+    if kind == 'date':
+        parts = texts.str.extract(_TEXT_DATE)
+        year = parts[0]
+        month = parts[1].fillna(parts[3])
+        day = parts[2].fillna(parts[4])
+        dates = pd.to_datetime(year + '-' + month + '-' + day, format='%Y-%m-%d', errors='coerce')
+        return dates.notna().to_numpy()
+    return _valid_number(kind, pd.to_numeric(texts, errors='coerce').to_numpy(dtype=float))
+
+
+def _valid_number(kind, numbers):
+    """向量化检查数值(float 数组，NaN 表示无法转换)是否符合规则，返回布尔数组"""
+    import numpy as np
+
+    with np.errstate(invalid='ignore'):
+        if kind == 'date':
+            return (numbers >= _EXCEL_SERIAL_RANGE[0]) & (numbers < _EXCEL_SERIAL_RANGE[1])
+        if kind == 'count':
+            return (numbers >= 0) & (np.floor(numbers) == numbers) & np.isfinite(numbers)
+        return np.isfinite(numbers)
+
+
+def _validate_shared_strings(zf, part, refs, batch_size=50000):
+    """
+    只检查规则列引用的共享字符串，每个字符串按引用它的规则各检查一次
+
+    refs 为 {规则: 引用的字符串序号数组}。返回 {规则: 布尔数组}，按序号即可得到
+    引用该字符串的单元格是否合法(超出共享字符串表的序号为 False)；
+    未被引用的字符串(如标题、摘要)不检查，字符串本身也不保留在内存中
+    """
+    import numpy as np
+    import pandas as pd
+
+    wanted = {kind: np.unique(kind_refs) for kind, kind_refs in refs.items()}
+    results = {kind: np.zeros(int(kind_refs[-1]) + 1 if len(kind_refs) else 0, dtype=bool)
+               for kind, kind_refs in wanted.items()}
+    all_wanted = set()
+    for kind_refs in wanted.values():
+        all_wanted.update(kind_refs.tolist())
+    if not part or not all_wanted:
+        return results
+    last = max(all_wanted)
+    batch_index = []
+    batch = []
+
+    def flush():
+        index = np.array(batch_index, dtype=np.int64)
+        texts = pd.Series(batch, dtype=object)
+        for kind, kind_refs in wanted.items():
+            selected = np.isin(index, kind_refs)
+            if selected.any():
+                results[kind][index[selected]] = _valid_text(kind, texts[selected])
+        batch_index.clear()
+        batch.clear()
+
+    with zf.open(part) as f:
+        string_index = 0
+        for _, elem in ET.iterparse(f):
+            if _local_name(elem.tag) != 'si':
+                continue
+            if string_index in all_wanted:
+                batch_index.append(string_index)
+                batch.append(_string_item_text(elem))
+            elem.clear()
+            if string_index >= last:
+                break
+            string_index += 1
+            if len(batch) >= batch_size:
+                flush()
+    if batch:
+        flush()
+    return results
+
+
+def _iter_sheet_cells(zf, sheet_part, chunk_size=4 * 1024 * 1024):
+    """
+    按块读取工作表 XML，用正则批量提取单元格，每块为整数行
+
+    每次产出 DataFrame(列: col, row, attrs, v, inline)，值均为 bytes；
+    遇到带命名空间前缀或正则无法完整匹配的写法时抛出 ValueError，由调用方回退
+    """
+    import pandas as pd
+
+    pending = b''
+    first = True
+    with zf.open(sheet_part) as f:
+        while True:
+            data = f.read(chunk_size)
+            text = pending + data
+            if data:
+                cut = text.rfind(b'</row>')
+                if cut < 0:
+                    pending = text
+                    continue
+                cut += len(b'</row>')
+                text, pending = text[:cut], text[cut:]
+            if first and b'<sheetData' not in text:
+                raise ValueError("无法快速解析工作表 XML")
+            first = False
+            cells = _SHEET_CELL.findall(text)
+            if len(cells) != text.count(b'<c ') + text.count(b'<c>'):
+                raise ValueError("无法快速解析工作表 XML")
+            if cells:
+                yield pd.DataFrame(cells, columns=['col', 'row', 'attrs', 'v', 'inline'])
+            if not data:
+                break
+
+
+class ValidationResult:
+    """单个文件的值检查结果: 每列的违规数量和样例行号"""
+
+    def __init__(self):
+        self.rows = 0
+        self.cells = 0
+        self.violations = {}
+        self.samples = defaultdict(list)
+        self.method = 'fast'
+
+    def add(self, column, row_numbers, bad):
+        """
+        row_numbers 为已检查单元格的行号数组(升序)，bad 为对应的违规标记
+
+        同一列可分多次累加且行号不必衔接，样例行号始终保留行号最小的几个
+        """
+        self.cells += len(row_numbers)
+        count = int(bad.sum())
+        if not count:
+            return
+        self.violations[column] = self.violations.get(column, 0) + count
+        samples = self.samples[column]
+        samples.extend(int(row) for row in row_numbers[bad][:VALIDATION_SAMPLE_ROWS])
+        samples.sort()
+        del samples[VALIDATION_SAMPLE_ROWS:]
+
+    def to_dict(self):
+        return {
+            'rows': self.rows,
+            'cells': self.cells,
+            'method': self.method,
+            'violations': {column: {'count': count, 'sample_rows': self.samples[column]}
+                           for column, count in self.violations.items()},
+        }
+
+
+def _validate_xlsx_fast(file_path):
+    """用正则批量提取单元格并向量化检查 .xlsx/.xlsm 的第一个工作表"""
+    import numpy as np
+    import pandas as pd
+
+    result = ValidationResult()
+    headers = read_xlsx_headers(file_path)
+    mapped, _ = _canonical_layout(headers)
+    rules = {idx: (column, VALUE_RULES[column])
+             for column, idx in mapped.items() if column in VALUE_RULES}
+    if not rules:
+        return result
+
+    with zipfile.ZipFile(file_path) as zf:
+        sheets, shared_strings_part = _xlsx_parts(zf)
+        # 共享字符串单元格先记录行号和序号，读完工作表后只检查被引用的字符串
+        shared_cells = defaultdict(list)
+        letters = {}
+        header_row = None
+        for cells in _iter_sheet_cells(zf, sheets[0][1]):
+            # 行号、列号在 NumPy 中整体转换，只有需要检查的单元格才解码取值
+            rows = cells['row'].to_numpy(dtype=bytes).astype(np.int64)
+            if header_row is None:
+                has_value = (cells['v'].to_numpy(dtype=bytes) != b'') \
+                    | (cells['inline'].to_numpy(dtype=bytes) != b'')
+                if not has_value.any():
+                    continue
+                header_row = rows[has_value].min()
+            result.rows += len(np.unique(rows[rows > header_row]))
+
+            for col in cells['col'].unique():
+                if col not in letters:
+                    letters[col] = _column_index(col.decode('ascii'))
+            col_idx = cells['col'].map(letters).to_numpy()
+            checked = (rows > header_row) & np.isin(col_idx, list(rules))
+            cells = cells[checked]
+            rows = rows[checked]
+            col_idx = col_idx[checked]
+            has_value = (cells['v'].to_numpy(dtype=bytes) != b'') \
+                | (cells['inline'].to_numpy(dtype=bytes) != b'')
+            types = cells['attrs'].str.decode('ascii').str.extract(_CELL_TYPE)[0].fillna('n')
+
+            for idx in np.unique(col_idx):
+                column, kind = rules[idx]
+                mask = (col_idx == idx) & has_value
+                col_types = types[mask]
+                values = cells['v'][mask]
+                valid = np.zeros(int(mask.sum()), dtype=bool)
+
+                is_number = (col_types == 'n').to_numpy()
+                if is_number.any():
+                    numbers = pd.to_numeric(values[is_number].str.decode('ascii'),
+                                            errors='coerce').to_numpy(dtype=float)
+                    valid[is_number] = _valid_number(kind, numbers)
+
+                is_shared = (col_types == 's').to_numpy()
+                if is_shared.any():
+                    shared_cells[idx].append((rows[mask][is_shared].astype(np.int32),
+                                              values[is_shared].to_numpy(dtype=bytes).astype(np.int32)))
+
+                # 内联字符串、公式字符串结果、ISO 日期(t="d")按文本检查；布尔和错误值均为违规
+                is_text = col_types.isin(['inlineStr', 'str', 'd']).to_numpy()
+                if is_text.any():
+                    raw = cells['inline'][mask][is_text].where(col_types[is_text] == 'inlineStr',
+                                                              values[is_text])
+                    texts = raw.str.decode('utf-8').str.replace(r'<[^>]*>', '', regex=True)
+                    escaped = texts.str.contains('&', regex=False)
+                    if escaped.any():
+                        texts[escaped] = texts[escaped].map(html.unescape)
+                    valid[is_text] = _valid_text(kind, texts)
+
+                result.add(column, rows[mask][~is_shared], ~valid[~is_shared])
+
+        kind_refs = defaultdict(list)
+        for idx, parts in shared_cells.items():
+            kind_refs[rules[idx][1]].extend(part_refs for _, part_refs in parts)
+        shared_ok = _validate_shared_strings(
+            zf, shared_strings_part, {kind: np.concatenate(parts) for kind, parts in kind_refs.items()})
+        for idx, parts in shared_cells.items():
+            column, kind = rules[idx]
+            rows = np.concatenate([part_rows for part_rows, _ in parts])
+            refs = np.concatenate([part_refs for _, part_refs in parts])
+            table = shared_ok[kind]
+            in_range = (refs >= 0) & (refs < len(table))
+            result.add(column, rows, ~(in_range & table[np.where(in_range, refs, 0)]))
+    return result
+
+
+def _validate_frame(result, frame, rules, first_row):
+    """向量化检查一批已读入的行(DataFrame，列为源列序号)，first_row 为第一行的 Excel 行号"""
+    import numpy as np
+    import pandas as pd
+
+    row_numbers = np.arange(first_row, first_row + len(frame))
+    result.rows += int(frame.notna().any(axis=1).sum())
+    for idx, (column, kind) in rules.items():
+        if idx not in frame.columns:
+            continue
+        values = frame[idx]
+        present = values.notna().to_numpy() & (values != '').to_numpy()
+        values = values[present]
+        value_types = values.map(type)
+        valid = np.zeros(len(values), dtype=bool)
+
+        is_datetime = value_types.isin([datetime, pd.Timestamp]).to_numpy()
+        valid[is_datetime] = kind == 'date'
+        is_number = value_types.isin([int, float]).to_numpy()
+        if is_number.any():
+            valid[is_number] = _valid_number(kind, values[is_number].to_numpy(dtype=float))
+        is_text = (value_types == str).to_numpy()
+        if is_text.any():
+            valid[is_text] = _valid_text(kind, values[is_text])
+        result.add(column, row_numbers[present], ~valid)
+
+
+def _iter_xls_rows(file_path):
+    """逐行产出 .xls 第一个工作表的值(转换规则同 convert_xls_file)，不构建整表的 DataFrame"""
+    import xlrd
+
+    book = xlrd.open_workbook(str(file_path), on_demand=True)
+    try:
+        sheet = book.sheet_by_index(0)
+        for row_idx in range(sheet.nrows):
+            yield tuple(_xls_cell_value(cell, book.datemode) for cell in sheet.row(row_idx))
+    finally:
+        book.release_resources()
+
+
+def validate_workbook(file_path, chunk_rows=DEFAULT_CHUNK_ROWS):
+    """
+    按 VALUE_RULES 检查单个文件第一个工作表中已知列的值
+
+    .xlsx/.xlsm 优先直接按块解析工作表 XML，整块向量化检查；XML 无法快速解析时
+    回退到 openpyxl 只读模式，.xls 用 xlrd 逐行读取，同样每 chunk_rows 行检查一次。
+    返回 ValidationResult 的字典形式
+    """
+    import pandas as pd
+    from openpyxl import load_workbook
+
+    file_path = Path(file_path)
+    if file_path.suffix.lower() in ('.xlsx', '.xlsm'):
+        try:
+            return _validate_xlsx_fast(file_path).to_dict()
+        except (ValueError, KeyError, zipfile.BadZipFile, ET.ParseError):
+            # 快速路径不支持的写法或结构(见 _iter_sheet_cells)，其余异常照常抛出
+            pass
+
+    result = ValidationResult()
+    result.method = 'fallback'
+    if file_path.suffix.lower() == '.xls':
+        rows = _iter_xls_rows(file_path)
+        close = rows.close
+    else:
+        wb_in = load_workbook(file_path, read_only=True, data_only=True)
+        rows = wb_in.worksheets[0].iter_rows(values_only=True)
+        close = wb_in.close
+    try:
+        headers = next(rows, None)
+        if headers is None:
+            return result.to_dict()
+        mapped, _ = _canonical_layout(headers)
+        rules = {idx: (column, VALUE_RULES[column])
+                 for column, idx in mapped.items() if column in VALUE_RULES}
+        if not rules:
+            return result.to_dict()
+        chunk = []
+        first_row = 2
+        for row in rows:
+            chunk.append(row)
+            if len(chunk) >= chunk_rows:
+                _validate_frame(result, pd.DataFrame.from_records(chunk), rules, first_row)
+                first_row += len(chunk)
+                chunk = []
+        if chunk:
+            _validate_frame(result, pd.DataFrame.from_records(chunk), rules, first_row)
+    finally:
+        close()
+    return result.to_dict()
+
+
+def validate_excel_files(input_directory, report_path=None, jobs=1, include=None, exclude=None):
+    """
+    值检查: 按 VALUE_RULES 检查已知列(日期、次数等)的值，统计每个文件每列的违规数量和样例行号
+
+    jobs > 1 时多个文件并行检查；报告(--report)为 .json 或 .csv
+    include/exclude 为文件通配符过滤
+    """
+    print("\n" + "="*80)
+    print("值检查: 检查已知列的日期和数值格式")
     print("="*80)
     
     input_path = Path(input_directory)
@@ -223,56 +3282,235 @@ def check_unrecognized_columns(input_directory):
         print(f"❌ 错误: 目录不存在 - {input_directory}")
         return
     
-    # 查找所有 Excel 文件
-    excel_files = find_excel_files(input_directory)
+    excel_files = find_excel_files(input_directory, include, exclude)
     
     if not excel_files:
         print(f"❌ 未找到任何 Excel 文件在目录: {input_directory}")
         return
     
+    script_dir = Path(__file__).parent
+    report_path = Path(report_path) if report_path else script_dir / "output" / "validation_report.json"
+    report_path.parent.mkdir(parents=True, exist_ok=True)
+    
     print(f"\n✓ 找到 {len(excel_files)} 个 Excel 文件\n")
     
-    # 收集所有未识别的列名
-    unrecognized_columns_all = set()
+    report = {}
+    error_count = 0
+    invalid_files = 0
+    total_cells = 0
+    total_violations = 0
+    start = time.perf_counter()
     
-    # 遍历每个文件
-    for idx, file_path in enumerate(excel_files, 1):
-        print(f"[{idx}/{len(excel_files)}] 处理: {file_path.relative_to(input_path)}")
-        
-        headers = read_excel_headers(file_path)
-        if not headers:
+    results = _map_ordered(validate_workbook, [(file_path,) for file_path in excel_files], jobs)
+    for idx, ((file_path,), result, error) in enumerate(results, 1):
+        relative_path = str(file_path.relative_to(input_path))
+        print(f"[{idx}/{len(excel_files)}] 检查: {relative_path}")
+        if error:
+            print(f"  ⚠️ 失败: {error}")
+            error_count += 1
             continue
-        
-        # 找出未被识别的列名
-        unrecognized = set(headers) - set(SYSTEM_COLUMNS)
-        
-        if unrecognized:
-            print(f"  → 发现 {len(unrecognized)} 个未识别列名: {', '.join(sorted(unrecognized))}")
-            unrecognized_columns_all.update(unrecognized)
-        else:
-            print(f"  → 所有列名均已识别")
+        report[relative_path] = result
+        total_cells += result['cells']
+        if not result['violations']:
+            print(f"  ✓ {result['rows']} 行, {result['cells']} 个单元格, 未发现问题")
+            continue
+        invalid_files += 1
+        print(f"  ✗ {result['rows']} 行, {result['cells']} 个单元格, 发现问题:")
+        for column, info in result['violations'].items():
+            total_violations += info['count']
+            sample = ', '.join(str(row) for row in info['sample_rows'])
+            print(f"    - {column} ({VALUE_RULES[column]}): {info['count']} 个, 如第 {sample} 行")
     
-    # 输出汇总结果
-    print("\n" + "="*80)
-    print("汇总结果")
-    print("="*80)
+    elapsed = time.perf_counter() - start
     
-    if unrecognized_columns_all:
-        print(f"\n共发现 {len(unrecognized_columns_all)} 个未被系统识别的列名:\n")
-        for col in sorted(unrecognized_columns_all):
-            print(f"  • {col}")
+    if report_path.suffix.lower() == '.csv':
+        with open(report_path, 'w', encoding='utf-8-sig', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(['文件', '列名', '规则', '违规数量', '样例行号'])
+            for relative_path, result in report.items():
+                for column, info in result['violations'].items():
+                    writer.writerow([relative_path, column, VALUE_RULES[column], info['count'],
+                                     ' '.join(str(row) for row in info['sample_rows'])])
     else:
-        print("\n✓ 所有文件的列名均已被系统识别")
+        with open(report_path, 'w', encoding='utf-8') as f:
+            json.dump({'rules': VALUE_RULES, 'files': report}, f, ensure_ascii=False, indent=2)
     
+    print("\n" + "="*80)
+    print("检查结果统计")
+    print("="*80)
+    print(f"\n检查文件: {len(report)} 个 (失败 {error_count} 个)")
+    print(f"存在问题的文件: {invalid_files} 个")
+    print(f"检查单元格: {total_cells} 个, 违规 {total_violations} 个")
+    if elapsed > 0:
+        print(f"耗时: {elapsed:.2f} 秒 ({total_cells / elapsed:,.0f} 单元格/秒)")
+    print(f"\n报告已保存到: {report_path}")
     print("\n" + "="*80 + "\n")
 
 
-def simplify_excel_files(input_directory, max_rows=5):
+# watch 模式的默认轮询/检查间隔(秒)和文件稳定等待时间(秒)
+DEFAULT_WATCH_INTERVAL = 2.0
+DEFAULT_WATCH_SETTLE = 5.0
+
+
+def _is_watched_file(rel_path, include=None, exclude=None):
+    """按 iter_excel_files 的规则判断相对路径是否为需要处理的 Excel 文件"""
+    parts = rel_path.split('/')
+    name = parts[-1]
+    if name.startswith('~$') or not name.lower().endswith(EXCEL_EXTENSIONS):
+        return False
+    if exclude and any(_match_any('/'.join(parts[:idx + 1]), part, exclude)
+                       for idx, part in enumerate(parts)):
+        return False
+    return not include or _match_any(rel_path, name, include)
+
+
+class _InotifyWatcher:
     """
-    功能2: 精简 Excel 文件，仅保留列头和最多指定条数的数据
+    基于 Linux inotify 的目录监控(通过 ctypes 调用 libc，不需要第三方库)
+
+    递归监控所有子目录，新建的子目录自动加入监控；wait() 返回有变化的路径
+    (包括被删除或移出的文件和目录)，事件队列溢出时返回 None，由调用方重新扫描整个目录
+    """
+
+    IN_MODIFY = 0x00000002
+    IN_CLOSE_WRITE = 0x00000008
+    IN_MOVED_FROM = 0x00000040
+    IN_MOVED_TO = 0x00000080
+    IN_CREATE = 0x00000100
+    IN_DELETE = 0x00000200
+    IN_Q_OVERFLOW = 0x00004000
+    IN_IGNORED = 0x00008000
+    IN_ISDIR = 0x40000000
+    MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+
+    _EVENT = struct.Struct('iIII')
+
+    def __init__(self, root):
+        import ctypes
+        import ctypes.util
+
+        self._libc = ctypes.CDLL(ctypes.util.find_library('c') or None, use_errno=True)
+        self.fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 失败")
+        self._dirs = {}
+        self._add_tree(Path(root))
+
+    def _add_tree(self, directory):
+        """监控 directory 及其所有子目录，返回其中已有的文件(监控建立前可能已写入)"""
+        files = []
+        for current, dir_names, file_names in os.walk(directory):
+            wd = self._libc.inotify_add_watch(self.fd, os.fsencode(current), self.MASK)
+            if wd >= 0:
+                self._dirs[wd] = Path(current)
+            files.extend(Path(current) / name for name in file_names)
+        return files
+
+    def _remove_tree(self, directory):
+        """停止监控移出的目录及其子目录，避免之后的事件被记到原来的路径上"""
+        for wd, path in list(self._dirs.items()):
+            if path == directory or directory in path.parents:
+                self._libc.inotify_rm_watch(self.fd, wd)
+                del self._dirs[wd]
+
+    def wait(self, timeout):
+        """等待最多 timeout 秒，返回有变化的文件路径集合"""
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        changed = set()
+        if not ready:
+            return changed
+        while True:
+            try:
+                data = os.read(self.fd, 64 * 1024)
+            except BlockingIOError:
+                break
+            offset = 0
+            while offset < len(data):
+                wd, mask, _, length = self._EVENT.unpack_from(data, offset)
+                offset += self._EVENT.size
+                name = data[offset:offset + length].rstrip(b'\0')
+                offset += length
+                if mask & self.IN_Q_OVERFLOW:
+                    return None
+                if mask & self.IN_IGNORED:
+                    # 目录已删除或监控已移除，该描述符之后可能分配给其他目录
+                    self._dirs.pop(wd, None)
+                    continue
+                if wd not in self._dirs or not name:
+                    continue
+                path = self._dirs[wd] / os.fsdecode(name)
+                if mask & self.IN_ISDIR:
+                    if mask & (self.IN_CREATE | self.IN_MOVED_TO):
+                        changed.update(self._add_tree(path))
+                    elif mask & (self.IN_DELETE | self.IN_MOVED_FROM):
+                        if mask & self.IN_MOVED_FROM:
+                            self._remove_tree(path)
+                        changed.add(path)
+                else:
+                    changed.add(path)
+        return changed
+
+    def close(self):
+        os.close(self.fd)
+
+
+class _PollingWatcher:
+    """
+    轮询目录的监控方式，用于非 Linux 系统或网络盘(inotify 收不到其他机器的修改)
+
+    每 interval 秒最多扫描一次目录；wait() 提前返回时(如等待文件稳定)不扫描，
+    返回空集合。返回的路径包括新增、修改和已删除的文件
+    """
+
+    def __init__(self, root, include=None, exclude=None, interval=DEFAULT_WATCH_INTERVAL):
+        self.root = root
+        self.include = include
+        self.exclude = exclude
+        self.interval = interval
+        self._snapshot = self._scan()
+        self._scanned_at = time.monotonic()
+
+    def _scan(self):
+        snapshot = {}
+        for file_path in iter_excel_files(self.root, self.include, self.exclude):
+            try:
+                stat = file_path.stat()
+            except OSError:
+                continue
+            snapshot[file_path] = (stat.st_size, stat.st_mtime_ns)
+        return snapshot
+
+    def wait(self, timeout):
+        time.sleep(timeout)
+        if time.monotonic() - self._scanned_at < self.interval:
+            return set()
+        snapshot = self._scan()
+        self._scanned_at = time.monotonic()
+        changed = {path for path, signature in snapshot.items()
+                   if self._snapshot.get(path) != signature}
+        changed.update(self._snapshot.keys() - snapshot.keys())
+        self._snapshot = snapshot
+        return changed
+
+    def close(self):
+        pass
+
+
+def watch_directory(input_directory, max_rows=5, streaming=False, output_directory=None,
+                    report_path=None, timeout=DEFAULT_FILE_TIMEOUT, interval=DEFAULT_WATCH_INTERVAL,
+                    settle=DEFAULT_WATCH_SETTLE, poll=False, include=None, exclude=None,
+                    records=None):
+    """
+    监控模式: 持续监控目录，对新增或修改的 Excel 文件执行列名检测(功能1)和精简(功能2)
+
+    Linux 上使用 inotify，其他系统或 poll=True 时每 interval 秒轮询一次。文件大小和
+    修改时间连续 settle 秒不变后才处理，避免读取仍在写入的文件。启动时处理精简结果
+    不存在或早于源文件的文件。每批处理后更新列名统计报告(与功能1的 --report 格式相同)，
+    已删除的文件从报告中移除。
+    进程常驻，pandas/openpyxl 只导入一次。按 Ctrl+C 结束
     """
     print("\n" + "="*80)
-    print(f"功能2: 精简 Excel 文件 (保留列头 + 最多 {max_rows} 条数据)")
+    print("监控模式: 对新增或修改的文件检测列名并精简")
     print("="*80)
     
     input_path = Path(input_directory)
@@ -280,95 +3518,332 @@ def simplify_excel_files(input_directory, max_rows=5):
         print(f"❌ 错误: 目录不存在 - {input_directory}")
         return
     
-    # 创建输出目录
     script_dir = Path(__file__).parent
-    output_dir = script_dir / "output"
-    output_dir.mkdir(exist_ok=True)
-    
-    # 查找所有 Excel 文件
-    excel_files = find_excel_files(input_directory)
+    output_dir = Path(output_directory) if output_directory else script_dir / "output"
+    output_dir.mkdir(parents=True, exist_ok=True)
+    report_path = Path(report_path) if report_path else output_dir / "watch_report.json"
     
-    if not excel_files:
-        print(f"❌ 未找到任何 Excel 文件在目录: {input_directory}")
-        return
+    watcher = None
+    if not poll and sys.platform.startswith('linux'):
+        try:
+            watcher = _InotifyWatcher(input_path)
+            mode = "inotify"
+        except (OSError, AttributeError) as e:
+            print(f"⚠️ 无法使用 inotify({e})，改为轮询")
+    if watcher is None:
+        watcher = _PollingWatcher(input_path, include, exclude, interval)
+        mode = f"轮询(每 {interval} 秒)"
     
-    print(f"\n✓ 找到 {len(excel_files)} 个 Excel 文件")
-    print(f"✓ 输出目录: {output_dir}\n")
+    print(f"\n✓ 监控目录: {input_path}")
+    print(f"✓ 监控方式: {mode}，文件稳定 {settle} 秒后处理")
+    print(f"✓ 输出目录: {output_dir}")
+    print(f"✓ 统计报告: {report_path}")
+    print("  按 Ctrl+C 结束\n")
     
-    success_count = 0
+    recorder = JsonlRecorder(records, 'watch') if records is not None else None
+    latest_headers = {}
+    pending = {}
+    processed_count = 0
     error_count = 0
     
-    # 遍历每个文件
-    for idx, file_path in enumerate(excel_files, 1):
+    def queue_file(file_path):
+        try:
+            rel_path = file_path.relative_to(input_path).as_posix()
+        except ValueError:
+            return
+        if _is_watched_file(rel_path, include, exclude):
+            pending[file_path] = None
+    
+    def forget(path):
+        """从报告中移除已删除的文件，path 为目录时移除其下所有文件，返回是否有移除"""
+        try:
+            rel_path = path.relative_to(input_path).as_posix()
+        except ValueError:
+            return False
+        removed = [key for key in latest_headers
+                   if key == rel_path or key.startswith(rel_path + '/')]
+        for key in removed:
+            del latest_headers[key]
+        return bool(removed)
+    
+    def next_wait():
+        """等待到最早一个待处理文件可能稳定的时刻，最长 interval 秒"""
+        if not pending:
+            return interval
+        if any(state is None for state in pending.values()):
+            return 0
+        earliest = min(since for _, since in pending.values())
+        return min(interval, max(0.0, earliest + settle - time.monotonic()))
+    
+    # 启动时处理尚未精简或精简结果已过期的文件
+    for file_path in iter_excel_files(input_path, include, exclude):
+        output_file = output_dir / file_path.relative_to(input_path)
+        if not output_file.exists() or output_file.stat().st_mtime < file_path.stat().st_mtime:
+            pending[file_path] = None
+    
+    def process(file_path):
         relative_path = file_path.relative_to(input_path)
-        print(f"[{idx}/{len(excel_files)}] 处理: {relative_path}")
+        print(f"[{time.strftime('%H:%M:%S')}] 处理: {relative_path}")
+        file_stats = {}
+        headers, error, header_stats = _scan_file_headers(file_path, timeout)
+        for stage, value in header_stats.items():
+            file_stats[stage] = file_stats.get(stage, 0) + value
+        if error:
+            print(f"  ⚠️ 读取文件失败: {error}")
+            if recorder is not None:
+                recorder.file(relative_path, 'error', file_stats, error=error)
+            return False
+        latest_headers[relative_path.as_posix()] = headers
+        unrecognized = sorted(set(headers) - set(SYSTEM_COLUMNS))
+        if unrecognized:
+            print(f"  → 发现 {len(unrecognized)} 个未识别列名: {', '.join(unrecognized)}")
+        else:
+            print(f"  → 所有列名均已识别")
         
+        output_file = output_dir / relative_path
         try:
-            # 读取 Excel 文件，只读取前 max_rows 行数据
-            df = pd.read_excel(file_path, nrows=max_rows)
-            
-            # 构建输出文件路径(保持相对目录结构)
-            output_file = output_dir / relative_path
             output_file.parent.mkdir(parents=True, exist_ok=True)
+            if streaming and file_path.suffix.lower() in ('.xlsx', '.xlsm'):
+                rows_kept = sum(simplify_workbook_streaming(file_path, output_file, max_rows,
+                                                            file_stats).values())
+            else:
+                rows_kept = simplify_workbook(file_path, output_file, max_rows, file_stats)
+        except Exception as e:
+            print(f"  ⚠️ 精简失败: {e}")
+            if recorder is not None:
+                recorder.file(relative_path, 'error', file_stats, error=str(e), headers=headers,
+                              unrecognized=unrecognized)
+            return False
+        print(f"  ✓ 保留了 {rows_kept} 条数据 → {output_file}")
+        if recorder is not None:
+            file_stats['bytes_written'] = output_file.stat().st_size
+            recorder.file(relative_path, 'ok', file_stats, headers=headers,
+                          unrecognized=unrecognized, rows_kept=rows_kept, output=str(output_file))
+        return True
+    
+    try:
+        while True:
+            changed = watcher.wait(next_wait())
+            removed = False
+            if changed is None:
+                print("⚠️ inotify 事件队列溢出，重新扫描目录")
+                changed = set(iter_excel_files(input_path, include, exclude))
+                for rel_path in list(latest_headers):
+                    if not (input_path / rel_path).exists():
+                        removed = forget(input_path / rel_path) or removed
+            for file_path in changed:
+                if file_path.exists():
+                    queue_file(file_path)
+                else:
+                    removed = forget(file_path) or removed
             
-            # 写入精简后的数据
-            df.to_excel(output_file, index=False, engine='openpyxl')
+            now = time.monotonic()
+            ready = []
+            for file_path, state in list(pending.items()):
+                try:
+                    stat = file_path.stat()
+                except OSError:
+                    del pending[file_path]
+                    removed = forget(file_path) or removed
+                    continue
+                signature = (stat.st_size, stat.st_mtime_ns)
+                if state is None or state[0] != signature:
+                    pending[file_path] = (signature, now)
+                elif now - state[1] >= settle:
+                    ready.append(file_path)
+                    del pending[file_path]
             
-            print(f"  ✓ 成功: 保留了 {len(df)} 条数据 → {output_file.relative_to(script_dir)}")
-            success_count += 1
+            if not ready and not removed:
+                continue
+            for file_path in sorted(ready):
+                if process(file_path):
+                    processed_count += 1
+                else:
+                    error_count += 1
             
-        except Exception as e:
-            print(f"  ⚠️ 失败: {str(e)}")
-            error_count += 1
+            # 滚动更新报告: 每个文件只统计最近一次的列头
+            stats = ColumnStats()
+            for rel_path, headers in sorted(latest_headers.items()):
+                stats.add(rel_path, headers)
+            stats.write(report_path)
+            print(f"  报告已更新: 累计处理 {processed_count} 个文件, 失败 {error_count} 个\n")
+    except KeyboardInterrupt:
+        print("\n已停止监控")
+    finally:
+        watcher.close()
+        if recorder is not None:
+            recorder.summary()
     
-    # 输出统计结果
     print("\n" + "="*80)
-    print("处理结果统计")
+    print("监控结果统计")
     print("="*80)
-    print(f"\n成功: {success_count} 个文件")
+    print(f"\n处理: {processed_count} 个文件")
     print(f"失败: {error_count} 个文件")
-    print(f"总计: {len(excel_files)} 个文件")
-    print(f"\n输出目录: {output_dir}")
+    print(f"\n统计报告: {report_path}")
     print("\n" + "="*80 + "\n")
 
 
 def main():
     """主函数"""
-    print("\n" + "="*80)
-    print(" Excel 处理工具")
-    print("="*80)
+    parser = argparse.ArgumentParser(
+        description='Excel 处理工具',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+功能编号:
+  1 - 检测未被系统识别的列名
+  2 - 精简 Excel 文件(保留列头和最多5条数据)
+  all - 执行所有功能
+  prune-cache - 清理列头缓存中已删除文件的记录(需配合 --cache)
+  split - 拆分大文件，每个文件最多 --rows-per-file 条数据并重复列头
+  convert - 将 .xls 文件批量转换为 .xlsx(已是最新的文件自动跳过)
+  parquet - 将 Excel 文件按 SYSTEM_COLUMNS 列顺序导出为 Parquet(--arrow 导出 Arrow IPC)
+  repair - 修复问题文件列表(JSON)中导致 ExcelJS 报 attribute without value 的文件
+  inventory - 统计每个文件的工作表、行数、列数和大小，输出清单(--report 指定 .json/.csv)
+  dedup - 按公开(公告)号(为空时按申请号)跨文件去重，输出去重后的文件和重复记录报告
+  validate - 检查已知列的日期、次数等取值，统计每个文件的违规数量和样例行号
+  merge - 按 SYSTEM_COLUMNS 列顺序合并所有文件(--merge-format xlsx/csv/parquet)，记录来源文件和行号
+  watch - 持续监控目录，对新增或修改的文件执行功能1和功能2(Linux 使用 inotify，其他系统轮询)
+
+示例:
+  python process_excel.py 1 /path/to/excel/folder
+  python process_excel.py 1 /path/to/excel/folder --jobs 16
+  python process_excel.py 1 /path/to/excel/folder --cache headers.db
+  python process_excel.py 1 /path/to/excel/folder --report columns.json
+  python process_excel.py prune-cache /path/to/excel/folder --cache headers.db
+  python process_excel.py split /path/to/excel/folder --rows-per-file 60000 --jobs 8
+  python process_excel.py convert /path/to/excel/folder --output-dir /path/to/xlsx --jobs 8
+  python process_excel.py parquet /path/to/excel/folder --jobs 8
+  python process_excel.py repair ../excel_tools/problem_file.json --jobs 8
+  python process_excel.py inventory /path/to/excel/folder --report inventory.csv
+  python process_excel.py dedup /path/to/excel/folder --report duplicates.csv
+  python process_excel.py validate /path/to/excel/folder --jobs 8
+  python process_excel.py merge /path/to/excel/folder --merge-format parquet --jobs 8
+  python process_excel.py watch /path/to/intake 10 --streaming --report watch_report.json
+  python process_excel.py 2 /path/to/excel/folder
+  python process_excel.py 2 /path/to/excel/folder 10
+  python process_excel.py 2 /path/to/excel/folder 10 --streaming
+  python process_excel.py 2 /path/to/excel/folder 20 --stratify-by 专利类型 --seed 1
+  python process_excel.py 1 /path/to/excel/folder --exclude "*曾用名*" --include "*.xlsx"
+  python process_excel.py all /path/to/excel/folder --format jsonl > results.jsonl
+  python process_excel.py all /path/to/excel/folder
+        """
+    )
+    parser.add_argument('function', metavar='功能编号', help='1, 2, all, prune-cache, split, convert, parquet, repair, inventory, dedup, validate, merge 或 watch')
+    parser.add_argument('input_directory', metavar='输入目录',
+                        help='Excel 文件所在目录 (repair 为问题文件列表 JSON)')
+    parser.add_argument('max_rows', metavar='最大行数', nargs='?', type=int, default=5,
+                        help='功能2中保留的最大数据行数 (默认: 5)')
+    parser.add_argument('-j', '--jobs', type=int, default=1,
+                        help='并行进程数，用于功能1、split、convert、parquet、repair、inventory、validate 和 merge (默认: 1)')
+    parser.add_argument('--timeout', type=float, default=DEFAULT_FILE_TIMEOUT,
+                        help=f'功能1中单个文件的读取超时秒数 (默认: {DEFAULT_FILE_TIMEOUT})')
+    parser.add_argument('--rows-per-file', type=int, default=DEFAULT_SPLIT_ROWS,
+                        help=f'split 和 merge(xlsx)中每个文件的数据行数 (默认: {DEFAULT_SPLIT_ROWS})')
+    parser.add_argument('--output-dir', default=None,
+                        help='split/convert/parquet/repair/dedup/merge/watch 的输出目录 (默认: output/<功能名>，watch 为 output)')
+    parser.add_argument('--chunk-rows', type=int, default=DEFAULT_CHUNK_ROWS,
+                        help=f'parquet 和 merge 每个数据块的行数 (默认: {DEFAULT_CHUNK_ROWS})')
+    parser.add_argument('--merge-format', choices=MERGE_FORMATS, default='xlsx',
+                        help='merge 的输出格式 (默认: xlsx)')
+    parser.add_argument('--arrow', action='store_true',
+                        help='parquet 改为导出 Arrow IPC 文件')
+    parser.add_argument('--streaming', action='store_true',
+                        help='功能2使用流式模式，保留所有工作表且内存只与保留行数有关')
+    parser.add_argument('--sample', action='store_true',
+                        help='功能2改为从第一个工作表的全部数据中随机抽取(水塘抽样)，而不是取前 N 行')
+    parser.add_argument('--stratify-by', default=None, metavar='列名',
+                        help='功能2按该列的取值分层抽样(如 专利类型)，各分组数量尽量相同，隐含 --sample')
+    parser.add_argument('--seed', type=int, default=None,
+                        help='--sample/--stratify-by 的随机种子，指定后结果可复现')
+    parser.add_argument('--report', default=None,
+                        help='功能1的列名频次和共现统计报告(.json 或 .csv)、inventory 的清单和 validate 的检查报告(.json 或 .csv)、dedup 的重复记录报告(.csv)')
+    parser.add_argument('--cache', metavar='DB', default=None,
+                        help='列头缓存 SQLite 文件路径，再次扫描时跳过未变化的文件')
+    parser.add_argument('--cache-hash', action='store_true',
+                        help='缓存同时记录文件内容哈希，修改时间变化但内容相同的文件仍命中缓存')
+    parser.add_argument('--interval', type=float, default=DEFAULT_WATCH_INTERVAL,
+                        help=f'watch 的检查/轮询间隔秒数 (默认: {DEFAULT_WATCH_INTERVAL})')
+    parser.add_argument('--settle', type=float, default=DEFAULT_WATCH_SETTLE,
+                        help=f'watch 中文件大小和修改时间保持不变多少秒后才处理 (默认: {DEFAULT_WATCH_SETTLE})')
+    parser.add_argument('--poll', action='store_true',
+                        help='watch 强制使用轮询(网络盘上 inotify 收不到其他机器写入的文件)')
+    parser.add_argument('--format', choices=['text', 'jsonl'], default='text',
+                        help='功能1/2和 watch 的输出格式: text 为文字说明；jsonl 在标准输出中按行输出每个文件的'
+                             ' JSON 记录和汇总，文字说明改为输出到标准错误 (默认: text)')
+    parser.add_argument('--include', metavar='GLOB', action='append', default=None,
+                        help='只处理相对路径或文件名匹配的文件，可重复指定 (如 --include "2023/*")')
+    parser.add_argument('--exclude', metavar='GLOB', action='append', default=None,
+                        help='跳过相对路径或文件名匹配的文件和目录，可重复指定 (如 --exclude "*曾用名*")')
     
-    # 获取命令行参数
-    if len(sys.argv) < 3:
-        print("\n用法:")
-        print("  python process_excel.py <功能编号> <输入目录> [最大行数]")
-        print("\n功能编号:")
-        print("  1 - 检测未被系统识别的列名")
-        print("  2 - 精简 Excel 文件(保留列头和最多5条数据)")
-        print("  all - 执行所有功能")
-        print("\n示例:")
-        print("  python process_excel.py 1 /path/to/excel/folder")
-        print("  python process_excel.py 2 /path/to/excel/folder")
-        print("  python process_excel.py 2 /path/to/excel/folder 10")
-        print("  python process_excel.py all /path/to/excel/folder")
-        sys.exit(1)
+    args = parser.parse_args()
     
-    function_num = sys.argv[1]
-    input_directory = sys.argv[2]
-    max_rows = int(sys.argv[3]) if len(sys.argv) > 3 else 5
-    
-    # 执行对应功能
-    if function_num == '1':
-        check_unrecognized_columns(input_directory)
-    elif function_num == '2':
-        simplify_excel_files(input_directory, max_rows)
-    elif function_num.lower() == 'all':
-        check_unrecognized_columns(input_directory)
-        simplify_excel_files(input_directory, max_rows)
-    else:
-        print(f"\n❌ 错误: 无效的功能编号 '{function_num}'")
-        print("   有效的功能编号: 1, 2, all")
+    # jsonl 模式下标准输出只保留 JSON 记录，文字说明改为输出到标准错误
+    records = sys.stdout if args.format == 'jsonl' else None
+    with contextlib.redirect_stdout(sys.stderr) if records is not None else contextlib.nullcontext():
+        print("\n" + "="*80)
+        print(" Excel 处理工具")
+        print("="*80)
+        _run_function(args, records)
+
+
+def _run_function(args, records=None):
+    """执行命令行指定的功能"""
+    function_num = args.function
+    input_directory = args.input_directory
+    max_rows = args.max_rows
+    
+    if function_num.lower() == 'prune-cache' and not args.cache:
+        print("\n❌ 错误: prune-cache 需要通过 --cache 指定缓存文件")
         sys.exit(1)
+    cache = HeaderCache(args.cache, use_hash=args.cache_hash) if args.cache else None
+    
+    try:
+        # 执行对应功能
+        if function_num == '1':
+            check_unrecognized_columns(input_directory, args.jobs, args.timeout, cache, args.report,
+                                       include=args.include, exclude=args.exclude, records=records)
+        elif function_num == '2':
+            simplify_excel_files(input_directory, max_rows, args.streaming,
+                                 include=args.include, exclude=args.exclude, records=records,
+                                 sample=args.sample, stratify_by=args.stratify_by, seed=args.seed)
+        elif function_num.lower() == 'all':
+            check_unrecognized_columns(input_directory, args.jobs, args.timeout, cache, args.report,
+                                       include=args.include, exclude=args.exclude, records=records)
+            simplify_excel_files(input_directory, max_rows, args.streaming,
+                                 include=args.include, exclude=args.exclude, records=records,
+                                 sample=args.sample, stratify_by=args.stratify_by, seed=args.seed)
+        elif function_num.lower() == 'prune-cache':
+            prune_header_cache(cache, input_directory)
+        elif function_num.lower() == 'split':
+            split_excel_files(input_directory, args.rows_per_file, args.jobs, args.include, args.exclude,
+                              args.output_dir)
+        elif function_num.lower() == 'convert':
+            convert_xls_files(input_directory, args.output_dir, args.jobs, args.include, args.exclude)
+        elif function_num.lower() == 'parquet':
+            export_columnar_files(input_directory, args.output_dir, args.chunk_rows,
+                                  args.arrow, args.jobs, args.include, args.exclude)
+        elif function_num.lower() == 'repair':
+            repair_problem_files(input_directory, args.output_dir, args.jobs)
+        elif function_num.lower() == 'inventory':
+            inventory_files(input_directory, args.report, args.jobs, args.include, args.exclude)
+        elif function_num.lower() == 'dedup':
+            dedup_excel_files(input_directory, args.output_dir, args.report, args.include, args.exclude)
+        elif function_num.lower() == 'validate':
+            validate_excel_files(input_directory, args.report, args.jobs, args.include, args.exclude)
+        elif function_num.lower() == 'merge':
+            merge_excel_files(input_directory, args.output_dir, args.merge_format, args.rows_per_file,
+                              args.chunk_rows, args.jobs, args.include, args.exclude)
+        elif function_num.lower() == 'watch':
+            watch_directory(input_directory, max_rows, args.streaming, args.output_dir, args.report,
+                            args.timeout, args.interval, args.settle, args.poll,
+                            args.include, args.exclude, records)
+        else:
+            print(f"\n❌ 错误: 无效的功能编号 '{function_num}'")
+            print("   有效的功能编号: 1, 2, all, prune-cache, split, convert, parquet, repair, inventory, dedup, validate, merge, watch")
+            sys.exit(1)
+    finally:
+        if cache is not None:
+            cache.close()
 
 
 if __name__ == "__main__":
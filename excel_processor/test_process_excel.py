@@ -0,0 +1,681 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试 process_excel.py 的功能
+测试数据在临时目录中生成
+"""
+
+import sys
+import csv
+import multiprocessing
+import zipfile
+from pathlib import Path
+
+import pytest
+from openpyxl import Workbook, load_workbook
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+import process_excel
+
+
+def write_workbook(path, rows):
+    """把 rows 写入 path 的第一个工作表"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    wb = Workbook()
+    for row in rows:
+        wb.active.append(row)
+    wb.save(path)
+    return path
+
+
+def write_raw_xlsx(path, sheet_data, shared_strings=()):
+    """按给定的 <sheetData> 内容和共享字符串直接生成 .xlsx，用于构造内联字符串等情况"""
+    main_ns = 'http://schemas.openxmlformats.org/spreadsheetml/2006/main'
+    rel_ns = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships'
+    pkg_rel_ns = 'http://schemas.openxmlformats.org/package/2006/relationships'
+    strings = ''.join(f'<si><t>{text}</t></si>' for text in shared_strings)
+    parts = {
+        '[Content_Types].xml': (
+            '<?xml version="1.0" encoding="UTF-8"?>'
+            '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+            '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+            '<Default Extension="xml" ContentType="application/xml"/>'
+            '<Override PartName="/xl/workbook.xml" ContentType="application/'
+            'vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+            '<Override PartName="/xl/worksheets/sheet1.xml" ContentType="application/'
+            'vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+            '<Override PartName="/xl/sharedStrings.xml" ContentType="application/'
+            'vnd.openxmlformats-officedocument.spreadsheetml.sharedStrings+xml"/>'
+            '</Types>'),
+        '_rels/.rels': (
+            f'<?xml version="1.0" encoding="UTF-8"?><Relationships xmlns="{pkg_rel_ns}">'
+            f'<Relationship Id="rId1" Type="{rel_ns}/officeDocument" Target="xl/workbook.xml"/>'
+            '</Relationships>'),
+        'xl/workbook.xml': (
+            f'<?xml version="1.0" encoding="UTF-8"?><workbook xmlns="{main_ns}" xmlns:r="{rel_ns}">'
+            '<sheets><sheet name="Sheet1" sheetId="1" r:id="rId1"/></sheets></workbook>'),
+        'xl/_rels/workbook.xml.rels': (
+            f'<?xml version="1.0" encoding="UTF-8"?><Relationships xmlns="{pkg_rel_ns}">'
+            f'<Relationship Id="rId1" Type="{rel_ns}/worksheet" Target="worksheets/sheet1.xml"/>'
+            f'<Relationship Id="rId2" Type="{rel_ns}/sharedStrings" Target="sharedStrings.xml"/>'
+            '</Relationships>'),
+        'xl/worksheets/sheet1.xml': (
+            f'<?xml version="1.0" encoding="UTF-8"?><worksheet xmlns="{main_ns}">'
+            f'<sheetData>{sheet_data}</sheetData></worksheet>'),
+        'xl/sharedStrings.xml': (
+            f'<?xml version="1.0" encoding="UTF-8"?><sst xmlns="{main_ns}" count="{len(shared_strings)}" '
+            f'uniqueCount="{len(shared_strings)}">{strings}</sst>'),
+    }
+    with zipfile.ZipFile(path, 'w') as zf:
+        for name, content in parts.items():
+            zf.writestr(name, content)
+    return path
+
+
+# 列头测试用例: 名称 -> (<sheetData> 内容, 共享字符串)
+HEADER_CASES = {
+    'shared_and_inline': (
+        '<row r="1"><c r="A1" t="s"><v>0</v></c><c r="B1" t="inlineStr"><is><t>申请号</t></is></c>'
+        '<c r="C1" t="s"><v>1</v></c></row>'
+        '<row r="2"><c r="A2"><v>1</v></c></row>',
+        ['公开(公告)号', '标题']),
+    'empty_and_duplicate': (
+        '<row r="1"><c r="B1" t="s"><v>0</v></c><c r="C1" t="s"><v>0</v></c>'
+        '<c r="E1" t="inlineStr"><is><t>标题</t></is></c><c r="F1" t="s"><v>0</v></c>'
+        '<c r="G1" t="s"><v>1</v></c></row>',
+        ['申请号', '']),
+    'boolean': (
+        '<row r="1"><c r="A1" t="b"><v>1</v></c><c r="B1" t="b"><v>0</v></c>'
+        '<c r="C1" t="inlineStr"><is><t>x</t></is></c></row>',
+        []),
+    'numbers': (
+        '<row r="1"><c r="A1"><v>2021</v></c><c r="B1"><v>1.5</v></c><c r="C1"><v>1E3</v></c>'
+        '<c r="D1" t="inlineStr"><is><t>2021</t></is></c></row>',
+        []),
+    'blank_first_row': (
+        '<row r="1"><c r="A1" s="1"/></row>'
+        '<row r="3"><c r="A3" t="inlineStr"><is><t>h1</t></is></c></row>',
+        []),
+    'missing_first_row': (
+        '<row r="3"><c r="A3" t="inlineStr"><is><t>h1</t></is></c>'
+        '<c r="B3" t="inlineStr"><is><t>h2</t></is></c></row>',
+        []),
+    'empty_sheet': ('', []),
+}
+
+
+def test_xlsx_headers_match_pandas(tmp_path):
+    """read_xlsx_headers 与 pd.read_excel(nrows=0) 的列名一致"""
+    import pandas as pd
+
+    for name, (sheet_data, shared_strings) in HEADER_CASES.items():
+        path = write_raw_xlsx(tmp_path / f'{name}.xlsx', sheet_data, shared_strings)
+        expected = list(pd.read_excel(path, nrows=0).columns)
+        assert process_excel.read_xlsx_headers(path) == expected, name
+
+
+def test_mixed_type_headers_as_text(tmp_path, monkeypatch, capsys):
+    """布尔、数值列头转换为字符串，快速路径与 pandas 回退一致，功能1 可正常排序输出"""
+    path = write_workbook(tmp_path / 'in' / 'a.xlsx', [['标题', True, 'foo', 2021, 1.5]])
+    expected = ['标题', 'True', 'foo', '2021', '1.5']
+    assert process_excel.load_excel_headers(path) == expected
+
+    process_excel.check_unrecognized_columns(tmp_path / 'in')
+    assert '发现 4 个未识别列名: 1.5, 2021, True, foo' in capsys.readouterr().out
+
+    def fail(file_path, stats=None):
+        raise ValueError('强制回退')
+
+    monkeypatch.setattr(process_excel, 'read_xlsx_headers', fail)
+    assert process_excel.load_excel_headers(path) == expected
+
+
+def test_dedup_discards_keys_of_failed_file(tmp_path, monkeypatch):
+    """处理失败的文件不输出，它的键也不会使后续文件的行被当作重复删除"""
+    header = ['公开(公告)号', '标题']
+    write_workbook(tmp_path / 'in' / 'a.xlsx', [header, ['CN1', 'a1'], ['CN2', 'a2']])
+    write_workbook(tmp_path / 'in' / 'b.xlsx', [header, ['CN3', 'b1'], ['BAD', 'b2'], ['CN4', 'b3']])
+    write_workbook(tmp_path / 'in' / 'c.xlsx', [header, ['CN3', 'c1'], ['CN1', 'c2'], ['CN4', 'c3']])
+
+    copy_cell = process_excel._copy_cell
+
+    def fail_on_bad(ws_out, cell):
+        if cell.value == 'BAD':
+            raise RuntimeError('写入失败')
+        return copy_cell(ws_out, cell)
+
+    monkeypatch.setattr(process_excel, '_copy_cell', fail_on_bad)
+    output_dir = tmp_path / 'out'
+    process_excel.dedup_excel_files(tmp_path / 'in', output_dir)
+
+    assert not (output_dir / 'b.xlsx').exists()
+    kept = [row[0] for row in load_workbook(output_dir / 'c.xlsx').active.values]
+    assert kept == ['公开(公告)号', 'CN3', 'CN4']
+    with open(output_dir / 'dedup_report.csv', encoding='utf-8-sig') as f:
+        report = list(csv.reader(f))
+    assert report[1:] == [['公开(公告)号', 'CN1', 'c.xlsx', '3', 'a.xlsx', '2']]
+
+
+def test_sample_missing_stratify_column(tmp_path, monkeypatch):
+    """缺少分组列时抛出 ValueError，不写出文件，也不遗留未关闭的写入流"""
+    import gc
+
+    unraisable = []
+    monkeypatch.setattr(sys, 'unraisablehook', unraisable.append)
+    source = write_workbook(tmp_path / 'a.xlsx', [['公开(公告)号', '标题'], ['CN1', 'a1'], ['CN2', 'a2']])
+    output = tmp_path / 'out' / 'a.xlsx'
+    with pytest.raises(ValueError, match='未找到分组列'):
+        process_excel.sample_workbook(source, output, 1, stratify_by='专利类型')
+    gc.collect()
+    assert unraisable == []
+    assert not output.exists()
+
+
+def test_row_sampler_stratified_counts():
+    """group_counts 在 rows() 之前为 0，之后与抽中的行一致"""
+    sampler = process_excel.RowSampler(4, seed=1, key=lambda row: row[0])
+    for i in range(30):
+        sampler.add(('A' if i % 3 else 'B', i))
+    assert sampler.group_counts() == {'A': (20, 0), 'B': (10, 0)}
+    rows = sampler.rows()
+    assert len(rows) == 4
+    assert [row[1] for row in rows] == sorted(row[1] for row in rows)
+    assert sampler.group_counts() == {'A': (20, 2), 'B': (10, 2)}
+
+
+def test_header_cache_skips_deleted_file(tmp_path):
+    """缓存过的文件在扫描中被删除时报告为失败文件，其余文件照常读取；哈希随列头一起写入缓存"""
+    header = ['公开(公告)号', '标题']
+    files = [write_workbook(tmp_path / f'{name}.xlsx', [header, ['CN1', name]]) for name in 'abc']
+    cache = process_excel.HeaderCache(tmp_path / 'cache.db', use_hash=True)
+    try:
+        for jobs in (1, 2):
+            results = list(process_excel.iter_file_headers(files, jobs=jobs, cache=cache))
+            assert [error for _, _, error, _ in results] == [None, None, None]
+        hashes = [row[0] for row in cache.conn.execute("SELECT content_hash FROM headers")]
+        assert sorted(hashes) == sorted(process_excel._file_sha1(path) for path in files)
+
+        files[1].unlink()
+        for jobs in (1, 2):
+            results = list(process_excel.iter_file_headers(files, jobs=jobs, cache=cache))
+            assert [headers for _, headers, _, _ in results] == [header, [], header]
+            assert results[1][2]
+    finally:
+        cache.close()
+
+
+def test_header_cache_hash_checked_by_worker(tmp_path, monkeypatch):
+    """只有修改时间变化时主进程不计算哈希，由读取列头的一方确认内容未变后命中缓存"""
+    import os
+
+    header = ['公开(公告)号', '标题']
+    files = [write_workbook(tmp_path / f'{name}.xlsx', [header, ['CN1', name]]) for name in 'ab']
+    cache = process_excel.HeaderCache(tmp_path / 'cache.db', use_hash=True)
+    try:
+        list(process_excel.iter_file_headers(files, cache=cache))
+        for path in files:
+            os.utime(path, ns=(path.stat().st_atime_ns, path.stat().st_mtime_ns + 10 ** 9))
+        write_workbook(files[0], [['申请号'], ['CN2']])
+
+        sha1 = process_excel._file_sha1
+        monkeypatch.setattr(process_excel, '_file_sha1', lambda path: pytest.fail('主进程计算了哈希'))
+        assert cache.get(files[1]) == (None, (sha1(files[1]), header))
+        monkeypatch.setattr(process_excel, '_file_sha1', sha1)
+
+        hits, misses = cache.hits, cache.misses
+        results = list(process_excel.iter_file_headers(files, cache=cache))
+        assert [headers for _, headers, _, _ in results] == [['申请号'], header]
+        assert 'cached' not in results[0][3] and results[1][3] == {'cached': True}
+        assert (cache.hits - hits, cache.misses - misses) == (1, 1)
+        assert cache.get(files[1]) == (header, None)
+    finally:
+        cache.close()
+
+
+def test_convert_xls_removes_temp_file_on_failure(tmp_path, monkeypatch):
+    """替换目标文件失败时不遗留 .xlsx.tmp 临时文件"""
+    # xlwt 只用于生成 .xls 测试文件，不是依赖项
+    xlwt = pytest.importorskip('xlwt')
+
+    book = xlwt.Workbook()
+    sheet = book.add_sheet('Sheet1')
+    for col, value in enumerate(['公开(公告)号', '标题']):
+        sheet.write(0, col, value)
+    source = tmp_path / 'a.xls'
+    book.save(str(source))
+
+    def fail_replace(src, dst):
+        raise OSError('磁盘已满')
+
+    monkeypatch.setattr(process_excel.os, 'replace', fail_replace)
+    output = tmp_path / 'out' / 'a.xlsx'
+    with pytest.raises(OSError):
+        process_excel.convert_xls_file(source, output)
+    assert list(output.parent.iterdir()) == []
+
+
+def test_validate_fast_matches_fallback(tmp_path, monkeypatch):
+    """快速检查只校验规则列引用的共享字符串，结果与 openpyxl 回退方式一致"""
+    rows = [['标题', '申请日', '权利要求数量', '公开(公告)日']]
+    for i in range(40):
+        rows.append([f'标题 {i}', '2020-01-31' if i % 7 else '无效日期',
+                     str(i) if i % 9 else '-1', '2020/1/31' if i % 5 else '2020-13-01'])
+    rows.append(['2020-01-31', '1', 'abc', None])
+    path = write_workbook(tmp_path / 'a.xlsx', rows)
+
+    fast = process_excel.validate_workbook(path)
+    assert fast['method'] == 'fast'
+
+    def fail(file_path):
+        raise ValueError('强制回退')
+
+    monkeypatch.setattr(process_excel, '_validate_xlsx_fast', fail)
+    fallback = process_excel.validate_workbook(path)
+    assert fallback['method'] == 'fallback'
+    assert fast['violations'] == fallback['violations']
+    assert (fast['rows'], fast['cells']) == (fallback['rows'], fallback['cells'])
+
+
+def test_polling_watcher_reports_deleted_files(tmp_path):
+    """轮询监控在 interval 内不重复扫描，删除的文件也作为变化返回"""
+    header = [['公开(公告)号']]
+    kept = write_workbook(tmp_path / 'a.xlsx', header)
+    deleted = write_workbook(tmp_path / 'sub' / 'b.xlsx', header)
+    watcher = process_excel._PollingWatcher(tmp_path, interval=60)
+    deleted.unlink()
+    assert watcher.wait(0) == set()
+
+    watcher.interval = 0
+    assert watcher.wait(0) == {deleted}
+    assert watcher.wait(0) == set()
+    assert kept.exists()
+
+
+def test_scan_timeout_does_not_fall_back_to_pandas(tmp_path, monkeypatch):
+    """快速路径超时后直接报告超时，不回退到 pandas 不限时地重新读取"""
+    import time
+
+    path = write_workbook(tmp_path / 'a.xlsx', [['a', 'b']])
+
+    def slow_headers(file_path, stats=None):
+        time.sleep(2)
+        return ['a', 'b']
+
+    monkeypatch.setattr(process_excel, 'read_xlsx_headers', slow_headers)
+    headers, error, _ = process_excel._scan_file_headers(path, timeout=0.5)
+    assert headers == []
+    assert '超时' in error
+
+
+@pytest.mark.skipif(multiprocessing.get_start_method() != 'fork',
+                    reason='工作进程需要通过 fork 继承替换后的函数')
+def test_parallel_scan_skips_hung_worker(tmp_path, monkeypatch):
+    """工作进程卡住(SIGALRM 无法中断)时按超时记为失败，其余文件照常产出"""
+    import signal
+    import time
+
+    files = [write_workbook(tmp_path / f'{name}.xlsx', [[f'列{name}']]) for name in 'abc']
+    read_headers = process_excel.read_xlsx_headers
+
+    def hang_on_b(file_path, stats=None):
+        if Path(file_path).stem == 'b':
+            signal.pthread_sigmask(signal.SIG_BLOCK, {signal.SIGALRM})
+            time.sleep(60)
+        return read_headers(file_path, stats)
+
+    monkeypatch.setattr(process_excel, 'read_xlsx_headers', hang_on_b)
+    monkeypatch.setattr(process_excel, 'WORKER_TIMEOUT_MARGIN', 0.5)
+    start = time.monotonic()
+    results = list(process_excel.iter_file_headers(files, jobs=2, timeout=0.5))
+    assert time.monotonic() - start < 30
+    assert [headers for _, headers, _, _ in results] == [['列a'], [], ['列c']]
+    assert '超时' in results[1][2]
+
+
+def test_split_streaming(tmp_path, monkeypatch):
+    """每个拆分文件重复列头，输出到 output_directory；中途失败时不遗留已生成的拆分文件"""
+    header = ['公开(公告)号', '标题']
+    write_workbook(tmp_path / 'in' / 'sub' / 'a.xlsx', [header] + [[f'CN{i}', f't{i}'] for i in range(5)])
+    output_dir = tmp_path / 'out'
+    process_excel.split_excel_files(tmp_path / 'in', rows_per_file=2, output_directory=output_dir)
+    parts = sorted((output_dir / 'sub').iterdir())
+    assert [part.name for part in parts] == ['a_split_1.xlsx', 'a_split_2.xlsx', 'a_split_3.xlsx']
+    rows = [list(load_workbook(part).active.values) for part in parts]
+    assert all(part_rows[0] == tuple(header) for part_rows in rows)
+    assert [row[0] for part_rows in rows for row in part_rows[1:]] == [f'CN{i}' for i in range(5)]
+
+    source = write_workbook(tmp_path / 'b.xlsx', [header, ['CN1', 'b1'], ['CN2', 'b2'], ['BAD', 'b3']])
+    copy_cell = process_excel._copy_cell
+
+    def fail_on_bad(ws_out, cell):
+        if cell.value == 'BAD':
+            raise RuntimeError('写入失败')
+        return copy_cell(ws_out, cell)
+
+    monkeypatch.setattr(process_excel, '_copy_cell', fail_on_bad)
+    with pytest.raises(RuntimeError):
+        process_excel.split_workbook_streaming(source, tmp_path / 'failed', rows_per_file=2)
+    assert list((tmp_path / 'failed').iterdir()) == []
+
+
+def test_validate_xls_matches_xlsx(tmp_path):
+    """.xls 逐行读取检查的结果与同样数据的 .xlsx 一致"""
+    xlwt = pytest.importorskip('xlwt')
+
+    rows = [['标题', '申请日', '权利要求数量']]
+    for i in range(30):
+        rows.append([f'标题 {i}', '2020-01-31' if i % 7 else '2020-02-30', i if i % 9 else -1])
+    book = xlwt.Workbook()
+    sheet = book.add_sheet('Sheet1')
+    for row_idx, row in enumerate(rows):
+        for col_idx, value in enumerate(row):
+            sheet.write(row_idx, col_idx, value)
+    xls_path = tmp_path / 'a.xls'
+    book.save(str(xls_path))
+
+    xls = process_excel.validate_workbook(xls_path, chunk_rows=7)
+    xlsx = process_excel.validate_workbook(write_workbook(tmp_path / 'a.xlsx', rows))
+    assert xls['method'] == 'fallback'
+    assert xls['violations'] == xlsx['violations']
+    assert xls['violations']['权利要求数量']['count'] == 4
+    assert (xls['rows'], xls['cells']) == (xlsx['rows'], xlsx['cells'])
+
+
+def test_validate_fast_path_errors_are_not_hidden(tmp_path, monkeypatch):
+    """快速路径中的程序错误直接抛出，不会静默回退"""
+    path = write_workbook(tmp_path / 'a.xlsx', [['申请日'], ['2020-01-31']])
+
+    def broken(*args, **kwargs):
+        raise TypeError('程序错误')
+
+    monkeypatch.setattr(process_excel, '_validate_shared_strings', broken)
+    with pytest.raises(TypeError):
+        process_excel.validate_workbook(path)
+
+
+def test_parquet_and_merge_skip_empty_rows(tmp_path):
+    """parquet 导出按 SYSTEM_COLUMNS 排列列，与 merge 一样跳过全空行，两者行数一致"""
+    pq = pytest.importorskip('pyarrow.parquet')
+
+    rows = [['标题', '自定义列', '公开(公告)号'], ['t1', 'x', 'CN1'], [None, None, None],
+            ['t2', None, 'CN2'], [None, '', None], [None, None, 'CN3']]
+    source = write_workbook(tmp_path / 'in' / 'a.xlsx', rows)
+    output = tmp_path / 'a.parquet'
+    assert process_excel.export_columnar_file(source, output, chunk_rows=2) == 3
+    table = pq.read_table(output)
+    assert table.column_names[:len(process_excel.SYSTEM_COLUMNS)] == process_excel.SYSTEM_COLUMNS
+    assert table.column('公开(公告)号').to_pylist() == ['CN1', 'CN2', 'CN3']
+    assert table.column(process_excel.EXTRA_COLUMNS_FIELD).to_pylist() == [[('自定义列', 'x')], [], []]
+
+    process_excel.merge_excel_files(tmp_path / 'in', tmp_path / 'merged', merge_format='csv')
+    with open(tmp_path / 'merged' / 'merged.csv', encoding='utf-8-sig') as f:
+        merged = list(csv.DictReader(f))
+    assert len(merged) == table.num_rows
+
+
+def test_simplify_streaming(tmp_path, monkeypatch):
+    """每个工作表保留列头和前 max_rows 行；写入失败时不留下不完整的输出"""
+    source = tmp_path / 'a.xlsx'
+    wb = Workbook()
+    wb.active.title = '数据'
+    for i in range(10):
+        wb.active.append([f'CN{i}', i])
+    wb.create_sheet('附表').append(['只有列头'])
+    wb.save(source)
+
+    output = tmp_path / 'out' / 'a.xlsx'
+    output.parent.mkdir()
+    assert process_excel.simplify_workbook_streaming(source, output, 3) == {'数据': 3, '附表': 0}
+    result = load_workbook(output)
+    assert [row[0] for row in result['数据'].values] == ['CN0', 'CN1', 'CN2', 'CN3']
+    assert list(result['附表'].values) == [('只有列头',)]
+
+    def fail(ws_out, cell):
+        raise RuntimeError('写入失败')
+
+    monkeypatch.setattr(process_excel, '_copy_cell', fail)
+    failed = tmp_path / 'out' / 'b.xlsx'
+    with pytest.raises(RuntimeError):
+        process_excel.simplify_workbook_streaming(source, failed, 3)
+    assert sorted(path.name for path in output.parent.iterdir()) == ['a.xlsx']
+
+
+@pytest.mark.skipif(not sys.platform.startswith('linux'), reason='inotify 仅在 Linux 上可用')
+def test_inotify_watcher_drops_removed_directories(tmp_path):
+    """删除或移出的目录不再保留监控，之后的事件不会记到原来的路径上"""
+    import shutil
+
+    root = tmp_path / 'in'
+    (root / 'deleted').mkdir(parents=True)
+    (root / 'moved').mkdir()
+    watcher = process_excel._InotifyWatcher(root)
+    try:
+        shutil.rmtree(root / 'deleted')
+        (root / 'moved').rename(tmp_path / 'outside')
+        assert watcher.wait(1) == {root / 'deleted', root / 'moved'}
+        assert sorted(watcher._dirs.values()) == [root]
+
+        write_workbook(tmp_path / 'outside' / 'a.xlsx', [['列']])
+        write_workbook(root / 'b.xlsx', [['列']])
+        assert watcher.wait(1) == {root / 'b.xlsx'}
+    finally:
+        watcher.close()
+
+
+def test_column_index_normalizes_and_suggests():
+    """全角括号、空白、大小写和翻译后缀规范化后对应到系统列，其余给出编辑距离最近的系统列"""
+    index = process_excel.ColumnIndex(process_excel.SYSTEM_COLUMNS)
+    assert index.lookup('标题') == ('标题', [])
+    assert index.match('公开（公告）号') == '公开(公告)号'
+    assert index.match(' 标 题 ') == '标题'
+    assert index.match('ipc主分类') == 'IPC主分类'
+    assert index.match('专利类型(翻译)') == '专利类型'
+    assert index.match('摘要（翻译）') == '摘要(翻译)'
+    assert index.lookup('IPC主分类号') == (None, ['IPC主分类'])
+    assert index.lookup('完全无关的列') == (None, [])
+
+
+def test_deletion_index_matches_brute_force():
+    """对称删除索引的查询结果与逐个计算编辑距离一致"""
+    import random
+
+    rng = random.Random(0)
+    words = {''.join(rng.choice('abcde') for _ in range(rng.randint(1, 6))) for _ in range(200)}
+    index = process_excel.DeletionIndex(words, max_distance=2)
+    for _ in range(100):
+        query = ''.join(rng.choice('abcdef') for _ in range(rng.randint(1, 7)))
+        expected = sorted((process_excel._edit_distance(query, word), word) for word in words
+                          if process_excel._edit_distance(query, word) <= 2)
+        assert index.search(query) == expected
+
+
+def test_column_report_counts_and_cooccurrence(tmp_path):
+    """功能1的 --report 统计每个列名的出现文件数和未识别列名两两共现次数，合并分批统计结果一致"""
+    write_workbook(tmp_path / 'in' / 'a.xlsx', [['标题', '自定义A', '自定义B']])
+    write_workbook(tmp_path / 'in' / 'b.xlsx', [['标题', '自定义A', '自定义B', '公开（公告）号']])
+    write_workbook(tmp_path / 'in' / 'c.xlsx', [['自定义A']])
+    report = tmp_path / 'report.csv'
+    process_excel.check_unrecognized_columns(tmp_path / 'in', report_path=report)
+
+    with open(report, encoding='utf-8-sig') as f:
+        columns = {row['列名']: row for row in csv.DictReader(f)}
+    assert {name: int(row['出现文件数']) for name, row in columns.items()} == {
+        '自定义A': 3, '标题': 2, '自定义B': 2, '公开（公告）号': 1}
+    assert columns['公开（公告）号']['对应系统列名'] == '公开(公告)号'
+    assert columns['标题']['是否识别'] == '是'
+    with open(tmp_path / 'report_cooccurrence.csv', encoding='utf-8-sig') as f:
+        pairs = [tuple(row) for row in csv.reader(f)][1:]
+    assert pairs == [('自定义A', '自定义B', '2'), ('公开（公告）号', '自定义A', '1'),
+                     ('公开（公告）号', '自定义B', '1')]
+
+    first, second = process_excel.ColumnStats(), process_excel.ColumnStats()
+    first.add('a.xlsx', ['标题', '自定义A', '自定义B'])
+    second.add('b.xlsx', ['标题', '自定义A', '自定义B', '公开（公告）号'])
+    second.add('c.xlsx', ['自定义A'])
+    merged = first.merge(second).to_dict()
+    assert merged['total_files'] == 3
+    assert [(item['columns'], item['file_count']) for item in merged['unrecognized_cooccurrence']] == \
+        [(list(pair[:2]), int(pair[2])) for pair in pairs]
+
+
+def test_repair_attribute_without_value(tmp_path):
+    """删除没有值的属性、为未加引号的属性值补上引号，修复后可正常读取；按块修复与整体修复一致"""
+    import io
+    import xml.etree.ElementTree as ET
+
+    sheet_data = ('<row r="1"><c r="A1" t="inlineStr" hidden><is><t>公开(公告)号</t></is></c>'
+                  '<c r="B1" s=0 t="inlineStr"><is><t>a &gt; b</t></is></c></row>'
+                  '<row r="2"><c r="A2" t="inlineStr"><is><t>CN1</t></is></c></row>')
+    source = write_raw_xlsx(tmp_path / 'broken.xlsx', sheet_data)
+    with zipfile.ZipFile(source) as zf:
+        broken = zf.read('xl/worksheets/sheet1.xml')
+    with pytest.raises(ET.ParseError):
+        ET.fromstring(broken)
+
+    output = tmp_path / 'out' / 'broken.xlsx'
+    assert process_excel.repair_workbook_xml(source, output) == 2
+    with zipfile.ZipFile(source) as zin, zipfile.ZipFile(output) as zout:
+        assert zin.namelist() == zout.namelist()
+        repaired = zout.read('xl/worksheets/sheet1.xml')
+        assert zout.read('xl/workbook.xml') == zin.read('xl/workbook.xml')
+    ET.fromstring(repaired)
+    assert [row for row in load_workbook(output).active.values] == [('公开(公告)号', 'a > b'), ('CN1', None)]
+
+    for chunk_size in (1, 7, 64):
+        dst = io.BytesIO()
+        stats = {'tags': 0}
+        process_excel._repair_xml_stream(io.BytesIO(broken), dst, stats, chunk_size=chunk_size)
+        assert dst.getvalue() == repaired and stats['tags'] == 2
+
+
+def test_inventory_dimension_and_scan(tmp_path):
+    """有 dimension 时直接取行列数，缺少时扫描工作表，两种方式结果一致；清单写出每个工作表"""
+    import json
+
+    input_dir = tmp_path / 'input'
+    input_dir.mkdir()
+    rows = [['公开(公告)号', '申请号', '标题'], ['CN1', 'A1', 't1'], ['CN2', 'A2', 't2']]
+    write_workbook(input_dir / 'a.xlsx', rows)
+    write_raw_xlsx(input_dir / 'b.xlsx',
+                   '<row r="1"><c r="A1" t="s"><v>0</v></c><c r="C1" t="s"><v>1</v></c></row>'
+                   '<row r="3"><c r="B3" t="s"><v>0</v></c></row>',
+                   shared_strings=('x', 'y'))
+
+    entry = process_excel.inventory_workbook(input_dir / 'a.xlsx')
+    assert entry['sheets'] == [{'name': 'Sheet', 'rows': 3, 'cols': 3, 'source': 'dimension'}]
+    entry = process_excel.inventory_workbook(input_dir / 'b.xlsx')
+    assert entry['sheets'] == [{'name': 'Sheet1', 'rows': 3, 'cols': 3, 'source': 'scan'}]
+
+    report = tmp_path / 'inventory.json'
+    process_excel.inventory_files(input_dir, report_path=report, jobs=2)
+    manifest = json.loads(report.read_text(encoding='utf-8'))
+    assert [(entry['path'], entry['rows'], entry['cols']) for entry in manifest['files']] == [
+        ('a.xlsx', 3, 3), ('b.xlsx', 3, 3)]
+    assert all(entry['bytes'] > 0 for entry in manifest['files'])
+
+
+def test_iter_excel_files_order_and_filters(tmp_path):
+    """遍历顺序与 sorted 一致，跳过 ~$ 锁文件，include/exclude 生效；prefetch 按原顺序产出全部文件"""
+    for rel in ('b.xlsx', 'a/z.xls', 'a/b/c.xlsx', 'a_b.xlsm', 'A.xlsx', '~$b.xlsx',
+                'notes.txt', 'tmp/x.xlsx'):
+        path = tmp_path / rel
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(b'')
+
+    files = process_excel.find_excel_files(tmp_path)
+    assert files == sorted(files)
+    assert [p.relative_to(tmp_path).as_posix() for p in files] == [
+        'A.xlsx', 'a/b/c.xlsx', 'a/z.xls', 'a_b.xlsm', 'b.xlsx', 'tmp/x.xlsx']
+
+    files = process_excel.find_excel_files(tmp_path, include=['*.xlsx'], exclude=['tmp'])
+    assert [p.relative_to(tmp_path).as_posix() for p in files] == ['A.xlsx', 'a/b/c.xlsx', 'b.xlsx']
+
+    assert list(process_excel.prefetch(process_excel.iter_excel_files(tmp_path), maxsize=1)) == \
+        process_excel.find_excel_files(tmp_path)
+
+
+def test_prefetch_reraises_error():
+    """遍历中的异常在调用方重新抛出，之前的元素照常产出"""
+    def items():
+        yield 1
+        yield 2
+        raise OSError('boom')
+
+    result = []
+    with pytest.raises(OSError, match='boom'):
+        for item in process_excel.prefetch(items(), maxsize=1):
+            result.append(item)
+    assert result == [1, 2]
+
+
+def test_check_columns_jsonl_records(tmp_path):
+    """records 为文本流时每个文件输出一条 JSONL 记录，最后输出含耗时和吞吐量的汇总记录"""
+    import io
+    import json
+
+    write_workbook(tmp_path / 'a.xlsx', [['公开(公告)号', '未知列'], ['CN1', 'x']])
+    (tmp_path / 'b.xlsx').write_bytes(b'not a workbook')
+
+    stream = io.StringIO()
+    process_excel.check_unrecognized_columns(tmp_path, records=stream)
+    records = [json.loads(line) for line in stream.getvalue().splitlines()]
+
+    assert [(r['type'], r.get('path')) for r in records] == [
+        ('file', 'a.xlsx'), ('file', 'b.xlsx'), ('summary', None)]
+    ok, failed, summary = records
+    assert (ok['status'], failed['status']) == ('ok', 'error')
+    assert ok['function'] == 'check_columns'
+    assert ok['headers'] == ['公开(公告)号', '未知列'] and ok['unrecognized'] == ['未知列']
+    assert 0 < ok['bytes_read'] <= (tmp_path / 'a.xlsx').stat().st_size
+    assert failed['error']
+    assert summary['files'] == 2 and summary['status'] == {'ok': 1, 'error': 1}
+    assert summary['unrecognized'] == ['未知列']
+    assert set(summary['timings']) == set(process_excel.JsonlRecorder.STAGES)
+    assert summary['elapsed'] >= 0 and summary['bytes_read'] >= ok['bytes_read']
+
+
+def test_merge_order_and_source(tmp_path):
+    """合并结果按文件路径顺序排列，列顺序为 MERGE_COLUMNS，记录来源文件和行号；xlsx 按行数滚动分文件"""
+    import json
+
+    write_workbook(tmp_path / 'in' / 'b.xlsx', [['标题', '公开(公告)号'], ['t3', 'CN3']])
+    write_workbook(tmp_path / 'in' / 'a' / 'x.xlsx',
+                   [['公开(公告)号', '自定义列', '标题'], ['CN1', 'v', 't1'], [None, None, None],
+                    ['CN2', None, 't2']])
+
+    process_excel.merge_excel_files(tmp_path / 'in', tmp_path / 'csv', merge_format='csv',
+                                    chunk_rows=1, jobs=2)
+    with open(tmp_path / 'csv' / 'merged.csv', encoding='utf-8-sig') as f:
+        reader = csv.DictReader(f)
+        merged = list(reader)
+    assert reader.fieldnames == process_excel.MERGE_COLUMNS
+    assert [(r['公开(公告)号'], r['标题'], r[process_excel.SOURCE_FILE_FIELD],
+             r[process_excel.SOURCE_ROW_FIELD]) for r in merged] == [
+        ('CN1', 't1', 'a/x.xlsx', '2'), ('CN2', 't2', 'a/x.xlsx', '4'), ('CN3', 't3', 'b.xlsx', '2')]
+    assert json.loads(merged[0][process_excel.EXTRA_COLUMNS_FIELD]) == {'自定义列': 'v'}
+    assert not list((tmp_path / 'csv').glob('.merge_*'))
+
+    process_excel.merge_excel_files(tmp_path / 'in', tmp_path / 'xlsx', rows_per_file=2)
+    parts = sorted(p.name for p in (tmp_path / 'xlsx').glob('merged_*.xlsx'))
+    assert len(parts) == 2
+    values = [list(load_workbook(tmp_path / 'xlsx' / name).active.values) for name in parts]
+    assert all(list(part[0]) == process_excel.MERGE_COLUMNS for part in values)
+    assert [len(part) - 1 for part in values] == [2, 1]
+
+
+def test_header_path_skips_heavy_imports(tmp_path):
+    """导入模块和读取 xlsx 列头时不加载 pandas/numpy/openpyxl/xlrd"""
+    import subprocess
+
+    source = write_workbook(tmp_path / 'a.xlsx', [['公开(公告)号', '标题'], ['CN1', 't1']])
+    script = (
+        "import sys, process_excel\n"
+        "headers = process_excel.load_excel_headers(sys.argv[1])\n"
+        "assert headers == ['公开(公告)号', '标题'], headers\n"
+        "heavy = [name for name in ('pandas', 'numpy', 'openpyxl', 'xlrd') if name in sys.modules]\n"
+        "assert not heavy, heavy\n"
+    )
+    result = subprocess.run([sys.executable, '-c', script, str(source)], cwd=Path(__file__).parent,
+                            capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr
@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+product_scraper.py 页面解析基准测试
+功能:
+1. 读取保存的页面: output/http_cache 中的页面缓存，或某个目录下的 .html 文件
+   (文件名为数字的视为详情页，其余视为列表页)；没有保存的页面时可用 --synthetic 生成模拟页面
+2. 分别用 html.parser、lxml、lxml + 详情页 SoupStrainer 解析页面并提取产品信息，
+   记录解析和提取耗时，以及相对 html.parser 的加速比
+3. 检查各解析方式提取的结果与 html.parser 一致，不一致时退出码为 1；结果保存为 JSON
+"""
+
+import os
+import re
+import sys
+import json
+import gzip
+import time
+import random
+import logging
+import argparse
+import platform
+import tempfile
+import subprocess
+from pathlib import Path
+from datetime import datetime
+
+SCRIPT_DIR = Path(__file__).resolve().parent
+sys.path.insert(0, str(SCRIPT_DIR))
+
+# 测试的解析方式: (名称, 解析器, 详情页是否只构建需要的子树)
+PARSER_MODES = [
+    ('html.parser', 'html.parser', False),
+    ('lxml', 'lxml', False),
+    ('lxml + strainer', 'lxml', True),
+]
+
+DETAIL_URL_PATTERN = re.compile(r'/supply/\d+\.html$')
+
+
+def load_saved_pages(pages_dir):
+    """
+    读取保存的页面，返回 [(url, 类型, 页面内容)]，类型为 'detail' 或 'listing'
+
+    pages_dir 中有页面缓存(<sha1>.json + <sha1>.html.gz)时按缓存中的 URL 判断类型，
+    否则读取 .html 文件，文件名为数字(如 12345.html)的视为详情页
+    """
+    pages_dir = Path(pages_dir)
+    pages = []
+    for meta_path in sorted(pages_dir.glob('*.json')):
+        body_path = meta_path.with_name(f"{meta_path.stem}.html.gz")
+        if not body_path.exists():
+            continue
+        url = json.loads(meta_path.read_text(encoding='utf-8'))['url']
+        kind = 'detail' if DETAIL_URL_PATTERN.search(url) else 'listing'
+        pages.append((url, kind, gzip.decompress(body_path.read_bytes())))
+    for html_path in sorted(pages_dir.glob('*.html')):
+        kind = 'detail' if html_path.stem.isdigit() else 'listing'
+        pages.append((html_path.name, kind, html_path.read_bytes()))
+    return pages
+
+
+def _page_shell(body, rng):
+    """模拟页面的公共部分: 头部脚本、导航、侧栏和页脚，占页面的大部分"""
+    scripts = ''.join(f'<script>var cfg{i} = {{"id": {rng.randint(1, 99999)}, "v": "{"x" * 200}"}};</script>'
+                      for i in range(20))
+    nav = ''.join(f'<li><a href="/supply/g{i}_1.html">分类{i} ({rng.randint(1, 300)})</a></li>' for i in range(60))
+    side = ''.join(f'<div class="side-item"><a href="/news/{i}.html"><span>资讯标题 {i}</span></a>'
+                   f'<p>{"行业动态说明文字" * 5}</p></div>' for i in range(80))
+    footer = ''.join(f'<p class="ft">联系方式 {i}: 021-{rng.randint(10000000, 99999999)}</p>' for i in range(30))
+    return (f'<!DOCTYPE html><html><head><meta charset="utf-8"><title>产品</title>{scripts}</head>'
+            f'<body><div class="header"><ul class="nav">{nav}</ul></div>'
+            f'<div class="main">{body}</div><div class="side">{side}</div>'
+            f'<div class="footer">{footer}</div></body></html>')
+
+
+def generate_pages(pages_dir, count, seed=0):
+    """生成 count 个详情页和 count // 5 个列表页，结构与目标网站一致"""
+    rng = random.Random(seed)
+    pages_dir = Path(pages_dir)
+    pages_dir.mkdir(parents=True, exist_ok=True)
+    for n in range(count):
+        product_id = 100000 + n
+        banners = ''.join(f'<li data-config="showing_image: \'/img/{product_id}_{i}.jpg\'">'
+                          f'<img src="/img/{product_id}_{i}.jpg"></li>' for i in range(rng.randint(2, 6)))
+        attrs = ''.join(f'<tr><td>属性{i}</td><td>值{rng.randint(1, 999)}</td></tr>' for i in range(12))
+        text = ''.join(f'<p>产品说明第 {i} 段，{"适用于工业管道系统" * 3}</p><img src="/img/d{product_id}_{i}.jpg">'
+                       for i in range(rng.randint(5, 15)))
+        body = (f'<div class="sp-hd"><h1>产品 {product_id}</h1></div>'
+                f'<div data-cnrole="ProductPhotoShowList"><ul>{banners}</ul></div>'
+                f'<div class="sp-bd pdsx"><div class="attr-list"><table>{attrs}</table></div>'
+                f'<div class="text-detail">{text}<script>track({product_id});</script></div></div>')
+        (pages_dir / f'{product_id}.html').write_text(_page_shell(body, rng), encoding='utf-8')
+    for n in range(max(count // 5, 1)):
+        items = ''.join(f'<dl><dt><a href="/supply/{100000 + n * 20 + i}.html">'
+                        f'<img data-original="/img/{100000 + n * 20 + i}_0.jpg"></a></dt>'
+                        f'<dd><a href="/supply/{100000 + n * 20 + i}.html">不锈钢截止阀型号 {i}</a>'
+                        f'<span>￥{rng.randint(10, 9999)}.00</span></dd></dl>' for i in range(20))
+        body = f'<div class="list">{items}</div><div class="page">共{count // 100 + 1}页</div>'
+        (pages_dir / f'g1_{n + 1}.html').write_text(_page_shell(body, rng), encoding='utf-8')
+
+
+def make_scraper(work_dir):
+    """在 work_dir 中创建爬虫(输出目录、日志等写到 work_dir)，只用于解析和提取"""
+    os.chdir(work_dir)
+    import product_scraper
+
+    # 只显示警告和错误，避免逐页的日志影响计时
+    logging.getLogger().setLevel(logging.ERROR)
+    # work_dir 中没有配置文件，使用默认配置(提取列表页时不请求详情页)
+    return product_scraper.ProductScraper(config_file=str(Path(work_dir) / 'config.json'))
+
+
+def extract(scraper, kind, url, soup):
+    """按页面类型提取产品信息，返回可比较的结果"""
+    if kind == 'detail':
+        return list(scraper.parse_product_details(soup, url))
+    products = scraper.extract_products_from_page(soup, '基准测试')
+    return [(p['name'], p['url'], p['image_url'], p['price']) for p in products]
+
+
+def run_mode(scraper, pages, parser_name, use_strainer, repeat):
+    """用一种解析方式解析和提取所有页面 repeat 次，返回各类型页面的耗时和提取结果"""
+    scraper.html_parser = parser_name
+    strainer = scraper.detail_strainer if use_strainer else None
+    timings = {}
+    results = {}
+    for _ in range(repeat):
+        for url, kind, body in pages:
+            start = time.perf_counter()
+            soup = scraper.parse_html(body, strainer if kind == 'detail' else None)
+            parsed = time.perf_counter()
+            results[url] = extract(scraper, kind, url, soup)
+            done = time.perf_counter()
+            stats = timings.setdefault(kind, {'pages': 0, 'parse_time': 0.0, 'extract_time': 0.0})
+            stats['pages'] += 1
+            stats['parse_time'] += parsed - start
+            stats['extract_time'] += done - parsed
+    return timings, results
+
+
+def _git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=SCRIPT_DIR,
+                              capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(
+        description='product_scraper.py 页面解析基准测试',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+示例:
+  python benchmark_parser.py                                # 使用 output/http_cache 中缓存的页面
+  python benchmark_parser.py --pages saved_pages --repeat 5
+  python benchmark_parser.py --synthetic 200 --output parser_bench.json
+        """
+    )
+    parser.add_argument('--pages', default=str(SCRIPT_DIR / 'output' / 'http_cache'),
+                        help='保存的页面目录: 页面缓存目录或 .html 文件目录 (默认: output/http_cache)')
+    parser.add_argument('--synthetic', type=int, default=0,
+                        help='在 --pages 目录中生成指定数量的模拟详情页(及 1/5 数量的列表页)后再测试')
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='每种解析方式重复解析的次数 (默认: 3)')
+    parser.add_argument('--output', default='parser_benchmark_results.json',
+                        help='结果 JSON 文件路径 (默认: parser_benchmark_results.json)')
+    args = parser.parse_args()
+
+    output_path = Path(args.output).resolve()
+    pages_dir = Path(args.pages).resolve()
+    if args.synthetic:
+        generate_pages(pages_dir, args.synthetic)
+    pages = load_saved_pages(pages_dir) if pages_dir.exists() else []
+    if not pages:
+        print(f"❌ {pages_dir} 中没有保存的页面，请先运行爬虫或使用 --synthetic 生成模拟页面")
+        return 1
+    kinds = sorted({kind for _, kind, _ in pages})
+    print(f"页面: {len(pages)} 个 ({', '.join(f'{k} {sum(1 for p in pages if p[1] == k)}' for k in kinds)}), "
+          f"每种解析方式重复 {args.repeat} 次")
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        scraper = make_scraper(work_dir)
+        try:
+            results = []
+            baseline = {}
+            reference = None
+            mismatched = False
+            for name, parser_name, use_strainer in PARSER_MODES:
+                timings, extracted = run_mode(scraper, pages, parser_name, use_strainer, args.repeat)
+                if reference is None:
+                    reference = extracted
+                diff = [url for url in reference if extracted[url] != reference[url]]
+                if diff:
+                    mismatched = True
+                for kind in kinds:
+                    stats = timings[kind]
+                    total = stats['parse_time'] + stats['extract_time']
+                    baseline.setdefault(kind, total)
+                    result = {
+                        'mode': name,
+                        'page_type': kind,
+                        'pages': stats['pages'],
+                        'parse_time': stats['parse_time'],
+                        'extract_time': stats['extract_time'],
+                        'pages_per_second': stats['pages'] / total if total else None,
+                        'speedup': baseline[kind] / total if total else None,
+                        'mismatched_pages': [url for url, k, _ in pages if k == kind and url in diff],
+                    }
+                    results.append(result)
+                    status = "✓" if not result['mismatched_pages'] else \
+                        f"❌ {len(result['mismatched_pages'])} 个页面提取结果不同"
+                    print(f"  {name:<16} {kind:<8} 解析 {stats['parse_time']:>7.3f}s  "
+                          f"提取 {stats['extract_time']:>7.3f}s  "
+                          f"{result['pages_per_second']:>8.1f} 页/秒  加速 {result['speedup']:>5.2f}x  {status}")
+        finally:
+            scraper.close()
+            os.chdir(SCRIPT_DIR)
+
+    report = {
+        'timestamp': datetime.now().isoformat(),
+        'git_revision': _git_revision(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'pages_dir': str(pages_dir),
+        'repeat': args.repeat,
+        'results': results,
+    }
+    with open(output_path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"\n结果已保存到: {output_path}")
+    return 1 if mismatched else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
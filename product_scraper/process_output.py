@@ -10,7 +10,6 @@
 import os
 import re
 from pathlib import Path
-from PIL import Image
 import logging
 
 # 配置日志
@@ -34,6 +33,9 @@ def convert_webp_to_jpg(webp_path: Path) -> bool:
     Returns:
         是否转换成功
     """
+    # PIL 导入较慢，只在需要转换图片时导入
+    from PIL import Image
+
     try:
         # 生成 JPG 文件路径（与 WebP 文件同名，仅扩展名不同）
         jpg_path = webp_path.with_suffix('.jpg')
@@ -6,23 +6,27 @@
 具备强大的反反爬机制
 """
 
+from __future__ import annotations
+
 import os
 import re
 import time
-import requests
-from bs4 import BeautifulSoup
+import threading
 from urllib.parse import urljoin, urlparse
-import pandas as pd
 from pathlib import Path
 import logging
-from typing import Dict, List, Tuple, Optional
-from PIL import Image
+from typing import TYPE_CHECKING, Dict, List, Tuple, Optional
 import hashlib
 import json
 from concurrent.futures import ThreadPoolExecutor, as_completed
 import random
-from urllib.parse import quote
 import argparse
+import importlib.util
+
+# requests、bs4、pandas、PIL 导入较慢，在用到的方法中再导入，
+# 使 --help 和参数错误等情况能立即返回
+if TYPE_CHECKING:
+    from bs4 import BeautifulSoup
 
 # 配置日志
 logging.basicConfig(
@@ -35,8 +39,420 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+class TokenBucket:
+    """单个主机的令牌桶: 每秒补充 rate 个令牌，最多积累 burst 个(允许的突发请求数)
+
+    acquire() 在事件循环中等待令牌，只挂起当前请求的协程，不阻塞其他主机的请求。
+    rate 可在 [min_rate, max_rate] 范围内按服务器反馈调整(见 increase/decrease)
+    """
+
+    def __init__(self, rate: float, burst: float = 1, min_rate: float = None, max_rate: float = None):
+        self.rate = rate
+        self.burst = max(burst, 1)
+        self.min_rate = min(min_rate, rate) if min_rate else rate
+        self.max_rate = max(max_rate, rate) if max_rate else rate
+        self.tokens = self.burst
+        self.updated = time.monotonic()
+        self.last_decrease = 0.0
+        self.stats = {'requests': 0, 'increases': 0, 'decreases': 0}
+        self._lock = None
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def pause(self, seconds: float):
+        """暂停该主机的请求 seconds 秒(扣除相应的令牌)"""
+        self._refill()
+        self.tokens -= seconds * self.rate
+
+    def increase(self, step: float):
+        """加性增: 速率增加 step(不超过 max_rate)"""
+        if self.rate < self.max_rate:
+            self._refill()
+            self.rate = min(self.max_rate, self.rate + step)
+            self.stats['increases'] += 1
+
+    def decrease(self, factor: float) -> bool:
+        """乘性减: 速率乘以 factor(不低于 min_rate)
+
+        同一批并发请求往往一起失败，距上次减速不足一个请求间隔时不再减速。
+        返回是否减速
+        """
+        now = time.monotonic()
+        if now - self.last_decrease < 1 / self.rate:
+            return False
+        self._refill()
+        self.rate = max(self.min_rate, self.rate * factor)
+        self.last_decrease = now
+        self.stats['decreases'] += 1
+        return True
+
+    async def acquire(self):
+        import asyncio
+
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        # 加锁使等待的请求按先后顺序获得令牌
+        async with self._lock:
+            while True:
+                self._refill()
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class FetchEngine:
+    """基于 asyncio 的抓取引擎
+
+    事件循环运行在后台线程中，同步代码通过 fetch() 提交请求并等待响应，
+    也可以用 submit() 同时提交多个请求。每个主机一个令牌桶控制请求速率，
+    max_concurrency 限制同时进行的请求数；HTTP 请求本身由 requests 在线程池中执行。
+
+    adaptive 为 {'increase': 步长, 'decrease_factor': 系数, 'min_rate': 下限, 'max_rate': 上限} 时
+    按 AIMD 调整各主机速率: 正常响应后加 increase，服务器过载(503/52x/429)、超时、连接失败
+    或 report_overload()(如遇到验证页面)时乘以 decrease_factor；host_limits 中可单独指定
+    某个主机的 min_rate/max_rate
+    """
+
+    OVERLOAD_STATUS = (429, 503, 520, 521, 522, 524)
+
+    def __init__(self, session, host_limits: Dict[str, Dict] = None, default_rate: float = 0.3,
+                 default_burst: float = 1, max_concurrency: int = 4,
+                 pause_probability: float = 0, pause_range: List[float] = None,
+                 adaptive: Dict = None):
+        import asyncio
+
+        self.session = session
+        self.host_limits = host_limits or {}
+        self.default_rate = default_rate
+        self.default_burst = default_burst
+        self.max_concurrency = max_concurrency
+        self.pause_probability = pause_probability
+        self.pause_range = pause_range or [0, 0]
+        self.adaptive = adaptive
+        self.buckets: Dict[str, TokenBucket] = {}
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency)
+        self._semaphore = None
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self.loop.run_forever, name='fetch-engine', daemon=True)
+        self._thread.start()
+
+    def bucket(self, url: str) -> TokenBucket:
+        """返回 url 所在主机的令牌桶，未配置的主机使用默认速率"""
+        host = urlparse(url).hostname or ''
+        if host not in self.buckets:
+            limits = self.host_limits.get(host, {})
+            adaptive = self.adaptive or {}
+            self.buckets[host] = TokenBucket(limits.get('rate', self.default_rate),
+                                             limits.get('burst', self.default_burst),
+                                             limits.get('min_rate', adaptive.get('min_rate')),
+                                             limits.get('max_rate', adaptive.get('max_rate')))
+        return self.buckets[host]
+
+    def _on_overload(self, bucket: TokenBucket, host: str, reason: str):
+        if self.adaptive and bucket.decrease(self.adaptive.get('decrease_factor', 0.5)):
+            logger.warning(f"{reason}，{host} 请求速率降为 {bucket.rate:.2f} 次/秒")
+
+    def report_overload(self, url: str, reason: str = "检测到验证页面"):
+        """报告 url 所在主机出现反爬或过载迹象，按 AIMD 降低该主机的速率"""
+        host = urlparse(url).hostname or ''
+        self.loop.call_soon_threadsafe(lambda: self._on_overload(self.bucket(url), host, reason))
+
+    def host_stats(self) -> Dict[str, Dict]:
+        """各主机当前的请求速率和调整次数"""
+        return {host: dict(bucket.stats, rate=round(bucket.rate, 3))
+                for host, bucket in list(self.buckets.items())}
+
+    async def _request(self, url: str, **kwargs):
+        import asyncio
+        from functools import partial
+        import requests
+
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        bucket = self.bucket(url)
+        await bucket.acquire()
+        # 随机让该主机停顿一段时间，模拟用户思考(只影响该主机后续的请求)
+        if random.random() < self.pause_probability:
+            pause = random.uniform(*self.pause_range)
+            logger.info(f"触发随机长延时 {pause:.1f}s - {urlparse(url).hostname}")
+            bucket.pause(pause)
+        async with self._semaphore:
+            bucket.stats['requests'] += 1
+            host = urlparse(url).hostname or ''
+            try:
+                response = await self.loop.run_in_executor(
+                    self._executor, partial(self.session.get, url, **kwargs))
+            except (requests.exceptions.Timeout, requests.exceptions.ConnectionError) as e:
+                self._on_overload(bucket, host, f"请求超时或连接失败({type(e).__name__})")
+                raise
+        if response.status_code in self.OVERLOAD_STATUS:
+            self._on_overload(bucket, host, f"服务器过载 {response.status_code}")
+        elif response.ok and self.adaptive:
+            bucket.increase(self.adaptive.get('increase', 0.02))
+        return response
+
+    def pause_host(self, url: str, seconds: float):
+        """暂停 url 所在主机的请求 seconds 秒，不影响其他主机"""
+        self.loop.call_soon_threadsafe(lambda: self.bucket(url).pause(seconds))
+
+    def submit(self, url: str, **kwargs):
+        """提交 GET 请求，返回 concurrent.futures.Future(结果为 requests.Response)"""
+        import asyncio
+
+        return asyncio.run_coroutine_threadsafe(self._request(url, **kwargs), self.loop)
+
+    def fetch(self, url: str, **kwargs):
+        """发送 GET 请求并等待响应，参数同 requests.Session.get"""
+        return self.submit(url, **kwargs).result()
+
+    def close(self):
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join()
+        self.loop.close()
+        self._executor.shutdown(wait=False)
+
+
+class ResponseCache:
+    """保存在磁盘上的页面缓存，按 URL 索引
+
+    每个 URL 对应 <sha1>.html.gz(gzip 压缩的响应内容)和 <sha1>.json
+    (URL、ETag、Last-Modified、内容的 sha256、获取时间)两个文件。
+    ttl 秒内的缓存直接使用，超过后用 ETag/Last-Modified 发条件请求验证。
+    可在多个线程中同时使用
+    """
+
+    def __init__(self, directory: Path, ttl: float = 86400):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.ttl = ttl
+        self.stats = {'hits': 0, 'misses': 0, 'revalidated': 0, 'updated': 0}
+        self._lock = threading.Lock()
+
+    def _paths(self, url: str) -> Tuple[Path, Path]:
+        key = hashlib.sha1(url.encode('utf-8')).hexdigest()
+        return self.directory / f"{key}.json", self.directory / f"{key}.html.gz"
+
+    def count(self, name: str):
+        with self._lock:
+            self.stats[name] += 1
+
+    def get(self, url: str) -> Optional[Dict]:
+        """读取缓存，返回元数据(body 为响应内容)；不存在或内容校验失败时返回 None"""
+        import gzip
+
+        meta_path, body_path = self._paths(url)
+        try:
+            meta = json.loads(meta_path.read_text(encoding='utf-8'))
+            body = gzip.decompress(body_path.read_bytes())
+        except (OSError, ValueError, EOFError):
+            return None
+        if meta.get('url') != url or hashlib.sha256(body).hexdigest() != meta.get('sha256'):
+            logger.debug(f"缓存内容校验失败，重新获取: {url}")
+            return None
+        meta['body'] = body
+        return meta
+
+    def is_fresh(self, entry: Dict) -> bool:
+        return time.time() - entry['fetched_at'] < self.ttl
+
+    def conditional_headers(self, entry: Dict) -> Dict[str, str]:
+        """根据缓存的 ETag/Last-Modified 生成条件请求头"""
+        headers = {}
+        if entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+    def put(self, url: str, body: bytes, etag: str = None, last_modified: str = None) -> bool:
+        """写入缓存，返回内容是否与原有缓存不同"""
+        import gzip
+
+        meta_path, body_path = self._paths(url)
+        digest = hashlib.sha256(body).hexdigest()
+        try:
+            old = json.loads(meta_path.read_text(encoding='utf-8'))
+        except (OSError, ValueError):
+            old = {}
+        changed = old.get('sha256') != digest
+        if changed:
+            self._write(body_path, gzip.compress(body))
+        meta = {'url': url, 'etag': etag, 'last_modified': last_modified,
+                'sha256': digest, 'fetched_at': time.time()}
+        self._write(meta_path, json.dumps(meta, ensure_ascii=False).encode('utf-8'))
+        return changed
+
+    def touch(self, url: str, entry: Dict):
+        """服务器确认缓存未变化(304)后更新获取时间"""
+        meta_path, _ = self._paths(url)
+        meta = {k: v for k, v in entry.items() if k != 'body'}
+        meta['fetched_at'] = time.time()
+        self._write(meta_path, json.dumps(meta, ensure_ascii=False).encode('utf-8'))
+
+    @staticmethod
+    def _write(path: Path, data: bytes):
+        # 先写临时文件再替换，中途退出不会留下不完整的缓存
+        tmp_path = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        tmp_path.write_bytes(data)
+        os.replace(tmp_path, path)
+
+
+def detail_page_strainer():
+    """详情页只需要 banner 容器和详情容器，返回只保留这两个子树的 SoupStrainer
+
+    需要 beautifulsoup4 4.13 及以上(按 allow_tag_creation 决定是否创建标签)，
+    更早的版本返回 None，即解析整个页面
+    """
+    from bs4 import SoupStrainer
+
+    if not hasattr(SoupStrainer, 'allow_tag_creation'):
+        return None
+
+    class DetailStrainer(SoupStrainer):
+        def allow_tag_creation(self, nsprefix, name, attrs):
+            if name != 'div' or not attrs:
+                return False
+            css_class = attrs.get('class')
+            if isinstance(css_class, list):
+                css_class = ' '.join(css_class)
+            return attrs.get('data-cnrole') == 'ProductPhotoShowList' or css_class == 'sp-bd pdsx'
+
+    return DetailStrainer('div')
+
+
+class CrawlFrontier:
+    """用 SQLite 记录爬取进度，程序中断后可用 --resume 从中断处继续
+
+    categories: 分类，pending -> fetched(已获取总页数) -> parsed(所有分页已解析) / failed
+    pages: 分页，pending -> fetched(已获取页面) -> parsed(已提取产品，products 为产品列表) / failed
+    products: 产品详情页，pending -> parsed(details 为详情) / failed
+
+    写入先累积在事务中，每 batch_size 次写入或 commit_interval 秒提交一次，close() 时提交剩余的写入
+    """
+
+    PENDING, FETCHED, PARSED, FAILED = 'pending', 'fetched', 'parsed', 'failed'
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS categories (
+        url TEXT PRIMARY KEY, name TEXT, position INTEGER, state TEXT,
+        total_pages INTEGER, error TEXT, updated_at REAL);
+    CREATE TABLE IF NOT EXISTS pages (
+        url TEXT PRIMARY KEY, category_url TEXT, page INTEGER, state TEXT,
+        products TEXT, error TEXT, updated_at REAL);
+    CREATE TABLE IF NOT EXISTS products (
+        url TEXT PRIMARY KEY, category TEXT, name TEXT, state TEXT,
+        details TEXT, error TEXT, updated_at REAL);
+    """
+
+    def __init__(self, db_path: Path, batch_size: int = 50, commit_interval: float = 10):
+        import sqlite3
+
+        self.db_path = Path(db_path)
+        self.batch_size = batch_size
+        self.commit_interval = commit_interval
+        self.conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        self.conn.executescript(self.SCHEMA)
+        self._pending_writes = 0
+        self._last_commit = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _write(self, sql: str, rows: List[tuple]):
+        with self._lock:
+            self.conn.executemany(sql, rows)
+            self._pending_writes += len(rows)
+            if (self._pending_writes >= self.batch_size
+                    or time.monotonic() - self._last_commit >= self.commit_interval):
+                self._commit()
+
+    def _commit(self):
+        self.conn.commit()
+        self._pending_writes = 0
+        self._last_commit = time.monotonic()
+
+    def _query(self, sql: str, params: tuple = ()) -> list:
+        with self._lock:
+            return self.conn.execute(sql, params).fetchall()
+
+    def reset(self):
+        """开始新的爬取，清空上次的进度"""
+        with self._lock:
+            self.conn.executescript("DELETE FROM categories; DELETE FROM pages; DELETE FROM products;")
+            self._commit()
+
+    def add_categories(self, categories: List[Dict[str, str]]):
+        self._write("INSERT OR IGNORE INTO categories (url, name, position, state, updated_at) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    [(c['url'], c['name'], i, self.PENDING, time.time()) for i, c in enumerate(categories)])
+
+    def categories(self) -> List[Dict]:
+        """按发现顺序返回所有分类(含 state、total_pages)"""
+        rows = self._query("SELECT url, name, state, total_pages FROM categories ORDER BY position")
+        return [{'url': url, 'name': name, 'state': state, 'total_pages': total_pages}
+                for url, name, state, total_pages in rows]
+
+    def category_state(self, url: str) -> Tuple[Optional[str], Optional[int]]:
+        """返回分类的 (state, total_pages)，未记录时为 (None, None)"""
+        rows = self._query("SELECT state, total_pages FROM categories WHERE url = ?", (url,))
+        return rows[0] if rows else (None, None)
+
+    def set_category(self, category: Dict[str, str], state: str, total_pages: int = None, error: str = None):
+        self._write("INSERT INTO categories (url, name, position, state, total_pages, error, updated_at) "
+                    "VALUES (?, ?, (SELECT COUNT(*) FROM categories), ?, ?, ?, ?) "
+                    "ON CONFLICT(url) DO UPDATE SET state = excluded.state, "
+                    "total_pages = COALESCE(excluded.total_pages, total_pages), "
+                    "error = excluded.error, updated_at = excluded.updated_at",
+                    [(category['url'], category['name'], state, total_pages, error, time.time())])
+
+    def add_pages(self, category_url: str, page_urls: List[str]):
+        self._write("INSERT OR IGNORE INTO pages (url, category_url, page, state, updated_at) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    [(url, category_url, page, self.PENDING, time.time())
+                     for page, url in enumerate(page_urls, 1)])
+
+    def page_products(self, url: str) -> Optional[List[Dict]]:
+        """已解析分页的产品列表，未解析时返回 None"""
+        rows = self._query("SELECT products FROM pages WHERE url = ? AND state = ?", (url, self.PARSED))
+        return json.loads(rows[0][0]) if rows else None
+
+    def set_page(self, url: str, state: str, products: List[Dict] = None, error: str = None):
+        self._write("UPDATE pages SET state = ?, products = ?, error = ?, updated_at = ? WHERE url = ?",
+                    [(state, json.dumps(products, ensure_ascii=False) if products is not None else None,
+                      error, time.time(), url)])
+
+    def add_products(self, products: List[Dict]):
+        self._write("INSERT OR IGNORE INTO products (url, category, name, state, updated_at) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    [(p['url'], p['category'], p['name'], self.PENDING, time.time()) for p in products])
+
+    def product_details(self, url: str) -> Optional[Dict]:
+        """已解析产品的详情(details/banner_images/detail_images)，未解析时返回 None"""
+        rows = self._query("SELECT details FROM products WHERE url = ? AND state = ?", (url, self.PARSED))
+        return json.loads(rows[0][0]) if rows else None
+
+    def set_product(self, product: Dict, state: str, error: str = None):
+        details = {key: product[key] for key in ('details', 'banner_images', 'detail_images')}
+        self._write("UPDATE products SET state = ?, details = ?, error = ?, updated_at = ? WHERE url = ?",
+                    [(state, json.dumps(details, ensure_ascii=False), error, time.time(), product['url'])])
+
+    def summary(self) -> Dict[str, Dict[str, int]]:
+        """各表每种状态的数量"""
+        return {table: dict(self._query(f"SELECT state, COUNT(*) FROM {table} GROUP BY state"))
+                for table in ('categories', 'pages', 'products')}
+
+    def close(self):
+        with self._lock:
+            self._commit()
+            self.conn.close()
+
+
 class ProductScraper:
     def __init__(self, base_url: str = "https://shwz888.gys.cn", config_file: str = "config.json"):
+        import requests
+
         self.base_url = base_url
         self.supply_url = f"{base_url}/supply/"
         self.session = requests.Session()
@@ -48,13 +464,15 @@ class ProductScraper:
         self.max_retries = self.config['scraper_settings']['max_retries']
         self.timeout = self.config['scraper_settings']['timeout']
         self.delay_requests = self.config['scraper_settings']['delay_between_requests']
-        self.delay_categories = self.config['scraper_settings']['delay_between_categories']
-        self.delay_pages = self.config['scraper_settings']['delay_between_pages']
         self.max_workers = self.config['scraper_settings']['max_image_download_workers']
         self.img_timeout = self.config['scraper_settings']['image_download_timeout']
-        self.img_delay = self.config['scraper_settings'].get('image_download_delay', [3, 8])
         self.random_sleep_prob = self.config['scraper_settings'].get('random_sleep_probability', 0.3)
         self.long_sleep_range = self.config['scraper_settings'].get('long_random_sleep_range', [30, 90])
+        self.html_parser = self.config['scraper_settings'].get('html_parser', 'lxml')
+        if self.html_parser == 'lxml' and importlib.util.find_spec('lxml') is None:
+            logger.warning("未安装 lxml，使用 html.parser 解析页面")
+            self.html_parser = 'html.parser'
+        self.detail_strainer = detail_page_strainer()
         
         # 从配置获取User-Agent列表
         self.user_agents = self.config['user_agents']
@@ -78,13 +496,44 @@ class ProductScraper:
         self.images_dir = self.output_dir / "images"
         self.output_dir.mkdir(exist_ok=True)
         self.images_dir.mkdir(exist_ok=True)
+
+        # 页面缓存: 重新运行或 --retry-failed 时不必重新下载未变化的页面
+        cache_config = self.config.get('http_cache', {})
+        self.cache = None
+        if cache_config.get('enabled', True):
+            self.cache = ResponseCache(self.output_dir / cache_config.get('directory', 'http_cache'),
+                                       ttl=cache_config.get('ttl_hours', 24) * 3600)
+
+        # 爬取进度: 分类、分页、产品的状态保存在 SQLite 中，--resume 时从中断处继续
+        frontier_config = self.config.get('frontier', {})
+        self.frontier = CrawlFrontier(self.output_dir / frontier_config.get('database', 'frontier.sqlite3'),
+                                      batch_size=frontier_config.get('commit_batch_size', 50),
+                                      commit_interval=frontier_config.get('commit_interval', 10))
         
         self.products_data = []
         self.failed_categories = []
         self.failed_products = []  # 新增：记录失败的产品
         self.request_count = 0
         
-        logger.info(f"配置加载完成 - 延时范围: 请求间{self.delay_requests}s, 分类间{self.delay_categories}s")
+        # 抓取引擎: 按主机令牌桶限速，未单独配置的主机按 delay_between_requests 的平均间隔限速，
+        # 配置了 adaptive_rate 时按服务器反馈调整速率
+        engine_config = self.config.get('fetch_engine', {})
+        adaptive = engine_config.get('adaptive_rate')
+        if adaptive is not None and not adaptive.get('enabled', True):
+            adaptive = None
+        self.engine = FetchEngine(
+            self.session,
+            host_limits=engine_config.get('host_rate_limits', {}),
+            default_rate=engine_config.get('default_rate', 2 / sum(self.delay_requests)),
+            default_burst=engine_config.get('default_burst', 1),
+            max_concurrency=engine_config.get('max_concurrency', 4),
+            pause_probability=self.random_sleep_prob,
+            pause_range=self.long_sleep_range,
+            adaptive=adaptive,
+        )
+        
+        logger.info(f"配置加载完成 - 默认请求速率: {self.engine.default_rate:.2f} 次/秒, "
+                    f"最大并发: {self.engine.max_concurrency}")
         
     def load_config(self, config_file: str) -> Dict:
         """加载配置文件"""
@@ -107,15 +556,33 @@ class ProductScraper:
                 "max_retries": 6,
                 "timeout": 18,
                 "delay_between_requests": [2, 5],
-                "delay_between_categories": [8, 15],
-                "delay_between_pages": [3, 8],
                 "max_image_download_workers": 1,
                 "image_download_timeout": 25,
-                "image_download_delay": [3, 8],
                 "random_sleep_probability": 0.2,
                 "long_random_sleep_range": [15, 45],
-                "fetch_product_details": False,  # 是否获取产品详情页面信息
-                "details_delay_range": [5, 10]  # 获取详情页面的延时范围
+                "html_parser": "lxml",  # 页面解析器: lxml(更快) 或 html.parser(纯 Python)
+                "fetch_product_details": False  # 是否获取产品详情页面信息
+            },
+            "fetch_engine": {
+                "max_concurrency": 4,  # 同时进行的请求数
+                "host_rate_limits": {},  # 各主机的令牌桶 {"主机名": {"rate": 每秒请求数, "burst": 突发请求数}}
+                "adaptive_rate": {  # 按服务器反馈调整速率(AIMD)
+                    "enabled": True,
+                    "increase": 0.02,  # 每个正常响应后增加的速率(次/秒)
+                    "decrease_factor": 0.5,  # 过载、超时或遇到验证页面时速率乘以该系数
+                    "min_rate": 0.05,  # 速率下限(次/秒)
+                    "max_rate": 1.0  # 速率上限(次/秒)
+                }
+            },
+            "http_cache": {
+                "enabled": True,
+                "directory": "http_cache",  # output 下的缓存目录
+                "ttl_hours": 24  # 缓存有效期，过期后用 ETag/Last-Modified 验证
+            },
+            "frontier": {
+                "database": "frontier.sqlite3",  # output 下保存爬取进度的数据库
+                "commit_batch_size": 50,  # 每累积多少次写入提交一次
+                "commit_interval": 10  # 距上次提交超过多少秒时提交
             },
             "user_agents": [
                 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
@@ -177,36 +644,37 @@ class ProductScraper:
             
         return img_url
         
-    def smart_delay(self, delay_range: List[int], context: str = ""):
-        """智能延时 - 模拟真实用户行为"""
-        base_delay = random.uniform(delay_range[0], delay_range[1])
-        
-        # 随机概率触发更长延时，模拟用户思考时间
-        if random.random() < self.random_sleep_prob:
-            extra_delay = random.uniform(self.long_sleep_range[0], self.long_sleep_range[1])
-            logger.info(f"触发随机长延时 {extra_delay:.1f}s - {context}")
-            time.sleep(extra_delay)
-            
-        logger.debug(f"延时 {base_delay:.1f}s - {context}")
-        time.sleep(base_delay)
-        
     def simulate_human_behavior(self):
         """模拟人类行为特征"""
-        # 模拟鼠标移动停顿
-        if random.random() < 0.1:
-            pause = random.uniform(0.5, 2.0)
-            time.sleep(pause)
-            
         # 每隔一段时间更新Referer
         if self.request_count % 10 == 0:
             self.session.headers.update({
                 'Referer': f"{self.base_url}/"
             })
             
-    def get_page(self, url: str, retries: int = None) -> Optional[BeautifulSoup]:
-        """获取网页内容，增强反反爬机制"""
+    def parse_html(self, content: bytes, parse_only=None) -> BeautifulSoup:
+        """用配置的解析器解析页面，parse_only 为 SoupStrainer 时只构建匹配的子树"""
+        from bs4 import BeautifulSoup
+
+        return BeautifulSoup(content, self.html_parser, parse_only=parse_only)
+
+    def get_page(self, url: str, retries: int = None, parse_only=None) -> Optional[BeautifulSoup]:
+        """获取网页内容，增强反反爬机制
+
+        请求经抓取引擎发出，请求间隔由目标主机的令牌桶控制，调用线程只等待自己的响应；
+        可在多个线程中同时调用。parse_only 见 parse_html
+        """
+        import requests
+
         if retries is None:
             retries = self.max_retries
+
+        # 缓存未过期时直接使用，过期后发条件请求验证
+        entry = self.cache.get(url) if self.cache else None
+        if entry and self.cache.is_fresh(entry):
+            self.cache.count('hits')
+            logger.debug(f"使用缓存: {url}")
+            return self.parse_html(entry['body'], parse_only)
             
         self.request_count += 1
         
@@ -215,35 +683,46 @@ class ProductScraper:
                 # 模拟人类行为
                 self.simulate_human_behavior()
                 
-                # 每次请求使用不同的User-Agent
-                self.session.headers.update({
+                # 每次请求使用不同的User-Agent(按请求传入，避免多个线程同时修改会话头部)
+                headers = {
                     'User-Agent': self.get_random_user_agent(),
                     'Sec-Ch-Ua': '"Not_A Brand";v="8", "Chromium";v="120", "Google Chrome";v="120"',
                     'Sec-Ch-Ua-Mobile': '?0',
                     'Sec-Ch-Ua-Platform': f'"{random.choice(["macOS", "Windows", "Linux"])}"'
-                })
+                }
+                if entry:
+                    headers.update(self.cache.conditional_headers(entry))
                 
                 logger.info(f"正在获取: {url} (尝试 {attempt + 1}/{retries})")
                 
-                # 请求前随机延时
-                if attempt > 0:
-                    self.smart_delay([3, 8], f"重试前延时")
-                else:
-                    self.smart_delay(self.delay_requests, f"正常请求延时")
-                
-                response = self.session.get(url, timeout=self.timeout)
+                response = self.engine.fetch(url, headers=headers, timeout=self.timeout)
                 
                 # 检查响应状态
-                if response.status_code == 200:
+                if response.status_code == 304 and entry:
+                    self.cache.count('revalidated')
+                    self.cache.touch(url, entry)
+                    logger.debug(f"页面未变化，使用缓存: {url}")
+                    return self.parse_html(entry['body'], parse_only)
+                elif response.status_code == 200:
                     response.encoding = 'utf-8'
-                    soup = BeautifulSoup(response.content, 'html.parser')
+                    soup = self.parse_html(response.content, parse_only)
                     logger.debug(f"页面获取成功: {len(response.content)} bytes")
+                    if self.cache:
+                        changed = self.cache.put(url, response.content,
+                                                 etag=response.headers.get('ETag'),
+                                                 last_modified=response.headers.get('Last-Modified'))
+                        # 服务器不支持条件请求时，按内容哈希判断页面是否变化
+                        self.cache.count('misses' if not entry else 'updated' if changed else 'revalidated')
                     return soup
-                elif response.status_code in [503, 520, 521, 522, 524]:
-                    logger.warning(f"服务器过载 {response.status_code}, 将增加延时重试")
-                    # 服务器过载时增加更长延时
-                    extra_wait = random.uniform(15, 45)
-                    time.sleep(extra_wait)
+                elif response.status_code in FetchEngine.OVERLOAD_STATUS:
+                    if attempt == retries - 1:
+                        logger.error(f"服务器持续过载 {response.status_code}, 无法获取页面: {url}")
+                        return None
+                    # 暂停该主机后重试(未启用 adaptive_rate 时这是唯一的退避)，
+                    # 启用时重试请求还会按抓取引擎降低后的速率排队
+                    wait_time = random.uniform(15, 45)
+                    logger.warning(f"服务器过载 {response.status_code}, 等待 {wait_time:.1f} 秒后重试")
+                    self.engine.pause_host(url, wait_time)
                 else:
                     response.raise_for_status()
                 
@@ -253,7 +732,7 @@ class ProductScraper:
                     # 指数退避 + 随机抖动 + 额外延时
                     wait_time = (2 ** attempt) + random.uniform(5, 15)
                     logger.info(f"等待 {wait_time:.1f} 秒后重试...")
-                    time.sleep(wait_time)
+                    self.engine.pause_host(url, wait_time)
                 else:
                     logger.error(f"无法获取页面: {url}")
                     return None
@@ -449,23 +928,6 @@ class ProductScraper:
                     else:
                         break
                 
-                # 获取产品详情信息（如果配置启用）
-                product_details = ""
-                banner_images = []
-                detail_images = []
-                if self.config['scraper_settings'].get('fetch_product_details', False):
-                    try:
-                        product_details, banner_images, detail_images = self.extract_product_details(product_url)
-                        if product_details:
-                            logger.debug(f"成功获取产品详情: {product_name[:30]}...")
-                        else:
-                            logger.debug(f"未获取到产品详情: {product_name[:30]}...")
-                    except Exception as detail_error:
-                        logger.warning(f"获取产品详情失败 {product_name}: {detail_error}")
-                        # 记录失败
-                        self.record_failure('product', category_name, product_name, 
-                                          f"获取详情失败: {detail_error}", product_url)
-                
                 product_info = {
                     'category': category_name,
                     'name': product_name,
@@ -473,16 +935,56 @@ class ProductScraper:
                     'image_url': img_url if img_url else "",
                     'price': price,
                     'image_path': None,
-                    'details': product_details,
-                    'banner_images': banner_images,
-                    'detail_images': detail_images
+                    'details': "",
+                    'banner_images': [],
+                    'detail_images': []
                 }
                 products.append(product_info)
             except Exception as e:
                 logger.warning(f"提取产品信息时出错: {e}")
                 continue
+        
+        # 获取产品详情信息（如果配置启用）
+        if products and self.config['scraper_settings'].get('fetch_product_details', False):
+            self.fetch_products_details(products)
         return products
     
+    def fetch_products_details(self, products: List[Dict]):
+        """同时获取多个产品的详情页，结果写回各产品的 details/banner_images/detail_images
+
+        请求速率由抓取引擎的主机令牌桶控制，先返回的页面先解析；
+        之前已解析过的产品(见 CrawlFrontier)直接使用保存的详情
+        """
+        pending = []
+        for product in products:
+            details = self.frontier.product_details(product['url'])
+            if details is None:
+                pending.append(product)
+            else:
+                product.update(details)
+        if len(pending) < len(products):
+            logger.info(f"{len(products) - len(pending)} 个产品详情已获取过，跳过")
+        self.frontier.add_products(pending)
+
+        with ThreadPoolExecutor(max_workers=self.engine.max_concurrency) as executor:
+            future_to_product = {executor.submit(self._extract_product_details, product['url']): product
+                                 for product in pending}
+            for future in as_completed(future_to_product):
+                product = future_to_product[future]
+                try:
+                    product['details'], product['banner_images'], product['detail_images'] = future.result()
+                    self.frontier.set_product(product, CrawlFrontier.PARSED)
+                    if product['details']:
+                        logger.debug(f"成功获取产品详情: {product['name'][:30]}...")
+                    else:
+                        logger.debug(f"未获取到产品详情: {product['name'][:30]}...")
+                except Exception as detail_error:
+                    logger.warning(f"获取产品详情失败 {product['name']}: {detail_error}")
+                    # 记录失败
+                    self.frontier.set_product(product, CrawlFrontier.FAILED, str(detail_error))
+                    self.record_failure('product', product['category'], product['name'],
+                                        f"获取详情失败: {detail_error}", product['url'])
+    
     def html_to_markdown(self, html_content: str) -> str:
         """将HTML内容转换为Markdown格式"""
         if not html_content:
@@ -672,74 +1174,89 @@ class ProductScraper:
         """提取产品详情页面的详细信息、banner图片和详情图片
         
         Returns:
-            Tuple[str, List[str], List[str]]: (详情文本, banner图片列表, 详情图片列表)
+            Tuple[str, List[str], List[str]]: (详情文本, banner图片列表, 详情图片列表)，
+            无法获取页面或解析出错时为 ("", [], [])
         """
         try:
-            logger.info(f"正在获取产品详情: {product_url}")
-            
-            # 详情页面请求前延时
-            details_delay = self.config['scraper_settings'].get('details_delay_range', [5, 10])
-            self.smart_delay(details_delay, f"详情页面请求延时")
-            
-            # 获取产品详情页面
-            soup = self.get_page(product_url)
-            if not soup:
-                logger.warning(f"无法获取产品详情页面: {product_url}")
-                return "", [], []
-            
-            # 提取 banner 图片
-            banner_images = self.extract_banner_images(soup)
-            
-            # 不再提取详情图片，只保留 banner 图片
-            detail_images = []
-            
-            # 查找className为'sp-bd pdsx'的元素
-            detail_container = soup.find('div', class_='sp-bd pdsx')
-            if not detail_container:
-                logger.warning(f"未找到详情容器: {product_url}")
-                return "", banner_images, detail_images
-            
-            # 提取详细信息区域的内容
-            detail_content = ""
+            return self._extract_product_details(product_url)
+        except Exception as e:
+            logger.warning(str(e))
+            return "", [], []
+    
+    def _extract_product_details(self, product_url: str) -> Tuple[str, List[str], List[str]]:
+        """同 extract_product_details，但无法获取页面或解析出错时抛出异常，
+        供 fetch_products_details 把产品记为失败(--resume 时重新获取)"""
+        logger.info(f"正在获取产品详情: {product_url}")
+        
+        # 获取产品详情页面，只构建 banner 容器和详情容器
+        soup = self.get_page(product_url, parse_only=self.detail_strainer)
+        if not soup:
+            raise Exception(f"无法获取产品详情页面: {product_url}")
+        try:
+            return self._parse_product_details(soup, product_url)
+        except Exception as e:
+            raise Exception(f"提取产品详情失败 {product_url}: {e}") from e
+    
+    def parse_product_details(self, soup: BeautifulSoup, product_url: str = "") -> Tuple[str, List[str], List[str]]:
+        """从已解析的详情页提取 (详情文本, banner图片列表, 详情图片列表)，解析出错时为 ("", [], [])"""
+        try:
+            return self._parse_product_details(soup, product_url)
+        except Exception as e:
+            logger.error(f"提取产品详情失败 {product_url}: {e}")
+            return "", [], []
+    
+    def _parse_product_details(self, soup: BeautifulSoup, product_url: str) -> Tuple[str, List[str], List[str]]:
+        """parse_product_details 的实现，解析出错时抛出异常"""
+        # 提取 banner 图片
+        banner_images = self.extract_banner_images(soup)
+        
+        # 不再提取详情图片，只保留 banner 图片
+        detail_images = []
+        
+        # 查找className为'sp-bd pdsx'的元素
+        detail_container = soup.find('div', class_='sp-bd pdsx')
+        if not detail_container:
+            logger.warning(f"未找到详情容器: {product_url}")
+            return "", banner_images, detail_images
+        
+        # 提取详细信息区域的内容
+        detail_content = ""
+        
+        # 1. 提取属性表格 (attr-list)
+        attr_list = detail_container.find('div', class_='attr-list')
+        if attr_list:
+            logger.debug("找到属性信息")
+            detail_content += "## 产品属性\n\n"
+            detail_content += self.html_to_markdown(str(attr_list)) + "\n"
+        
+        # 2. 提取详细描述 (text-detail)
+        text_detail = detail_container.find('div', class_='text-detail')
+        if text_detail:
+            logger.debug("找到详细描述")
+            detail_content += "## 产品详情\n\n"
             
-            # 1. 提取属性表格 (attr-list)
-            attr_list = detail_container.find('div', class_='attr-list')
-            if attr_list:
-                logger.debug("找到属性信息")
-                detail_content += "## 产品属性\n\n"
-                detail_content += self.html_to_markdown(str(attr_list)) + "\n"
+            # 移除不需要的元素（如脚本、样式等）
+            for unwanted in text_detail.find_all(['script', 'style', 'noscript']):
+                unwanted.decompose()
             
-            # 2. 提取详细描述 (text-detail)
-            text_detail = detail_container.find('div', class_='text-detail')
-            if text_detail:
-                logger.debug("找到详细描述")
-                detail_content += "## 产品详情\n\n"
-                
-                # 移除不需要的元素（如脚本、样式等）
-                for unwanted in text_detail.find_all(['script', 'style', 'noscript']):
-                    unwanted.decompose()
-                
-                # 转换为Markdown
-                detail_markdown = self.html_to_markdown(str(text_detail))
-                detail_content += detail_markdown + "\n"
+            # 转换为Markdown
+            detail_markdown = self.html_to_markdown(str(text_detail))
+            detail_content += detail_markdown + "\n"
+        
+        if not detail_content:
+            # 如果没有找到特定结构，尝试提取整个容器的内容
+            logger.debug("未找到标准结构，提取整个容器内容")
+            detail_content = "## 产品详情\n\n"
             
-            if not detail_content:
-                # 如果没有找到特定结构，尝试提取整个容器的内容
-                logger.debug("未找到标准结构，提取整个容器内容")
-                detail_content = "## 产品详情\n\n"
+            # 移除不需要的元素
+            for unwanted in detail_container.find_all(['script', 'style', 'noscript']):
+                unwanted.decompose()
                 
-                # 移除不需要的元素
-                for unwanted in detail_container.find_all(['script', 'style', 'noscript']):
-                    unwanted.decompose()
-                    
-                detail_content += self.html_to_markdown(str(detail_container))
-            
-            logger.info(f"成功提取产品详情，长度: {len(detail_content)} 字符")
-            return detail_content.strip(), banner_images, detail_images
-            
-        except Exception as e:
-            logger.error(f"提取产品详情失败 {product_url}: {e}")
-            return "", [], []
+            detail_content += self.html_to_markdown(str(detail_container))
+        
+        logger.info(f"成功提取产品详情，长度: {len(detail_content)} 字符")
+        return detail_content.strip(), banner_images, detail_images
+    
     def download_image(self, image_url: str, product_name: str, max_retries: int = 3, save_path: Path = None) -> Optional[str]:
         """下载产品图片
         
@@ -752,6 +1269,8 @@ class ProductScraper:
         Returns:
             图片相对路径或None
         """
+        from PIL import Image
+
         if not image_url:
             return None
         
@@ -760,15 +1279,10 @@ class ProductScraper:
             
         for attempt in range(max_retries):
             try:
-                # 使用随机User-Agent和延时
+                # 使用随机User-Agent，请求间隔由图片所在主机的令牌桶控制，避免触发反爬
                 headers = {'User-Agent': self.get_random_user_agent()}
                 
-                # 图片下载前延时，避免触发反爬
-                delay = random.uniform(self.img_delay[0], self.img_delay[1])
-                logger.debug(f"图片下载延时 {delay:.1f}s")
-                time.sleep(delay)
-                
-                response = self.session.get(image_url, headers=headers, timeout=self.img_timeout)
+                response = self.engine.fetch(image_url, headers=headers, timeout=self.img_timeout)
                 response.raise_for_status()
                 
                 # 检查内容类型
@@ -781,6 +1295,7 @@ class ProductScraper:
                 response_text = response.text[:500].lower()  # 只检查前500字符
                 if any(html_indicator in response_text for html_indicator in ['<html', '<title', '验证', 'captcha', 'verify', '滑块']):
                     logger.warning(f"检测到可能的验证页面，停止图片下载: {image_url}")
+                    self.engine.report_overload(image_url)
                     raise Exception("遇到验证页面，停止下载")
                 
                 # 检查文件大小（太小可能是占位符）
@@ -838,63 +1353,95 @@ class ProductScraper:
         return None
     
     def scrape_category(self, category: Dict[str, str]) -> List[Dict]:
-        """爬取某个分类的所有产品"""
+        """爬取某个分类的所有产品
+
+        已解析的分页(见 CrawlFrontier)不再请求，直接使用保存的产品列表
+        """
         category_name = category['name']
         category_url = category['url']
         
         logger.info(f"正在爬取分类: {category_name}")
         
-        # 获取总页数
-        total_pages = self.get_total_pages(category_url)
+        # 获取总页数(之前已获取过时使用保存的页数)
+        _, total_pages = self.frontier.category_state(category_url)
+        if not total_pages:
+            total_pages = self.get_total_pages(category_url)
+            self.frontier.set_category(category, CrawlFrontier.FETCHED, total_pages=total_pages)
         logger.info(f"分类 {category_name} 共有 {total_pages} 页")
         
         category_products = []
         
-        for page in range(1, total_pages + 1):
-            try:
-                # 构造分页URL
-                if page == 1:
-                    page_url = category_url
-                else:
-                    page_url = re.sub(r'_1\.html$', f'_{page}.html', category_url)
-                
-                logger.info(f"正在爬取第 {page} 页...")
-                soup = self.get_page(page_url)
-                
-                if not soup:
-                    logger.error(f"无法获取第 {page} 页内容")
+        # 构造分页URL
+        page_urls = [category_url if page == 1 else re.sub(r'_1\.html$', f'_{page}.html', category_url)
+                     for page in range(1, total_pages + 1)]
+        self.frontier.add_pages(category_url, page_urls)
+        parsed_pages = {page_url: self.frontier.page_products(page_url) for page_url in page_urls}
+        failed_pages = 0
+        
+        # 所有未解析的分页一起提交给抓取引擎，按顺序解析，解析时后面的页面继续下载
+        with ThreadPoolExecutor(max_workers=self.engine.max_concurrency) as executor:
+            page_futures = [executor.submit(self.get_page, page_url) if parsed_pages[page_url] is None else None
+                            for page_url in page_urls]
+            for page, (page_url, future) in enumerate(zip(page_urls, page_futures), 1):
+                if future is None:
+                    products = parsed_pages[page_url]
+                    logger.info(f"第 {page} 页已解析过，跳过 ({len(products)} 个产品)")
+                    # 上次获取失败或未完成的产品详情重新获取
+                    if (self.config['scraper_settings'].get('fetch_product_details', False)
+                            and any(self.frontier.product_details(p['url']) is None for p in products)):
+                        self.fetch_products_details(products)
+                        self.frontier.set_page(page_url, CrawlFrontier.PARSED, products=products)
+                    category_products.extend(products)
+                    continue
+                try:
+                    logger.info(f"正在爬取第 {page} 页...")
+                    soup = future.result()
+                    
+                    if not soup:
+                        logger.error(f"无法获取第 {page} 页内容")
+                        failed_pages += 1
+                        self.frontier.set_page(page_url, CrawlFrontier.FAILED, error="无法获取页面内容")
+                        continue
+                    self.frontier.set_page(page_url, CrawlFrontier.FETCHED)
+                    
+                    # 提取产品信息
+                    products = self.extract_products_from_page(soup, category_name)
+                    category_products.extend(products)
+                    self.frontier.set_page(page_url, CrawlFrontier.PARSED, products=products)
+                    
+                    logger.info(f"第 {page} 页找到 {len(products)} 个产品")
+                    
+                except Exception as e:
+                    logger.error(f"爬取第 {page} 页时出错: {e}")
+                    # 记录页面爬取失败
+                    failed_pages += 1
+                    self.frontier.set_page(page_url, CrawlFrontier.FAILED, error=str(e))
+                    self.record_failure('page', category_name, f"第{page}页", str(e), page_url)
                     continue
-                
-                # 提取产品信息
-                products = self.extract_products_from_page(soup, category_name)
-                category_products.extend(products)
-                
-                logger.info(f"第 {page} 页找到 {len(products)} 个产品")
-                
-                # 页面间延时
-                if page < total_pages:
-                    self.smart_delay(self.delay_pages, f"页面间延时")
-                
-            except Exception as e:
-                logger.error(f"爬取第 {page} 页时出错: {e}")
-                # 记录页面爬取失败
-                self.record_failure('page', category_name, f"第{page}页", str(e), page_url)
-                continue
         
+        # 有分页失败时分类记为 failed，--resume 时只重新爬取失败的分页
+        if failed_pages:
+            self.frontier.set_category(category, CrawlFrontier.FAILED, error=f"{failed_pages} 页获取失败")
+        else:
+            self.frontier.set_category(category, CrawlFrontier.PARSED)
         logger.info(f"分类 {category_name} 共找到 {len(category_products)} 个产品")
         return category_products
     
-    def scrape_all(self, retry_failed_only: bool = False):
+    def scrape_all(self, retry_failed_only: bool = False, resume: bool = False):
         """爬取所有产品
         
         Args:
             retry_failed_only: 如果为True，只重新爬取失败列表中的项目
+            resume: 如果为True，从上次中断处继续(已完成的分类、分页和产品详情不再请求)
         """
         logger.info("开始爬取所有产品...")
         
         categories = []
         
-        if retry_failed_only:
+        if resume and self.frontier.categories():
+            categories = [{'name': c['name'], 'url': c['url']} for c in self.frontier.categories()]
+            logger.info(f"继续上次的爬取: {self.frontier.summary()}")
+        elif retry_failed_only:
             # 只重新爬取失败列表中的分类
             logger.info("重试模式：只爬取失败列表中的分类和产品")
             failed_list = self.load_failed_list()
@@ -913,6 +1460,9 @@ class ProductScraper:
         if not categories:
             logger.error("未找到任何产品分类")
             return
+        if not resume:
+            self.frontier.reset()
+        self.frontier.add_categories(categories)
         
         # 爬取每个分类
         for i, category in enumerate(categories, 1):
@@ -925,15 +1475,13 @@ class ProductScraper:
                     logger.info(f"成功获取 {len(products)} 个产品")
                 else:
                     logger.warning(f"分类 {category['name']} 未获取到产品")
+                    self.frontier.set_category(category, CrawlFrontier.FAILED, error="未获取到产品")
                     self.record_failure('category', category['name'], category['name'], 
                                       "未获取到产品", category.get('url', ''))
                 
-                # 分类间延时
-                if i < len(categories):
-                    self.smart_delay(self.delay_categories, f"分类间延时")
-                
             except Exception as e:
                 logger.error(f"处理分类 {category['name']} 时出错: {e}")
+                self.frontier.set_category(category, CrawlFrontier.FAILED, error=str(e))
                 self.record_failure('category', category['name'], category['name'], str(e), category.get('url', ''))
                 continue
         
@@ -947,7 +1495,7 @@ class ProductScraper:
             max_workers = self.max_workers
             
         logger.info("开始下载产品图片...")
-        logger.info(f"图片下载策略: 单线程下载，延时{self.img_delay[0]}-{self.img_delay[1]}秒，避免触发反爬")
+        logger.info(f"图片下载策略: {max_workers} 个线程下载，请求间隔由主机令牌桶控制，避免触发反爬")
         
         products_with_images = [p for p in self.products_data if p.get('image_url')]
         if not products_with_images:
@@ -1098,6 +1646,8 @@ class ProductScraper:
             
         filepath = self.output_dir / filename
         
+        import pandas as pd
+
         # 创建DataFrame
         df = pd.DataFrame(self.products_data)
         
@@ -1149,6 +1699,9 @@ class ProductScraper:
             },
             'scraper_stats': {
                 'total_requests': self.request_count,
+                'hosts': self.engine.host_stats(),
+                'http_cache': self.cache.stats if self.cache else None,
+                'frontier': self.frontier.summary(),
                 'config_used': self.config
             }
         }
@@ -1166,6 +1719,11 @@ class ProductScraper:
         
         logger.info(f"调试信息已保存到: {debug_file}")
     
+    def close(self):
+        """停止抓取引擎并提交未保存的爬取进度"""
+        self.engine.close()
+        self.frontier.close()
+    
     def record_failure(self, item_type: str, category_name: str, item_name: str, error: str, url: str = ""):
         """记录失败的项目
         
@@ -1246,15 +1804,22 @@ def main():
 使用示例:
   python product_scraper.py                    # 爬取所有产品
   python product_scraper.py --retry-failed     # 只重新爬取失败列表中的项目
+  python product_scraper.py --resume           # 从上次中断处继续爬取
   python product_scraper.py --config custom_config.json  # 使用自定义配置文件
         """
     )
     
-    parser.add_argument(
+    mode_group = parser.add_mutually_exclusive_group()
+    mode_group.add_argument(
         '--retry-failed',
         action='store_true',
         help='只重新爬取失败列表(failed_list.json)中的分类和产品'
     )
+    mode_group.add_argument(
+        '--resume',
+        action='store_true',
+        help='从上次中断处继续爬取，已完成的分页和产品详情不再请求(进度保存在 output/frontier.sqlite3)'
+    )
     
     parser.add_argument(
         '--config',
@@ -1265,11 +1830,12 @@ def main():
     
     args = parser.parse_args()
     
+    scraper = None
     try:
         scraper = ProductScraper(config_file=args.config)
         
         # 爬取所有产品数据（或只爬取失败的）
-        scraper.scrape_all(retry_failed_only=args.retry_failed)
+        scraper.scrape_all(retry_failed_only=args.retry_failed, resume=args.resume)
         
         if scraper.products_data:
             # 保存产品列表到Excel（按照要求的格式）
@@ -1300,9 +1866,13 @@ def main():
             
     except KeyboardInterrupt:
         print("\n用户中断程序")
+        print("提示：可以使用 --resume 参数从中断处继续爬取")
     except Exception as e:
         logger.error(f"程序执行出错: {e}")
         raise
+    finally:
+        if scraper is not None:
+            scraper.close()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
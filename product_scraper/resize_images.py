@@ -11,7 +11,6 @@
 
 import os
 from pathlib import Path
-from PIL import Image
 import logging
 
 # 配置日志
@@ -65,6 +64,9 @@ def resize_image(image_path: Path, min_size: int = TARGET_MIN_SIZE) -> bool:
     Returns:
         是否成功处理
     """
+    # PIL 导入较慢，只在需要处理图片时导入
+    from PIL import Image
+
     try:
         # 打开图片
         with Image.open(image_path) as img:
@@ -173,6 +175,8 @@ def show_statistics(output_dir: Path):
         logger.info("未找到 JPG 图片")
         return
     
+    from PIL import Image
+
     size_ranges = {
         'small': 0,      # < 750x750
         'medium': 0,     # 750x750 ~ 1500x1500
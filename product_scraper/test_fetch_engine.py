@@ -0,0 +1,298 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试 product_scraper.py 的抓取引擎
+使用本地 HTTP 服务代替目标网站，不访问外网
+"""
+
+import sys
+import json
+import time
+import threading
+import importlib
+from pathlib import Path
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+# 本地服务返回的页面: 路径 -> HTML
+PAGES = {
+    '/supply/': '<html><head><title>供应</title></head><body>'
+                '<a href="/supply/g1_1.html">阀门 (3)</a></body></html>',
+    '/supply/100.html': '<html><body>'
+                        '<div data-cnrole="ProductPhotoShowList"><ul>'
+                        '<li><img src="/img/a.jpg"></li><li><img src="/img/b.jpg"></li>'
+                        '</ul></div>'
+                        '<div class="sp-bd pdsx"><div class="attr-list"><p>材质: 不锈钢</p></div></div>'
+                        '</body></html>',
+    '/supply/101.html': '<html><body><div class="sp-bd pdsx"><p>材质: 铸铁</p></div></body></html>',
+    '/supply/g1_1.html': '<html><body><span>共2页</span>'
+                         '<a href="/supply/100.html">不锈钢截止阀 DN50</a></body></html>',
+    '/supply/g1_2.html': '<html><body><a href="/supply/101.html">铸铁闸阀 Z41H</a></body></html>',
+}
+
+
+# 带 ETag 的页面，支持 If-None-Match 条件请求
+ETAG_PAGES = {'/supply/100.html': '"v1"'}
+
+# 本地服务收到的请求: (路径, 响应状态码)
+REQUEST_LOG = []
+
+# 暂时返回 404 的路径
+UNAVAILABLE = set()
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """按 PAGES 返回页面，/busy 返回 503，其余路径返回 404"""
+
+    def do_GET(self):
+        if self.path == '/busy':
+            REQUEST_LOG.append((self.path, 503))
+            self.send_error(503)
+            return
+        body = PAGES.get(self.path) if self.path not in UNAVAILABLE else None
+        if body is None:
+            REQUEST_LOG.append((self.path, 404))
+            self.send_error(404)
+            return
+        etag = ETAG_PAGES.get(self.path)
+        if etag and self.headers.get('If-None-Match') == etag:
+            REQUEST_LOG.append((self.path, 304))
+            self.send_response(304)
+            self.end_headers()
+            return
+        REQUEST_LOG.append((self.path, 200))
+        data = body.encode('utf-8')
+        self.send_response(200)
+        if etag:
+            self.send_header('ETag', etag)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_server():
+    """在后台线程启动本地 HTTP 服务，返回 (server, 端口)"""
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StubHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, server.server_address[1]
+
+
+def load_scraper_module(tmp_path, monkeypatch):
+    """在临时目录中导入 product_scraper，日志和 output 目录都写到临时目录"""
+    monkeypatch.chdir(tmp_path)
+    if 'product_scraper' in sys.modules:
+        return sys.modules['product_scraper']
+    return importlib.import_module('product_scraper')
+
+
+def make_scraper(module, tmp_path, base_url, **cache_config):
+    """用仓库的 config.json 创建爬虫，放宽本地服务的限速"""
+    config = json.loads((Path(__file__).parent / 'config.json').read_text(encoding='utf-8'))
+    config['scraper_settings'].update({'max_retries': 1, 'random_sleep_probability': 0})
+    config['fetch_engine']['host_rate_limits'] = {'127.0.0.1': {'rate': 100, 'burst': 5}}
+    config['http_cache'].update(cache_config)
+    config_file = tmp_path / 'config.json'
+    config_file.write_text(json.dumps(config), encoding='utf-8')
+    return module.ProductScraper(base_url=base_url, config_file=str(config_file))
+
+
+def test_token_bucket_limits_each_host(tmp_path, monkeypatch):
+    """限速的主机按令牌桶速率发出请求，其他主机的请求不受影响"""
+    import requests
+
+    module = load_scraper_module(tmp_path, monkeypatch)
+    server, port = start_server()
+    engine = module.FetchEngine(requests.Session(),
+                                host_limits={'127.0.0.1': {'rate': 10, 'burst': 1}},
+                                default_rate=1000, max_concurrency=4)
+    try:
+        start = time.monotonic()
+        slow = [engine.submit(f'http://127.0.0.1:{port}/supply/', timeout=5) for _ in range(6)]
+        fast = [engine.submit(f'http://localhost:{port}/supply/', timeout=5) for _ in range(6)]
+        assert all(f.result().status_code == 200 for f in fast)
+        fast_elapsed = time.monotonic() - start
+        assert all(f.result().status_code == 200 for f in slow)
+        slow_elapsed = time.monotonic() - start
+    finally:
+        engine.close()
+        server.shutdown()
+
+    # 6 个请求在 burst=1、每秒 10 个令牌时至少需要 0.5 秒
+    assert slow_elapsed >= 0.45
+    assert fast_elapsed < slow_elapsed
+
+
+def test_detail_strainer_matches_full_parse(tmp_path, monkeypatch):
+    """lxml + 详情页 SoupStrainer 提取的详情与 html.parser 解析整个页面时一致"""
+    module = load_scraper_module(tmp_path, monkeypatch)
+    scraper = make_scraper(module, tmp_path, 'http://127.0.0.1', enabled=False)
+    page = PAGES['/supply/100.html'].encode('utf-8')
+    try:
+        scraper.html_parser = 'html.parser'
+        expected = scraper.parse_product_details(scraper.parse_html(page))
+        scraper.html_parser = 'lxml'
+        soup = scraper.parse_html(page, scraper.detail_strainer)
+        assert soup.find('body') is None
+        assert scraper.parse_product_details(soup) == expected
+    finally:
+        scraper.close()
+
+
+def test_adaptive_rate_stays_within_limits(tmp_path, monkeypatch):
+    """503 响应使速率乘性下降但不低于下限，正常响应使速率加性上升但不超过上限"""
+    import requests
+
+    module = load_scraper_module(tmp_path, monkeypatch)
+    server, port = start_server()
+    adaptive = {'increase': 5, 'decrease_factor': 0.5, 'min_rate': 20, 'max_rate': 60}
+    engine = module.FetchEngine(requests.Session(), default_rate=40, max_concurrency=1,
+                                adaptive=adaptive)
+    try:
+        for _ in range(4):
+            assert engine.fetch(f'http://127.0.0.1:{port}/busy', timeout=5).status_code == 503
+        stats = engine.host_stats()['127.0.0.1']
+        assert stats['rate'] == 20
+        assert stats['decreases'] >= 1
+
+        for _ in range(10):
+            assert engine.fetch(f'http://127.0.0.1:{port}/supply/', timeout=5).status_code == 200
+        stats = engine.host_stats()['127.0.0.1']
+        assert stats['rate'] == 60
+        assert stats['requests'] == 14
+    finally:
+        engine.close()
+        server.shutdown()
+
+
+def test_get_page_backs_off_on_overload(tmp_path, monkeypatch):
+    """未启用自适应速率时，过载响应同样暂停该主机后重试，重试用尽后返回 None"""
+    module = load_scraper_module(tmp_path, monkeypatch)
+    server, port = start_server()
+    base_url = f'http://127.0.0.1:{port}'
+    scraper = make_scraper(module, tmp_path, base_url, enabled=False)
+    scraper.engine.adaptive = None
+    pauses = []
+    monkeypatch.setattr(scraper.engine, 'pause_host', lambda url, seconds: pauses.append(seconds))
+    try:
+        REQUEST_LOG.clear()
+        assert scraper.get_page(f'{base_url}/busy', retries=3) is None
+        assert REQUEST_LOG == [('/busy', 503)] * 3
+        assert len(pauses) == 2
+        assert all(15 <= seconds <= 45 for seconds in pauses)
+    finally:
+        scraper.close()
+        server.shutdown()
+
+
+def test_get_page_and_details_from_local_server(tmp_path, monkeypatch):
+    """get_page/extract_product_details 的返回值与直接请求时一致"""
+    module = load_scraper_module(tmp_path, monkeypatch)
+    server, port = start_server()
+    base_url = f'http://127.0.0.1:{port}'
+    scraper = make_scraper(module, tmp_path, base_url, enabled=False)
+    try:
+        soup = scraper.get_page(f'{base_url}/supply/')
+        assert soup.title.get_text() == '供应'
+        assert scraper.get_page(f'{base_url}/missing.html') is None
+
+        details, banners, _ = scraper.extract_product_details(f'{base_url}/supply/100.html')
+        assert banners == [f'{base_url}/img/a.jpg', f'{base_url}/img/b.jpg']
+        assert '不锈钢' in details
+        assert scraper.extract_product_details(f'{base_url}/supply/missing.html') == ("", [], [])
+        assert scraper.parse_product_details(None, 'broken.html') == ("", [], [])
+    finally:
+        scraper.close()
+        server.shutdown()
+
+
+def test_response_cache_hit_and_revalidate(tmp_path, monkeypatch):
+    """有效期内直接使用缓存，过期后用 ETag 或内容哈希验证"""
+    module = load_scraper_module(tmp_path, monkeypatch)
+    server, port = start_server()
+    base_url = f'http://127.0.0.1:{port}'
+    pages = [f'{base_url}/supply/', f'{base_url}/supply/100.html']
+    try:
+        scraper = make_scraper(module, tmp_path, base_url, ttl_hours=1)
+        first = [scraper.get_page(url).get_text() for url in pages]
+        REQUEST_LOG.clear()
+        assert [scraper.get_page(url).get_text() for url in pages] == first
+        assert REQUEST_LOG == []
+        assert scraper.cache.stats == {'hits': 2, 'misses': 2, 'revalidated': 0, 'updated': 0}
+        scraper.close()
+
+        # 缓存过期: 有 ETag 的页面返回 304，没有 ETag 的页面按内容哈希判断未变化
+        scraper = make_scraper(module, tmp_path, base_url, ttl_hours=0)
+        assert [scraper.get_page(url).get_text() for url in pages] == first
+        assert sorted(REQUEST_LOG) == [('/supply/', 200), ('/supply/100.html', 304)]
+        assert scraper.cache.stats == {'hits': 0, 'misses': 0, 'revalidated': 2, 'updated': 0}
+        assert len(list((tmp_path / 'output' / 'http_cache').glob('*.html.gz'))) == 2
+    finally:
+        scraper.close()
+        server.shutdown()
+
+
+def test_resume_after_interrupt(tmp_path, monkeypatch):
+    """中断后 --resume 只请求未完成的分页和产品详情"""
+    module = load_scraper_module(tmp_path, monkeypatch)
+    server, port = start_server()
+    base_url = f'http://127.0.0.1:{port}'
+    try:
+        scraper = make_scraper(module, tmp_path, base_url, enabled=False)
+        extract = scraper.extract_products_from_page
+
+        def interrupt_on_second_page(soup, category_name):
+            if '铸铁闸阀' in soup.get_text():
+                raise KeyboardInterrupt
+            return extract(soup, category_name)
+
+        monkeypatch.setattr(scraper, 'extract_products_from_page', interrupt_on_second_page)
+        try:
+            scraper.scrape_all()
+        except KeyboardInterrupt:
+            pass
+        scraper.close()
+
+        REQUEST_LOG.clear()
+        scraper = make_scraper(module, tmp_path, base_url, enabled=False)
+        scraper.scrape_all(resume=True)
+        assert sorted(REQUEST_LOG) == [('/supply/101.html', 200), ('/supply/g1_2.html', 200)]
+        assert [p['name'] for p in scraper.products_data] == ['不锈钢截止阀 DN50', '铸铁闸阀 Z41H']
+        assert '不锈钢' in scraper.products_data[0]['details']
+        assert '铸铁' in scraper.products_data[1]['details']
+        assert scraper.frontier.summary() == {'categories': {'parsed': 1}, 'pages': {'parsed': 2},
+                                              'products': {'parsed': 2}}
+    finally:
+        scraper.close()
+        server.shutdown()
+
+
+def test_resume_retries_failed_details(tmp_path, monkeypatch):
+    """获取失败的产品详情记为 failed，--resume 时只重新获取这些详情页"""
+    module = load_scraper_module(tmp_path, monkeypatch)
+    server, port = start_server()
+    base_url = f'http://127.0.0.1:{port}'
+    try:
+        UNAVAILABLE.add('/supply/101.html')
+        scraper = make_scraper(module, tmp_path, base_url, enabled=False)
+        scraper.scrape_all()
+        assert [p['url'] for p in scraper.failed_products] == [f'{base_url}/supply/101.html']
+        assert scraper.frontier.summary()['products'] == {'parsed': 1, 'failed': 1}
+        scraper.close()
+
+        UNAVAILABLE.clear()
+        REQUEST_LOG.clear()
+        scraper = make_scraper(module, tmp_path, base_url, enabled=False)
+        scraper.scrape_all(resume=True)
+        assert REQUEST_LOG == [('/supply/101.html', 200)]
+        assert '铸铁' in scraper.products_data[1]['details']
+        assert scraper.frontier.summary()['products'] == {'parsed': 2}
+        assert scraper.frontier.page_products(f'{base_url}/supply/g1_2.html')[0]['details']
+    finally:
+        UNAVAILABLE.clear()
+        scraper.close()
+        server.shutdown()